@@ -0,0 +1,361 @@
+"""
+Inter-annotator agreement analytics (NumPy, no pandas / Streamlit).
+
+AgreementEngine takes annotation rows incrementally (`add_rows`) and keeps, per score
+dimension, a plot x score-level count matrix (only the latest rating of each
+annotator on each plot counts). From that matrix alone:
+
+- Krippendorff's alpha with the ordinal metric (coincidence matrix in one matmul)
+- ICC(1) and ICC(1,k): one-way random effects, which fits a sparse design where
+  every plot is rated by a different subset of annotators
+
+Pairwise Spearman rho and Kendall tau-b per annotator pair are computed from the
+co-rated plots without a Python loop over pairs: every co-rating is expanded into
+(pair, level, level) and binned into one contingency table per pair, and both
+coefficients are read off the tables (with tie corrections).
+
+Drift against gold: for each annotator's latest calibration ratings, the deviation
+from the mean of the other annotators' ratings of the same gold plot, summarised as
+bias, MAE and slope over that annotator's calibration sequence.
+
+Scores are expected on the app's integer scale (SCALE = 1..10); other values are
+ignored. Results are cached until the next `add_rows`.
+"""
+
+import threading
+
+import numpy as np
+
+from annotation_table import SCORE_COLUMNS
+
+SCALE = (1, 10)
+MIN_COMMON = 3   # co-rated plots needed before a pair's correlation is reported
+
+
+def _grow(arr: np.ndarray, n: int, fill) -> np.ndarray:
+    if n <= len(arr):
+        return arr
+    shape = (max(n, 2 * len(arr), 64),) + arr.shape[1:]
+    out = np.full(shape, fill, dtype=arr.dtype)
+    out[:len(arr)] = arr
+    return out
+
+
+def _score(value) -> float:
+    if value is None or value == "":
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+# ============== estimators on count matrices ==============
+
+def krippendorff_alpha_ordinal(counts: np.ndarray) -> float:
+    """Ordinal alpha from a units x levels count matrix (units with < 2 values are not pairable)."""
+    m = counts.sum(axis=1)
+    pairable = m >= 2
+    n_u = counts[pairable].astype(float)
+    if not len(n_u):
+        return np.nan
+    w = n_u / (m[pairable] - 1)[:, None]
+    o = n_u.T @ w - np.diag(w.sum(axis=0))     # coincidence matrix
+    n_c = o.sum(axis=1)
+    n = n_c.sum()
+    if n <= 1:
+        return np.nan
+    # ordinal metric: delta_ck = (sum_{g=c..k} n_g - (n_c + n_k) / 2) ** 2
+    cum = np.cumsum(n_c)
+    lo = np.minimum.outer(np.arange(len(n_c)), np.arange(len(n_c)))
+    hi = np.maximum.outer(np.arange(len(n_c)), np.arange(len(n_c)))
+    between = cum[hi] - cum[lo] + n_c[lo]
+    delta = (between - (n_c[:, None] + n_c[None, :]) / 2) ** 2
+    expected = (np.outer(n_c, n_c) * delta).sum()
+    if expected == 0:
+        return np.nan
+    return float(1.0 - (n - 1) * (o * delta).sum() / expected)
+
+
+def icc_oneway(counts: np.ndarray, values: np.ndarray):
+    """(ICC(1), ICC(1,k)) from a units x levels count matrix; `values` are the level scores."""
+    k = counts.sum(axis=1)
+    keep = k >= 2
+    k = k[keep].astype(float)
+    if len(k) < 2:
+        return np.nan, np.nan
+    c = counts[keep].astype(float)
+    s = c @ values
+    q = c @ (values ** 2)
+    n_tot, n_units = k.sum(), len(k)
+    ss_between = (s ** 2 / k).sum() - s.sum() ** 2 / n_tot
+    ss_within = q.sum() - (s ** 2 / k).sum()
+    ms_b = ss_between / (n_units - 1)
+    ms_w = ss_within / (n_tot - n_units) if n_tot > n_units else np.nan
+    n0 = (n_tot - (k ** 2).sum() / n_tot) / (n_units - 1)
+    with np.errstate(all="ignore"):
+        icc1 = (ms_b - ms_w) / (ms_b + (n0 - 1) * ms_w)
+        icc1k = (ms_b - ms_w) / ms_b
+    return float(icc1), float(icc1k)
+
+
+def rank_correlations(tables: np.ndarray):
+    """
+    Spearman rho and Kendall tau-b for a stack of (G, L, L) contingency tables.
+    Returns (n, rho, tau) arrays of length G.
+    """
+    t = tables.astype(np.int64)
+    n = t.sum(axis=(1, 2)).astype(float)
+    r1, r2 = t.sum(axis=2).astype(float), t.sum(axis=1).astype(float)    # marginals
+
+    # Spearman: mid-ranks per level, then Pearson of ranks from table sums
+    rank1 = np.cumsum(r1, axis=1) - r1 + (r1 + 1) / 2
+    rank2 = np.cumsum(r2, axis=1) - r2 + (r2 + 1) / 2
+    mean = (n + 1) / 2
+    sxy = np.einsum("gij,gi,gj->g", t, rank1, rank2) - n * mean ** 2
+    sxx = (r1 * rank1 ** 2).sum(axis=1) - n * mean ** 2
+    syy = (r2 * rank2 ** 2).sum(axis=1) - n * mean ** 2
+    with np.errstate(all="ignore"):
+        rho = sxy / np.sqrt(sxx * syy)
+
+    # Kendall: for cell (i, j), concordant - discordant partners = sum over rows k > i of
+    # (cells right of j) - (cells left of j) = row_total_k - 2 * prefix_k(j) + t_kj
+    m = t.sum(axis=2, keepdims=True) - 2 * np.cumsum(t, axis=2) + t
+    later = m.sum(axis=1, keepdims=True) - np.cumsum(m, axis=1)             # rows > i
+    s = (t * later).sum(axis=(1, 2)).astype(float)
+    n0 = n * (n - 1) / 2
+    ties1 = (r1 * (r1 - 1) / 2).sum(axis=1)
+    ties2 = (r2 * (r2 - 1) / 2).sum(axis=1)
+    with np.errstate(all="ignore"):
+        tau = s / np.sqrt((n0 - ties1) * (n0 - ties2))
+    return n.astype(np.int64), rho, tau
+
+
+# ============== engine ==============
+
+class AgreementEngine:
+    def __init__(self, dims=SCORE_COLUMNS, scale=SCALE):
+        self.dims = tuple(dims)
+        self.scale = (int(scale[0]), int(scale[1]))
+        self.levels = np.arange(self.scale[0], self.scale[1] + 1, dtype=float)
+        self.lock = threading.RLock()   # for callers sharing one engine between threads
+        self.reset()
+
+    def reset(self):
+        d = len(self.dims)
+        self.n = 0
+        self.version = 0
+        self.cursor = 0     # caller's position in its row source (log id / table row) already folded in
+        self.table_generation = None   # AnnotationTable.generation the cursor refers to (sync_table)
+        self._aids, self._pids = {}, {}
+        self.annotators, self.plots = [], []
+        self._a = np.zeros(0, dtype=np.int32)
+        self._p = np.zeros(0, dtype=np.int32)
+        self._calib = np.zeros(0, dtype=bool)
+        self._live = np.zeros(0, dtype=bool)
+        self._lvl = np.zeros((0, d), dtype=np.int8)        # level index, -1 = missing / off-scale
+        self._latest = {}                                  # (annotator, plot) -> row
+        self._counts = np.zeros((d, 0, len(self.levels)), dtype=np.int32)
+        self._cache = {}
+
+    def _code(self, lookup: dict, names: list, value) -> int:
+        value = str(value)
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(names)
+            names.append(value)
+        return code
+
+    def add_rows(self, rows) -> int:
+        """Fold new annotation rows (dicts with annotator_id, plot_id, is_calibration, dims)."""
+        rows = [r for r in rows if r.get("annotator_id") not in (None, "") and r.get("plot_id") not in (None, "")]
+        if not rows:
+            return 0
+        lo, hi = self.n, self.n + len(rows)
+        self._a = _grow(self._a, hi, 0)
+        self._p = _grow(self._p, hi, 0)
+        self._calib = _grow(self._calib, hi, False)
+        self._live = _grow(self._live, hi, False)
+        self._lvl = _grow(self._lvl, hi, -1)
+
+        superseded = []
+        for i, r in enumerate(rows, start=lo):
+            a = self._code(self._aids, self.annotators, r["annotator_id"])
+            p = self._code(self._pids, self.plots, r["plot_id"])
+            self._a[i], self._p[i] = a, p
+            calib = r.get("is_calibration")
+            self._calib[i] = calib.strip().lower() in ("true", "1") if isinstance(calib, str) else bool(calib)
+            old = self._latest.get((a, p))
+            if old is not None:
+                superseded.append(old)
+            self._latest[(a, p)] = i
+        x = np.array([[_score(r.get(dim)) for dim in self.dims] for r in rows], dtype=float)
+        lvl = np.rint(x) - self.scale[0]
+        ok = np.isfinite(x) & (np.abs(x - np.rint(x)) < 1e-9) & (lvl >= 0) & (lvl < len(self.levels))
+        self._lvl[lo:hi] = np.where(ok, lvl, -1).astype(np.int8)
+        self._live[lo:hi] = True
+        self.n = hi
+
+        if len(self._pids) > self._counts.shape[1]:
+            grown = np.zeros((len(self.dims), max(len(self._pids), 2 * self._counts.shape[1], 64),
+                              len(self.levels)), dtype=np.int32)
+            grown[:, :self._counts.shape[1]] = self._counts
+            self._counts = grown
+        if superseded:
+            old = np.array(superseded, dtype=np.int64)
+            counted = old[old < lo]          # already in the count matrices: take them out
+            self._bump(counted, -1)
+            self._live[old] = False
+        new = np.arange(lo, hi)
+        self._bump(new[self._live[lo:hi]], +1)
+        self.version += 1
+        self._cache.clear()
+        return len(rows)
+
+    def _bump(self, rows: np.ndarray, sign: int):
+        if not len(rows):
+            return
+        for j in range(len(self.dims)):
+            lv = self._lvl[rows, j]
+            ok = lv >= 0
+            np.add.at(self._counts[j], (self._p[rows[ok]], lv[ok].astype(np.intp)), sign)
+
+    def sync_table(self, table):
+        """Fold rows appended to an AnnotationTable since the last call (a cleared table starts over)."""
+        n = len(table)
+        if n < self.cursor or table.generation != self.table_generation:
+            self.reset()
+            self.table_generation = table.generation
+        if n > self.cursor:
+            self.add_rows(table.row(i) for i in range(self.cursor, n))
+        self.cursor = n
+
+    # ---------- queries ----------
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def counts(self, dim: str) -> np.ndarray:
+        return self._counts[self.dims.index(dim), :len(self.plots)]
+
+    def alpha(self, dim: str) -> float:
+        return self._cached(("alpha", dim), lambda: krippendorff_alpha_ordinal(self.counts(dim)))
+
+    def icc(self, dim: str):
+        return self._cached(("icc", dim), lambda: icc_oneway(self.counts(dim), self.levels))
+
+    def pairwise(self, dim: str, min_common: int = MIN_COMMON) -> dict:
+        """{"a1", "a2" (annotator ids), "n", "spearman", "kendall"} arrays for pairs with >= min_common co-rated plots."""
+        return self._cached(("pairwise", dim, min_common), lambda: self._pairwise(dim, min_common))
+
+    def _pairwise(self, dim: str, min_common: int) -> dict:
+        empty = {"a1": [], "a2": [], "n": np.zeros(0, dtype=np.int64),
+                 "spearman": np.zeros(0), "kendall": np.zeros(0)}
+        j = self.dims.index(dim)
+        rows = np.nonzero(self._live[:self.n] & (self._lvl[:self.n, j] >= 0))[0]
+        if len(rows) < 2:
+            return empty
+        order = rows[np.lexsort((self._a[rows], self._p[rows]))]
+        p = self._p[order]
+        starts = np.flatnonzero(np.r_[True, p[1:] != p[:-1]])
+        sizes = np.diff(np.r_[starts, len(order)])
+        pos = np.arange(len(order)) - np.repeat(starts, sizes)     # position within its plot
+        partners = np.repeat(sizes, sizes) - pos - 1                # later raters on the same plot
+        total = int(partners.sum())
+        if not total:
+            return empty
+        first = np.repeat(np.arange(len(order)), partners)
+        offset = np.arange(total) - np.repeat(np.cumsum(partners) - partners, partners)
+        i1, i2 = order[first], order[first + 1 + offset]
+
+        n_a, n_l = len(self.annotators), len(self.levels)
+        pair = self._a[i1].astype(np.int64) * n_a + self._a[i2]
+        pair_ids, inv = np.unique(pair, return_inverse=True)
+        keep = np.bincount(inv) >= min_common
+        if not keep.any():
+            return empty
+        remap = np.cumsum(keep) - 1
+        sel = keep[inv]
+        g = remap[inv[sel]]
+        flat = (g * n_l + self._lvl[i1[sel], j]) * n_l + self._lvl[i2[sel], j]
+        tables = np.bincount(flat, minlength=int(keep.sum()) * n_l * n_l).reshape(-1, n_l, n_l)
+        n, rho, tau = rank_correlations(tables)
+        kept = pair_ids[keep]
+        return {"a1": [self.annotators[k] for k in kept // n_a], "a2": [self.annotators[k] for k in kept % n_a],
+                "n": n, "spearman": rho, "kendall": tau}
+
+    def drift(self, dim: str = "overall") -> dict:
+        """Per annotator vs gold consensus: {"annotator_id", "n", "bias", "mae", "slope"} arrays."""
+        return self._cached(("drift", dim), lambda: self._drift(dim))
+
+    def _drift(self, dim: str) -> dict:
+        j = self.dims.index(dim)
+        rows = np.nonzero(self._live[:self.n] & self._calib[:self.n] & (self._lvl[:self.n, j] >= 0))[0]
+        out = {"annotator_id": [], "n": np.zeros(0, dtype=np.int64), "bias": np.zeros(0),
+               "mae": np.zeros(0), "slope": np.zeros(0)}
+        if not len(rows):
+            return out
+        a, p = self._a[rows].astype(np.int64), self._p[rows].astype(np.int64)
+        x = self.levels[self._lvl[rows, j]]
+        n_p = len(self.plots)
+        # consensus = mean of the *other* annotators' ratings of the same gold plot
+        sum_p, cnt_p = np.bincount(p, x, n_p), np.bincount(p, minlength=n_p)
+        ap = a * n_p + p
+        ap_ids, ap_inv = np.unique(ap, return_inverse=True)
+        sum_ap, cnt_ap = np.bincount(ap_inv, x), np.bincount(ap_inv)
+        others = cnt_p[p] - cnt_ap[ap_inv]
+        ok = others > 0
+        if not ok.any():
+            return out
+        dev = x[ok] - (sum_p[p[ok]] - sum_ap[ap_inv[ok]]) / others[ok]
+        a = a[ok]
+        n_a = len(self.annotators)
+        cnt = np.bincount(a, minlength=n_a)
+        # sequence index of each gold rating within its annotator (rows are in arrival order)
+        by_annotator = np.argsort(a, kind="stable")
+        seq = np.empty(len(a))
+        seq[by_annotator] = np.arange(len(a)) - (np.cumsum(cnt) - cnt)[a[by_annotator]]
+        with np.errstate(all="ignore"):
+            bias = np.bincount(a, dev, n_a) / cnt
+            mae = np.bincount(a, np.abs(dev), n_a) / cnt
+            t_mean = np.bincount(a, seq, n_a) / cnt
+            dt = seq - t_mean[a]
+            slope = np.bincount(a, dt * dev, n_a) / np.bincount(a, dt * dt, n_a)
+        has = cnt > 0
+        return {"annotator_id": [self.annotators[k] for k in np.flatnonzero(has)], "n": cnt[has],
+                "bias": bias[has], "mae": mae[has], "slope": slope[has]}
+
+    def plot_means(self, dim: str) -> dict:
+        """Mean of the latest ratings and number of raters for every rated plot."""
+        c = self.counts(dim)
+        n = c.sum(axis=1)
+        has = n > 0
+        return {"plot_id": [self.plots[k] for k in np.flatnonzero(has)], "n": n[has],
+                "mean": (c[has] @ self.levels) / n[has]}
+
+    def summary(self, pairwise: bool = True, min_common: int = MIN_COMMON) -> list:
+        """One dict per dimension: ratings, plots with >= 2 raters, alpha, ICC(1), ICC(1,k)
+        and, with `pairwise`, the n-weighted mean Spearman rho / Kendall tau over annotator pairs."""
+        out = []
+        for dim in self.dims:
+            c = self.counts(dim)
+            icc1, icc1k = self.icc(dim)
+            row = {
+                "dimension": dim,
+                "ratings": int(c.sum()),
+                "plots_multi_rated": int((c.sum(axis=1) >= 2).sum()),
+                "alpha_ordinal": self.alpha(dim),
+                "icc1": icc1,
+                "icc1k": icc1k,
+            }
+            if pairwise:
+                pw = self.pairwise(dim, min_common)
+                w = pw["n"].astype(float)
+                ok_r, ok_t = np.isfinite(pw["spearman"]), np.isfinite(pw["kendall"])
+                row["pairs"] = int(len(w))
+                row["spearman_mean"] = float(np.average(pw["spearman"][ok_r], weights=w[ok_r])) if ok_r.any() else np.nan
+                row["kendall_mean"] = float(np.average(pw["kendall"][ok_t], weights=w[ok_t])) if ok_t.any() else np.nan
+            out.append(row)
+        return out
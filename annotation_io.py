@@ -0,0 +1,130 @@
+"""
+Streaming readers / writers for annotation files (no pandas, no Streamlit).
+
+Supported inputs: CSV exports from the app, JSON Lines (one row per line) and the
+SQLite annotation log (annotation_store.py). Rows are yielded one at a time, so
+files larger than memory can be processed.
+
+`shards` splits inputs into independently readable pieces for worker processes:
+JSONL files are cut at line boundaries into ~`shard_bytes` byte ranges; CSV files
+are one shard each (quoted notes may contain newlines, so they cannot be cut safely).
+"""
+
+import csv
+import json
+import os
+import sqlite3
+
+SHARD_BYTES = 32 << 20
+
+
+def file_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if ext in (".db", ".sqlite", ".sqlite3"):
+        return "db"
+    return "csv"
+
+
+def shards(paths, shard_bytes: int = SHARD_BYTES) -> list:
+    """[(path, start, end)] covering every input; end None = to the end of the file."""
+    out = []
+    for path in paths:
+        if file_format(path) != "jsonl":
+            out.append((path, 0, None))
+            continue
+        size = os.path.getsize(path)
+        start = 0
+        with open(path, "rb") as fh:
+            while start < size:
+                fh.seek(min(start + shard_bytes, size))
+                fh.readline()  # move the cut to the next line boundary
+                end = min(fh.tell(), size)
+                out.append((path, start, end))
+                start = end
+        if not size:
+            out.append((path, 0, None))
+    return out
+
+
+def read_rows(path: str, start: int = 0, end: int = None):
+    """Yield row dicts from one file (or one JSONL byte range). CSV values stay strings."""
+    fmt = file_format(path)
+    if fmt == "db":
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for (row,) in conn.execute("SELECT row FROM annotations ORDER BY id"):
+                yield json.loads(row)
+        finally:
+            conn.close()
+    elif fmt == "jsonl":
+        with open(path, "rb") as fh:
+            fh.seek(start)
+            while end is None or fh.tell() < end:
+                line = fh.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as fh:
+            yield from csv.DictReader(fh)
+
+
+def read_header(path: str) -> list:
+    """Column names of a file, in first-seen order (scans JSONL / DB rows, reads one CSV line)."""
+    if file_format(path) == "csv":
+        with open(path, "r", encoding="utf-8", newline="") as fh:
+            return next(csv.reader(fh), [])
+    seen = {}
+    for row in read_rows(path):
+        for k in row:
+            seen.setdefault(k, None)
+    return list(seen)
+
+
+def as_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return bool(value)
+
+
+def as_score(value):
+    """Float score, or None for missing / non-numeric values."""
+    if value is None or value == "":
+        return None
+    try:
+        x = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if x != x else x
+
+
+def row_key(row: dict):
+    """Identity of a submitted annotation, used to de-duplicate merged exports."""
+    return (str(row.get("timestamp_utc", "")), str(row.get("annotator_id", "")), str(row.get("plot_id", "")))
+
+
+class RowWriter:
+    """Writes rows as CSV (fixed `fieldnames`, missing -> empty) or JSON Lines."""
+
+    def __init__(self, fh, fmt: str, fieldnames=None, header: bool = True):
+        self.fmt = fmt
+        self._fh = fh
+        if fmt == "csv":
+            self._csv = csv.DictWriter(fh, fieldnames=list(fieldnames or []), extrasaction="ignore")
+            if header:
+                self._csv.writeheader()
+
+    def write(self, row: dict):
+        if self.fmt == "csv":
+            self._csv.writerow({k: ("" if v is None else v) for k, v in row.items()})
+        else:
+            self._fh.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def open_output(path: str):
+    return open(path, "w", encoding="utf-8", newline="")
+
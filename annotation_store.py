@@ -0,0 +1,301 @@
+"""
+Durable annotation log (SQLite, WAL mode).
+
+Rows built by the scoring form are appended to an `annotations` table. One writer
+thread per process drains a queue and commits whatever is pending in a single
+transaction (group commit), so many sessions submitting at once cost one fsync per
+batch instead of one per row. If a batch fails, each append in it is retried in its
+own transaction, so one bad row only fails the call that submitted it. WAL mode lets
+readers run alongside the writer, and `busy_timeout` lets several processes share the
+same database file.
+
+Reads are indexed by annotator_id and plot_id. Pairwise (A/B) judgments go to a
+separate `comparisons` table through the same writer (`append_comparison`).
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS annotations (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp_utc  TEXT,
+    annotator_id   TEXT,
+    plot_id        TEXT,
+    is_calibration INTEGER,
+    row            TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_annotations_annotator ON annotations (annotator_id, id);
+CREATE INDEX IF NOT EXISTS idx_annotations_plot ON annotations (plot_id, id);
+CREATE TABLE IF NOT EXISTS comparisons (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp_utc  TEXT,
+    annotator_id   TEXT,
+    plot_a         TEXT,
+    plot_b         TEXT,
+    row            TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_comparisons_annotator ON comparisons (annotator_id, id);
+CREATE TABLE IF NOT EXISTS export_checkpoints (
+    name         TEXT PRIMARY KEY,
+    last_id      INTEGER NOT NULL,
+    updated_utc  TEXT
+);
+"""
+
+_STOP = object()
+
+
+def _connect(path: str, busy_timeout_ms: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=busy_timeout_ms / 1000, isolation_level=None,
+                           check_same_thread=False)
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+_INSERT = {
+    "annotations": (
+        "INSERT INTO annotations (timestamp_utc, annotator_id, plot_id, is_calibration, row) VALUES (?, ?, ?, ?, ?)",
+        lambda r: (r.get("timestamp_utc"), r.get("annotator_id"), r.get("plot_id"), int(bool(r.get("is_calibration")))),
+    ),
+    "comparisons": (
+        "INSERT INTO comparisons (timestamp_utc, annotator_id, plot_a, plot_b, row) VALUES (?, ?, ?, ?, ?)",
+        lambda r: (r.get("timestamp_utc"), r.get("annotator_id"), r.get("plot_a"), r.get("plot_b")),
+    ),
+}
+
+
+class _Pending:
+    __slots__ = ("rows", "table", "done", "ids", "error")
+
+    def __init__(self, rows, table="annotations"):
+        self.rows = rows
+        self.table = table
+        self.done = threading.Event()
+        self.ids = []
+        self.error = None
+
+
+class AnnotationStore:
+    """Append-only annotation log shared by all sessions of a process (and across processes)."""
+
+    def __init__(self, path: str, max_batch: int = 256, busy_timeout_ms: int = 10000,
+                 write_timeout: float = 60.0):
+        self.path = path
+        self.max_batch = max(1, int(max_batch))
+        self.busy_timeout_ms = busy_timeout_ms
+        self.write_timeout = write_timeout   # seconds append_many(wait=True) waits for its commit
+        self._writer_error = None            # set if the writer thread cannot open the database
+        conn = _connect(path, busy_timeout_ms)
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="annotation-writer", daemon=True)
+        self._writer.start()
+
+    # ---------- writes ----------
+
+    def _write_loop(self):
+        try:
+            conn = _connect(self.path, self.busy_timeout_ms)
+        except Exception as e:
+            # no writer: fail everything queued now or later instead of leaving callers waiting
+            self._writer_error = e
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+                item.error = e
+                item.done.set()
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            # group commit: take everything already waiting, up to max_batch rows
+            n_rows = len(item.rows)
+            stop = False
+            while n_rows < self.max_batch:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stop = True
+                    break
+                batch.append(nxt)
+                n_rows += len(nxt.rows)
+            self._commit(conn, batch)
+            if stop:
+                break
+        conn.close()
+
+    @classmethod
+    def _commit(cls, conn, batch):
+        try:
+            cls._insert(conn, batch)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].error = e
+            else:
+                # one bad append must not fail the others: retry each in its own transaction
+                for pending in batch:
+                    try:
+                        cls._insert(conn, [pending])
+                    except Exception as e:
+                        pending.error = e
+        for pending in batch:
+            pending.done.set()
+
+    @staticmethod
+    def _insert(conn, batch):
+        """Insert every pending append in one transaction (all or nothing)."""
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for pending in batch:
+                sql, fields = _INSERT[pending.table]
+                for row in pending.rows:
+                    cur = conn.execute(sql, fields(row) + (json.dumps(row, ensure_ascii=False),))
+                    pending.ids.append(cur.lastrowid)
+            conn.execute("COMMIT")
+        except Exception:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            for pending in batch:
+                pending.ids = []
+            raise
+
+    def append_many(self, rows, wait: bool = True, table: str = "annotations") -> list:
+        """Queue rows for the next group commit. With wait=True, block until durable and return row ids."""
+        pending = _Pending([dict(r) for r in rows], table)
+        if not pending.rows:
+            return []
+        if self._writer_error is not None:
+            raise self._writer_error
+        self._queue.put(pending)
+        if not wait:
+            return []
+        if not pending.done.wait(self.write_timeout):
+            raise TimeoutError(f"annotation log write not committed after {self.write_timeout}s")
+        if pending.error is not None:
+            raise pending.error
+        return pending.ids
+
+    def append(self, row: dict, wait: bool = True):
+        ids = self.append_many([row], wait=wait)
+        return ids[0] if ids else None
+
+    def append_comparison(self, row: dict, wait: bool = True):
+        """Log one pairwise judgment (plot_a, plot_b, per-dimension "A" / "B" / "tie")."""
+        ids = self.append_many([row], wait=wait, table="comparisons")
+        return ids[0] if ids else None
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._writer.join()
+
+    # ---------- reads ----------
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = _connect(self.path, self.busy_timeout_ms)
+            self._local.conn = conn
+        return conn
+
+    def rows(self, annotator_id: str = None, plot_id: str = None, after_id: int = 0,
+             limit: int = None) -> list:
+        """Rows (as dicts, in insert order) filtered by annotator / plot; `after_id` reads only newer rows."""
+        sql = "SELECT row FROM annotations WHERE id > ?"
+        args = [int(after_id)]
+        if annotator_id is not None:
+            sql += " AND annotator_id = ?"
+            args.append(annotator_id)
+        if plot_id is not None:
+            sql += " AND plot_id = ?"
+            args.append(plot_id)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        return [json.loads(r[0]) for r in self._reader().execute(sql, args)]
+
+    def count(self, annotator_id: str = None, plot_id: str = None) -> int:
+        sql = "SELECT COUNT(*) FROM annotations WHERE 1 = 1"
+        args = []
+        if annotator_id is not None:
+            sql += " AND annotator_id = ?"
+            args.append(annotator_id)
+        if plot_id is not None:
+            sql += " AND plot_id = ?"
+            args.append(plot_id)
+        return self._reader().execute(sql, args).fetchone()[0]
+
+    def coverage_since(self, after_id: int = 0) -> list:
+        """(id, annotator_id, plot_id) for rows newer than `after_id`, without decoding row JSON."""
+        return self._reader().execute(
+            "SELECT id, annotator_id, plot_id FROM annotations WHERE id > ? ORDER BY id", (int(after_id),)
+        ).fetchall()
+
+    def columns(self, after_id: int = 0) -> list:
+        """Distinct row keys of rows newer than `after_id`, in first-seen order."""
+        seen = {}
+        try:
+            for (key,) in self._reader().execute(
+                    "SELECT j.key FROM annotations AS a, json_each(a.row) AS j WHERE a.id > ? ORDER BY a.id",
+                    (int(after_id),)):
+                seen.setdefault(key, None)
+        except sqlite3.OperationalError:
+            # no JSON1 extension, or rows json.dumps wrote with NaN: decode in Python
+            seen.clear()
+            for row in self.rows(after_id=after_id):
+                for key in row:
+                    seen.setdefault(key, None)
+        return list(seen)
+
+    def rows_with_ids(self, after_id: int = 0, limit: int = None) -> list:
+        """[(id, row dict)] newer than `after_id`, in insert order."""
+        sql = "SELECT id, row FROM annotations WHERE id > ? ORDER BY id"
+        args = [int(after_id)]
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        return [(i, json.loads(r)) for i, r in self._reader().execute(sql, args)]
+
+    def comparisons(self, annotator_id: str = None, after_id: int = 0, limit: int = None) -> list:
+        """[(id, row dict)] of pairwise judgments newer than `after_id`, in insert order."""
+        sql = "SELECT id, row FROM comparisons WHERE id > ?"
+        args = [int(after_id)]
+        if annotator_id is not None:
+            sql += " AND annotator_id = ?"
+            args.append(annotator_id)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        return [(i, json.loads(r)) for i, r in self._reader().execute(sql, args)]
+
+    # ---------- export checkpoints ----------
+
+    def get_checkpoint(self, name: str) -> int:
+        """Last row id exported under `name` (0 if never)."""
+        row = self._reader().execute("SELECT last_id FROM export_checkpoints WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def set_checkpoint(self, name: str, last_id: int):
+        self._reader().execute(
+            "INSERT INTO export_checkpoints (name, last_id, updated_utc) VALUES (?, ?, datetime('now')) "
+            "ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id, updated_utc = excluded.updated_utc",
+            (name, int(last_id)),
+        )
+
+    def last_id(self) -> int:
+        return self._reader().execute("SELECT COALESCE(MAX(id), 0) FROM annotations").fetchone()[0]
@@ -0,0 +1,176 @@
+"""
+Incrementally appended, columnar annotation table.
+
+Each column is a NumPy array with spare capacity (grown by doubling), so appending
+a submitted row costs O(columns) amortized instead of rebuilding a DataFrame from a
+list of dicts. Score columns are small ints (with a missing mask), annotator_id /
+plot_id are categorical codes, everything else is an object column.
+
+`to_frame()` wraps views of the filled part of each array (no per-row copying) and
+is cached until the next append.
+
+Consumers that fold rows in incrementally remember `generation` next to their row
+count: it is unique per table and changes on `clear()`, so a table that was reset
+(or replaced) and has since grown past the old count is still noticed.
+"""
+
+import itertools
+
+import numpy as np
+
+SCORE_COLUMNS = ("Surprise", "Valence", "Arousal", "Dominance", "Conflict", "Coherence", "overall")
+CATEGORICAL_COLUMNS = ("annotator_id", "plot_id")
+BOOL_COLUMNS = ("is_calibration",)
+
+_generations = itertools.count(1)
+
+
+class AnnotationTable:
+    def __init__(self, capacity: int = 64):
+        self._cap = max(1, int(capacity))
+        self._n = 0
+        self._order = []     # column order = first-seen key order of appended rows
+        self._data = {}      # name -> np.ndarray (len == capacity)
+        self._mask = {}      # score column -> bool array, True = missing
+        self._cats = {}      # categorical column -> (categories list, {value: code})
+        self._version = 0
+        self._frame = None
+        self._frame_version = -1
+        self.generation = next(_generations)
+
+    @classmethod
+    def from_rows(cls, rows) -> "AnnotationTable":
+        rows = list(rows)
+        table = cls(capacity=max(64, len(rows)))
+        table.extend(rows)
+        return table
+
+    # ---------- storage ----------
+
+    def _add_column(self, name: str):
+        if name in SCORE_COLUMNS:
+            self._data[name] = np.zeros(self._cap, dtype=np.int16)
+            self._mask[name] = np.zeros(self._cap, dtype=bool)
+            self._mask[name][:self._n] = True
+        elif name in CATEGORICAL_COLUMNS:
+            self._data[name] = np.full(self._cap, -1, dtype=np.int32)
+            self._cats[name] = ([], {})
+        elif name in BOOL_COLUMNS:
+            self._data[name] = np.zeros(self._cap, dtype=bool)
+        else:
+            self._data[name] = np.full(self._cap, None, dtype=object)
+        self._order.append(name)
+
+    def _grow(self):
+        new_cap = self._cap * 2
+        for name, arr in self._data.items():
+            fill = -1 if name in CATEGORICAL_COLUMNS else (None if arr.dtype == object else 0)
+            grown = np.full(new_cap, fill, dtype=arr.dtype)
+            grown[:self._n] = arr[:self._n]
+            self._data[name] = grown
+        for name, mask in self._mask.items():
+            grown = np.zeros(new_cap, dtype=bool)
+            grown[:self._n] = mask[:self._n]
+            self._mask[name] = grown
+        self._cap = new_cap
+
+    def _code(self, name: str, value) -> int:
+        if value is None:
+            return -1
+        categories, lookup = self._cats[name]
+        value = str(value)
+        code = lookup.get(value)
+        if code is None:
+            code = len(categories)
+            categories.append(value)
+            lookup[value] = code
+        return code
+
+    # ---------- public API ----------
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def columns(self) -> list:
+        return list(self._order)
+
+    def append(self, row: dict):
+        if self._n == self._cap:
+            self._grow()
+        for name in row:
+            if name not in self._data:
+                self._add_column(name)
+        i = self._n
+        for name in self._order:
+            value = row.get(name)
+            if name in self._mask:
+                missing = value is None
+                self._mask[name][i] = missing
+                self._data[name][i] = 0 if missing else int(value)
+            elif name in self._cats:
+                self._data[name][i] = self._code(name, value)
+            elif name in BOOL_COLUMNS:
+                self._data[name][i] = bool(value)
+            else:
+                self._data[name][i] = value
+        self._n += 1
+        self._version += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def clear(self):
+        """Drop every row; the table gets a new `generation`."""
+        self.__init__(capacity=64)
+
+    def column(self, name: str) -> np.ndarray:
+        """Zero-copy view of a column (categorical columns return their int codes)."""
+        return self._data[name][:self._n]
+
+    def categories(self, name: str) -> list:
+        return self._cats[name][0]
+
+    def missing(self, name: str) -> np.ndarray:
+        return self._mask[name][:self._n]
+
+    def row(self, i: int) -> dict:
+        out = {}
+        for name in self._order:
+            value = self._data[name][i]
+            if name in self._mask:
+                value = None if self._mask[name][i] else int(value)
+            elif name in self._cats:
+                value = None if value < 0 else self._cats[name][0][value]
+            elif name in BOOL_COLUMNS:
+                value = bool(value)
+            out[name] = value
+        return out
+
+    def iter_rows(self):
+        for i in range(self._n):
+            yield self.row(i)
+
+    def to_frame(self):
+        """DataFrame over views of the column arrays; cached until the next append."""
+        import pandas as pd
+
+        if self._frame is not None and self._frame_version == self._version:
+            return self._frame
+        n = self._n
+        if n == 0:
+            return pd.DataFrame()
+        cols = {}
+        for name in self._order:
+            arr = self._data[name][:n]
+            if name in self._mask:
+                mask = self._mask[name][:n]
+                cols[name] = pd.arrays.IntegerArray(arr, mask) if mask.any() else arr
+            elif name in self._cats:
+                cols[name] = pd.Categorical.from_codes(arr, categories=self._cats[name][0][:])
+            else:
+                cols[name] = arr
+        self._frame = pd.DataFrame(cols, copy=False)
+        self._frame_version = self._version
+        return self._frame
@@ -2,37 +2,46 @@
 Plot Annotation Tool - v5.3 (Single Plot + VAD + Export + Random + Calib + Bilingual)
 Features:
 1) Absolute scoring for ONE plot on each dimension (1-10), + overall + notes
+   or pairwise A/B comparison (ELO + Bradley-Terry leaderboard, active pair selection)
 2) Export CSV + clear annotations
-3) Add annotator_id, timestamp, seed_id, method_name + Random Plot button
+3) Add annotator_id, timestamp, seed_id, method_name + Next Assigned Plot (coverage-balancing scheduler)
 4) Calibration items (gold plots) + per-annotator z-score normalization helper preview
 5) Bilingual (English + Chinese) UI
 """
 
 import streamlit as st
-import json
-import textwrap
-import re
-import pandas as pd
+import multiprocessing
+import os
 from datetime import datetime, timezone
-import random
-
-# ---------------- Graphviz (optional) ----------------
-try:
-    import graphviz
-    HAS_GRAPHVIZ = True
-except ImportError:
-    HAS_GRAPHVIZ = False
-
-# ============== Page Config ==============
-st.set_page_config(
-    page_title="📖 Plot Annotation Tool | 剧本标注工具",
-    page_icon="📖",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+from typing import TYPE_CHECKING
+from streamlit.errors import StreamlitAPIException
+
+from agreement import AgreementEngine
+from annotation_io import row_key
+from annotation_store import AnnotationStore
+from annotation_table import SCORE_COLUMNS, AnnotationTable
+import charts
+from charts import graph_key
+from corpus_index import CorpusIndex
+from corpus_store import CorpusStore, CorpusView
+from export import FORMATS, ExportCheckpoints, available_formats, deferred, export_frame
+from graph_features import FEATURES_FILE, FILTER_OPS, FeatureCache, FeatureTable, filter_mask
+from graph_layout import is_large
+from ingest import IngestLedger
+from normalization import NormalizationEngine, zscore_frame
+from plot_utils import get_method_name, get_plot_id, get_seed_id, safe_get
+from prefetch import Prefetcher
+from rating import RatingEngine
+from render_cache import RenderCache, content_hash
+from scheduler import AssignmentScheduler
+from script_view import script_outline, warm_script
+from story_tree import NODE_BUDGET, default_view, parse_tree
+
+if TYPE_CHECKING:
+    import pandas as pd   # imported where frames are built, not at startup
 
 # ============== Styles ==============
-st.markdown("""
+PAGE_CSS = """
 <style>
     .paper-sheet {
         background-color: #FFFFFF !important;
@@ -66,139 +75,412 @@ st.markdown("""
         padding: 12px;
         border-radius: 6px 6px 0 0;
     }
-    [data-testid="stGraphVizChart"] {
+    [data-testid="stGraphVizChart"], .svg-chart {
         background-color: white;
         padding: 10px;
         border-radius: 8px;
     }
+    .svg-chart {
+        overflow: auto;
+        text-align: center;
+    }
+    .svg-chart svg {
+        max-width: 100%;
+        height: auto;
+    }
 </style>
-""", unsafe_allow_html=True)
-
-# ============== Utils ==============
+"""
 
-def safe_get(plot: dict, key: str, default=""):
-    v = plot.get(key, default)
-    return default if v is None else v
+# ============== Page Config ==============
 
-def get_plot_id(plot: dict) -> str:
-    """Stable-ish id for plots: prefer explicit id, else title+seed+method."""
-    for k in ["plot_id", "id", "uuid"]:
-        if plot.get(k):
-            return str(plot[k])
-    title = str(plot.get("title", ""))
-    seed = str(plot.get("seed_id", plot.get("seed", "")))
-    method = str(plot.get("method", plot.get("method_name", plot.get("system", ""))))
-    return f"{title}||{seed}||{method}"
+def setup_page():
+    """Page config + styles. Called from main(), so importing this module has no side effects."""
+    st.set_page_config(
+        page_title="📖 Plot Annotation Tool | 剧本标注工具",
+        page_icon="📖",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    st.markdown(PAGE_CSS, unsafe_allow_html=True)
+
+# ============== Render Cache ==============
+
+@st.cache_resource(show_spinner=False)
+def get_render_cache() -> RenderCache:
+    """One cache per server process, shared by all sessions.
+    PLOT_RENDER_CACHE_SIZE: max in-memory entries; PLOT_RENDER_CACHE_DIR: enables the disk tier
+    (fill it ahead of time with `python prerender.py`)."""
+    return RenderCache(
+        max_entries=int(os.environ.get("PLOT_RENDER_CACHE_SIZE", "256")),
+        disk_dir=os.environ.get("PLOT_RENDER_CACHE_DIR") or None,
+    )
 
 def get_graph_data(plot):
-    raw = plot.get('causal_graph')
-    try:
-        return json.loads(raw) if isinstance(raw, str) else raw
-    except Exception:
-        return None
-
-def parse_tree_text_to_graphviz(tree_text):
-    """Text tree -> Graphviz object"""
-    if not HAS_GRAPHVIZ or not tree_text:
+    """Parsed causal_graph dict (cached by content hash). Treat the result as read-only."""
+    return charts.graph_data(plot, get_render_cache())
+
+def causal_layout(data, key=None, expand=(), mode="auto"):
+    """Layout plan of a causal graph view, cached like its DOT source."""
+    return charts.causal_layout(data, get_render_cache(), key=key, expand=expand, mode=mode)
+
+def causal_chart_source(data, key=None, expand=(), mode="auto"):
+    """DOT source for a causal graph dict, cached by content hash (pass `graph_key(plot)` to skip re-hashing the dict)."""
+    return charts.causal_chart_source(data, get_render_cache(), key=key, expand=expand, mode=mode)
+
+def tree_chart_source(tree_text, max_depth=None, max_children=None, collapsed=()):
+    """DOT source for a story tree view, cached by content hash + view limits."""
+    return charts.tree_chart_source(tree_text, get_render_cache(), max_depth, max_children, collapsed)
+
+def render_svg(source):
+    """Lay out DOT source server-side once; None if the `dot` executable is unavailable."""
+    return charts.render_svg(source, get_render_cache())
+
+@st.cache_resource(show_spinner=False)
+def get_prefetcher():
+    """Background warmer shared by all sessions (PLOT_PREFETCH_WORKERS threads; 0 disables it)."""
+    workers = int(os.environ.get("PLOT_PREFETCH_WORKERS", "2"))
+    if workers <= 0:
         return None
-    dot = graphviz.Digraph()
-    dot.attr(rankdir='TB')
-    dot.attr('node', shape='box', style='filled', fillcolor='#E1F5FE',
-             fontname='Arial', fontsize='11', margin='0.15')
-    dot.attr('edge', color='#666')
-
-    lines = tree_text.split('\n')
-    stack = []
-    node_count = 0
-
-    for line in lines:
-        stripped = line.strip()
-        if not stripped:
-            continue
-        indent = len(line) - len(line.lstrip())
-        content = stripped.replace('*', '').strip()
-
-        match = re.search(r'\[(.*?)\]', content)
-        label = match.group(1) if match else (content[:25] + '..' if len(content) > 25 else content)
-        detail = content.replace(match.group(0), '') if match else content
-
-        node_id = f"n{node_count}"
-        node_count += 1
-
-        wrap_label = f"<{label}<br/><font point-size='9' color='#555'>{detail[:40]}</font>>"
-        dot.node(node_id, label=wrap_label)
-
-        while stack and stack[-1][0] >= indent:
-            stack.pop()
-        if stack:
-            dot.edge(stack[-1][1], node_id)
-        stack.append((indent, node_id))
-
-    return dot
-
-def create_causal_chart(data):
-    """Causal graph -> Graphviz object"""
-    if not HAS_GRAPHVIZ or not data:
-        return None
-    dot = graphviz.Digraph()
-    dot.attr(rankdir='LR', splines='ortho', nodesep='0.4', ranksep='0.6')
-    dot.attr('node', fontname='Arial', style='filled', penwidth='0', fontcolor='white')
-
-    nodes = data.get('event_nodes', [])
-    edges = data.get('edges', [])
-
-    colors = {
-        'milestone': '#00BCD4',
-        'escalation': '#66BB6A',
-        'climax': '#EF5350',
-        'default': '#78909C'
-    }
+    cache = get_render_cache()  # bound here: prefetch threads have no Streamlit script context
 
-    for n in nodes:
-        ntype = str(n.get('type', 'default')).lower()
-        c = next((v for k, v in colors.items() if k in ntype), colors['default'])
-        name = str(n.get('name', n.get('label', n.get('id', ''))))
-        label = "\\n".join(textwrap.wrap(name, 20))
-        dot.node(str(n.get('id', name)), label=label, fillcolor=c, shape='box', style='rounded,filled')
+    def warm(plot):
+        charts.warm_plot(plot, cache)
+        warm_script(plot.get('final_plot'), cache)
 
-    for e in edges:
-        et = str(e.get('type', '')).lower()
-        color = '#FF7043' if et == 'catalyst' else '#455A64'
-        style = 'dashed' if et == 'concurrent' else 'solid'
-        dot.edge(str(e.get('from')), str(e.get('to')), color=color, style=style)
+    # a plot is ~7 cache entries (graph, layout, DOT sources, SVGs, script outline); don't treat
+    # plots as warm for longer than the LRU keeps them
+    return Prefetcher(warm, max_workers=workers, remember=max(1, cache.max_entries // 7))
 
-    return dot
+def show_chart(source):
+    """Show a chart from cached DOT source, using pre-laid-out SVG when possible."""
+    svg = render_svg(source)
+    if svg:
+        st.markdown(f'<div class="svg-chart">{svg}</div>', unsafe_allow_html=True)
+    else:
+        st.graphviz_chart(source, use_container_width=True)
 
 # ============== State ==============
 
+@st.cache_resource(show_spinner=False)
+def get_corpus_store() -> CorpusStore:
+    """Plot corpus shared read-only by all sessions (PLOT_CORPUS_DIR: where its files live)."""
+    return CorpusStore(os.environ.get("PLOT_CORPUS_DIR") or None, id_fn=get_plot_id)
+
+@st.cache_resource(show_spinner=False)
+def get_annotation_store():
+    """Durable annotation log shared by all sessions (PLOT_ANNOTATION_DB; set it empty to disable)."""
+    path = os.environ.get("PLOT_ANNOTATION_DB", "annotations.db")
+    return AnnotationStore(path) if path else None
+
+@st.cache_resource(show_spinner=False)
+def get_agreement_engine() -> AgreementEngine:
+    """Agreement statistics over the whole annotation log, shared by all sessions."""
+    return AgreementEngine()
+
+@st.cache_resource(show_spinner=False)
+def get_rating_engine() -> RatingEngine:
+    """ELO / Bradley-Terry ratings over all logged comparisons, shared by all sessions."""
+    return RatingEngine()
+
+@st.cache_resource(show_spinner=False)
+def get_feature_cache() -> FeatureCache:
+    """Graph metrics by content hash, kept next to the corpus index (see graph_features.py)."""
+    return FeatureCache(os.path.join(get_corpus_store().root_dir, FEATURES_FILE))
+
+def restore_annotations(annotator_id: str):
+    """
+    Add this annotator's saved rows from the log (e.g. after a browser refresh). Rows are
+    appended to the session table, never replaced, so unsaved rows and export checkpoints stay valid.
+    """
+    store = get_annotation_store()
+    if store is None or not annotator_id or st.session_state.get("restored_for") == annotator_id:
+        return
+    table = st.session_state.annotations
+    have = {row_key(r) for r in table.iter_rows() if r.get("annotator_id") == annotator_id}
+    table.extend(r for r in store.rows(annotator_id=annotator_id) if row_key(r) not in have)
+
+    def pair_key(r):
+        return row_key(r) + (str(r.get("plot_a", "")), str(r.get("plot_b", "")))
+
+    have = {pair_key(r) for r in st.session_state.comparisons if r.get("annotator_id") == annotator_id}
+    st.session_state.comparisons.extend(
+        r for _, r in store.comparisons(annotator_id=annotator_id) if pair_key(r) not in have)
+    st.session_state.restored_for = annotator_id
+
 def init_state():
     if 'plots' not in st.session_state:
-        st.session_state.plots = []
+        # sessions hold plot indices only; plot fields are read lazily from the shared store
+        st.session_state.plots = CorpusView(get_corpus_store())
     if 'annotations' not in st.session_state:
-        st.session_state.annotations = []
+        st.session_state.annotations = AnnotationTable()
+    if 'norm' not in st.session_state:
+        st.session_state.norm = NormalizationEngine()
     if 'gold_ids' not in st.session_state:
         st.session_state.gold_ids = set()
     if 'sel_idx' not in st.session_state:
         st.session_state.sel_idx = 0
+    if 'ingest' not in st.session_state:
+        st.session_state.ingest = IngestLedger()
+    if 'corpus_index' not in st.session_state:
+        st.session_state.corpus_index = CorpusIndex()
+    if 'scheduler' not in st.session_state:
+        st.session_state.scheduler = AssignmentScheduler()
+        st.session_state.sched_plots = 0   # corpus_index rows queued in the scheduler
+        st.session_state.sched_seen = 0    # last annotation (log id, or table row) counted
+    if 'features' not in st.session_state:
+        st.session_state.features = FeatureTable()
+    if 'comparisons' not in st.session_state:
+        st.session_state.comparisons = []   # pairwise judgments of this session (row dicts)
+        st.session_state.pair_rows = None   # (row of plot A, row of plot B) in the corpus index
+    if 'export_checkpoints' not in st.session_state:
+        st.session_state.export_checkpoints = ExportCheckpoints()
 
 def load_json(files):
-    """Load JSON plots, simple de-dup by plot_id."""
-    existing_ids = set(get_plot_id(p) for p in st.session_state.plots)
-    for f in files:
-        try:
-            content = json.load(f)
-            items = content if isinstance(content, list) else [content]
-            for item in items:
-                pid = get_plot_id(item)
-                if pid not in existing_ids:
-                    st.session_state.plots.append(item)
-                    existing_ids.add(pid)
-        except Exception:
-            continue
+    """Load JSON plots, de-dup by plot_id. Files already ingested are skipped without parsing."""
+    ledger = st.session_state.ingest
+    if st.session_state.plots and not ledger.plot_ids:
+        # plots were set without going through the ledger
+        ledger.plot_ids.update(get_plot_id(p) for p in st.session_state.plots)
+    ledger.ingest(files, st.session_state.plots, get_plot_id)
+
+def sync_scheduler(index: CorpusIndex):
+    """Queue newly loaded plots and count ratings added since the last rerun (all sessions, via the log)."""
+    sched = st.session_state.scheduler
+    store = get_annotation_store()
+    table = st.session_state.annotations
+    table_reset = store is None and st.session_state.get("sched_generation") != table.generation
+    if len(index) < st.session_state.sched_plots or table_reset:
+        # plots or session annotations were cleared: start over, coverage is re-read below
+        st.session_state.scheduler = sched = AssignmentScheduler(sched.target_per_plot, sched.gold_rate, sched.seed)
+        st.session_state.sched_plots = st.session_state.sched_seen = 0
+        st.session_state.sched_generation = table.generation
+    for pid in index.cols["plot_id"][st.session_state.sched_plots:]:
+        sched.add_plot(pid)
+    st.session_state.sched_plots = len(index)
+    sched.set_gold(st.session_state.gold_ids)
+
+    if store is not None:
+        for row_id, aid, pid in store.coverage_since(st.session_state.sched_seen):
+            sched.record(aid, pid)
+            st.session_state.sched_seen = row_id
+    else:
+        for i in range(min(st.session_state.sched_seen, len(table)), len(table)):
+            row = table.row(i)
+            sched.record(row.get("annotator_id"), row.get("plot_id"))
+        st.session_state.sched_seen = len(table)
+
+def prefetch_next(index: CorpusIndex, sel: int, options):
+    """Warm the plots likely to be opened after `sel` (next option, next assigned, next gold)."""
+    prefetcher = get_prefetcher()
+    if prefetcher is None:
+        return
+    rows = []
+    pos = options.index(sel) if sel in options else -1
+    if 0 <= pos < len(options) - 1:
+        rows.append(options[pos + 1])
+    elif sel + 1 < len(index):
+        rows.append(sel + 1)
+    annotator_id = st.session_state.get("annotator_id")
+    if annotator_id:
+        sync_scheduler(index)
+        sched = st.session_state.scheduler
+        rows += [index.row_of(pid) for pid in (sched.peek_for(annotator_id), sched.peek_gold(annotator_id))
+                 if pid is not None]
+    for row in rows:
+        if row is not None and row != sel:
+            prefetcher.submit(index.cols["plot_id"][row], st.session_state.plots[row])
 
 # ============== Rendering ==============
 
-def render_card(plot):
+# Fragments (Streamlit >= 1.33) rerun only their own body when a widget inside them changes.
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda f: f)
+
+
+def rerun_app():
+    """
+    Full-app rerun, also from inside a fragment (Streamlit < 1.37 has no `scope`).
+    Used after a successful save: the sidebar counters, scheduler progress and
+    leaderboard sit outside the submitting fragment, and a fragment may not write to
+    elements outside its own body, so they can only refresh with the whole page.
+    """
+    try:
+        st.rerun(scope="app")
+    except TypeError:
+        st.rerun()
+
+
+def render_inputs(plot, key=""):
+    # 显示 inputs 数据
+    st.markdown("#### 🕐 Time & Location / 时间 & 地点")
+    time_val = safe_get(plot, 'time', '')
+    location_val = safe_get(plot, 'location', '')
+    if time_val or location_val:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown(f"**Time / 时间:** {time_val if time_val else 'Not specified / 未指定'}")
+        with col2:
+            st.markdown(f"**Location / 地点:** {location_val if location_val else 'Not specified / 未指定'}")
+    else:
+        st.info("No time/location info / 无时间/地点信息")
+
+    st.markdown("#### 🎭 Setting / 场景设定")
+    setting_val = safe_get(plot, 'setting', '')
+    if setting_val:
+        st.markdown(f'<div class="paper-sheet"><div class="script-text">{setting_val}</div></div>', unsafe_allow_html=True)
+    else:
+        st.info("No setting info / 无场景设定")
+
+    st.markdown("#### 👥 Characters / 角色列表")
+    characters = plot.get('characters', [])
+    if characters and isinstance(characters, list) and len(characters) > 0:
+        for char in characters:
+            if isinstance(char, dict):
+                name = char.get('name', 'Unknown / 未知')
+                desc = char.get('description', 'No description / 无描述')
+                st.markdown(f"**{name}**: {desc}")
+            else:
+                st.markdown(f"- {char}")
+    else:
+        st.info("No character info / 无角色信息")
+
+    st.markdown("#### 📖 Background / 背景故事")
+    background_val = safe_get(plot, 'background', '')
+    if background_val:
+        st.markdown(f'<div class="paper-sheet"><div class="script-text">{background_val}</div></div>', unsafe_allow_html=True)
+    else:
+        st.info("No background info / 无背景故事")
+
+    # 显示作者信息（如果有）
+    author_val = safe_get(plot, 'author', '')
+    if author_val and author_val != 'Unknown':
+        st.markdown(f"**Author / 作者:** {author_val}")
+
+def render_causal_graph(plot, key=""):
+    g_data = get_graph_data(plot)
+    if g_data:
+        mode, expand = "auto", ()
+        if is_large(g_data):
+            c1, c2 = st.columns([1, 3])
+            with c1:
+                mode = st.radio("Layout / 布局", ["auto", "compact", "full"], horizontal=True, key=f"{key}layout",
+                                help="compact: collapse causal chains, drop implied edges, cluster by phase / 紧凑：折叠因果链、去除冗余边、按阶段分组")
+            plan = causal_layout(g_data, graph_key(plot), mode=mode)
+            if plan["chains"]:
+                with c2:
+                    expand = st.multiselect(
+                        "Expand chains / 展开事件链",
+                        list(plan["chains"]),
+                        format_func=lambda cid: f"{plan['chains'][cid][0]} (+{len(plan['chains'][cid]) - 1})",
+                        key=f"{key}expand",
+                    )
+            st.caption(f"{len(g_data.get('event_nodes', []))} events, {len(g_data.get('edges', []))} edges · "
+                       f"routing: {causal_layout(g_data, graph_key(plot), expand, mode)['splines']} / 路由方式")
+        chart = causal_chart_source(g_data, key=graph_key(plot), expand=expand, mode=mode)
+        if chart:
+            show_chart(chart)
+            with st.expander("🔍 Enlarge / Fullscreen / 放大查看"):
+                show_chart(chart)
+        else:
+            st.info("Graphviz not installed or graph data unavailable / Graphviz 未安装或图数据不可用")
+    else:
+        st.info("No causal graph data / 无因果图数据")
+
+def render_story_tree(plot, key=""):
+    tree_txt = safe_get(plot, 'pruned_tree', '')
+    if tree_txt:
+        model = parse_tree(tree_txt)
+        # the same default view prerender.py / the prefetcher warm (charts.warm_plot)
+        (max_depth, max_children), collapsed = default_view(model), ()
+        if len(model) > NODE_BUDGET:
+            # large tree: show a bounded level-of-detail view
+            c1, c2, c3 = st.columns([1, 1, 2])
+            if model.max_depth >= 1:   # a flat tree has nothing to slide over (min == max raises)
+                with c1:
+                    max_depth = st.slider("Max depth / 最大深度", 0, model.max_depth,
+                                          max_depth, key=f"{key}tree_depth")
+            with c2:
+                max_children = st.number_input("Max children per node / 每节点最多子节点", 1, 500,
+                                               max_children, key=f"{key}tree_children")
+            with c3:
+                shown, _ = model.visible(max_depth, max_children)
+                collapsed = st.multiselect(
+                    "Collapse subtrees / 折叠子树",
+                    [n for n in shown if len(model.children(n))],
+                    format_func=lambda n: f"{model.label[n]} ({model.size[n] - 1})",
+                    key=f"{key}tree_collapsed",
+                )
+            st.caption(f"{len(model)} nodes, depth {model.max_depth} / 共 {len(model)} 个节点，深度 {model.max_depth}")
+        chart_tree = tree_chart_source(tree_txt, max_depth, max_children, collapsed)
+        if chart_tree:
+            show_chart(chart_tree)
+            with st.expander("🔍 Enlarge Tree / 放大树状图"):
+                show_chart(chart_tree)
+
+        st.markdown('<div class="paper-sheet"><div class="tree-text">', unsafe_allow_html=True)
+        st.text(tree_txt)
+        st.markdown('</div></div>', unsafe_allow_html=True)
+    else:
+        st.info("No story tree / 无故事树")
+
+SCRIPT_PAGE_SECTIONS = 3   # script sections shown per page by default
+
+def _step_script(pos_key, delta, n):
+    st.session_state[pos_key] = min(max(0, st.session_state[pos_key] + delta), n - 1)
+
+def render_script(plot, key=""):
+    """Paged script: only the markdown of the selected sections is sent (outline cached per script)."""
+    final_plot = safe_get(plot, 'final_plot', '')
+    if not final_plot:
+        st.warning("No script available / 暂无剧本")
+        return
+    cache = get_render_cache()
+    sections = script_outline(final_plot, cache)
+    n = len(sections)
+    pos_key, span_key = f"{key}script_pos", f"{key}script_span"
+    doc = content_hash(final_plot)
+    if st.session_state.get(f"{key}script_doc") != doc or st.session_state.get(pos_key, 0) >= n:
+        # another script: start from the top
+        st.session_state[f"{key}script_doc"] = doc
+        st.session_state[pos_key] = 0
+
+    span = n
+    if n > 1:
+        top = min(s["level"] for s in sections)
+        c1, c2, c3, c4 = st.columns([4, 1, 1, 1])
+        with c1:
+            st.selectbox("Outline / 大纲", range(n), key=pos_key,
+                         format_func=lambda i: "\u2003" * (sections[i]["level"] - top) + sections[i]["title"])
+        with c2:
+            span = int(st.number_input("Sections per page / 每页节数", 1, n, min(SCRIPT_PAGE_SECTIONS, n),
+                                       key=span_key))
+        pos = st.session_state[pos_key]
+        with c3:
+            st.button("◀ Prev / 上一页", key=f"{key}script_prev", on_click=_step_script,
+                      args=(pos_key, -span, n), disabled=pos == 0, use_container_width=True)
+        with c4:
+            st.button("Next ▶ / 下一页", key=f"{key}script_next", on_click=_step_script,
+                      args=(pos_key, span, n), disabled=pos + span >= n, use_container_width=True)
+    pos = st.session_state[pos_key]
+    shown = sections[pos:pos + span]
+    st.markdown('<div class="paper-sheet"><div class="script-text">', unsafe_allow_html=True)
+    st.markdown(final_plot[shown[0]["start"]:shown[-1]["end"]])
+    st.markdown('</div></div>', unsafe_allow_html=True)
+    if n > 1:
+        chars = shown[-1]["end"] - shown[0]["start"]
+        st.caption(f"Sections {pos + 1}-{pos + len(shown)} of {n} · {chars:,} of {len(final_plot):,} characters / "
+                   f"第 {pos + 1}-{pos + len(shown)} 节，共 {n} 节")
+
+CARD_VIEWS = {
+    "📋 Input / 设定输入": render_inputs,
+    "🗺️ Causal Graph / 因果图": render_causal_graph,
+    "🌳 Story Tree / 故事树": render_story_tree,
+    "📜 Full Script / 完整剧本": render_script,
+}
+
+@fragment
+def render_card(plot, key=""):
+    """Plot card. Only the selected view is built (st.tabs would build all four on every rerun).
+    `key` prefixes widget keys so two cards can be shown side by side."""
     with st.container():
         st.markdown(f"""
         <div style="border:1px solid #ddd; border-radius:6px; background:white; margin-bottom:20px;">
@@ -213,133 +495,357 @@ def render_card(plot):
             <div style="padding:15px;">
         """, unsafe_allow_html=True)
 
-        t0, t1, t2, t3 = st.tabs([
-            "📋 Input / 设定输入", 
-            "🗺️ Causal Graph / 因果图", 
-            "🌳 Story Tree / 故事树", 
-            "📜 Full Script / 完整剧本"
-        ])
-
-        with t0:
-            # 显示 inputs 数据
-            st.markdown("#### 🕐 Time & Location / 时间 & 地点")
-            time_val = safe_get(plot, 'time', '')
-            location_val = safe_get(plot, 'location', '')
-            if time_val or location_val:
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.markdown(f"**Time / 时间:** {time_val if time_val else 'Not specified / 未指定'}")
-                with col2:
-                    st.markdown(f"**Location / 地点:** {location_val if location_val else 'Not specified / 未指定'}")
-            else:
-                st.info("No time/location info / 无时间/地点信息")
-
-            st.markdown("#### 🎭 Setting / 场景设定")
-            setting_val = safe_get(plot, 'setting', '')
-            if setting_val:
-                st.markdown(f'<div class="paper-sheet"><div class="script-text">{setting_val}</div></div>', unsafe_allow_html=True)
-            else:
-                st.info("No setting info / 无场景设定")
-
-            st.markdown("#### 👥 Characters / 角色列表")
-            characters = plot.get('characters', [])
-            if characters and isinstance(characters, list) and len(characters) > 0:
-                for char in characters:
-                    if isinstance(char, dict):
-                        name = char.get('name', 'Unknown / 未知')
-                        desc = char.get('description', 'No description / 无描述')
-                        st.markdown(f"**{name}**: {desc}")
-                    else:
-                        st.markdown(f"- {char}")
-            else:
-                st.info("No character info / 无角色信息")
-
-            st.markdown("#### 📖 Background / 背景故事")
-            background_val = safe_get(plot, 'background', '')
-            if background_val:
-                st.markdown(f'<div class="paper-sheet"><div class="script-text">{background_val}</div></div>', unsafe_allow_html=True)
-            else:
-                st.info("No background info / 无背景故事")
-
-            # 显示作者信息（如果有）
-            author_val = safe_get(plot, 'author', '')
-            if author_val and author_val != 'Unknown':
-                st.markdown(f"**Author / 作者:** {author_val}")
-
-        with t1:
-            g_data = get_graph_data(plot)
-            if g_data:
-                chart = create_causal_chart(g_data)
-                if chart:
-                    st.graphviz_chart(chart, use_container_width=True)
-                    with st.expander("🔍 Enlarge / Fullscreen / 放大查看"):
-                        st.graphviz_chart(chart, use_container_width=True)
-                else:
-                    st.info("Graphviz not installed or graph data unavailable / Graphviz 未安装或图数据不可用")
-            else:
-                st.info("No causal graph data / 无因果图数据")
-
-        with t2:
-            tree_txt = safe_get(plot, 'pruned_tree', '')
-            if tree_txt:
-                chart_tree = parse_tree_text_to_graphviz(tree_txt)
-                if chart_tree:
-                    st.graphviz_chart(chart_tree, use_container_width=True)
-                    with st.expander("🔍 Enlarge Tree / 放大树状图"):
-                        st.graphviz_chart(chart_tree, use_container_width=True)
-
-                st.markdown('<div class="paper-sheet"><div class="tree-text">', unsafe_allow_html=True)
-                st.text(tree_txt)
-                st.markdown('</div></div>', unsafe_allow_html=True)
-            else:
-                st.info("No story tree / 无故事树")
-
-        with t3:
-            final_plot = safe_get(plot, 'final_plot', '')
-            if final_plot:
-                st.markdown('<div class="paper-sheet"><div class="script-text">', unsafe_allow_html=True)
-                st.markdown(final_plot)
-                st.markdown('</div></div>', unsafe_allow_html=True)
-            else:
-                st.warning("No script available / 暂无剧本")
+        view = st.radio(
+            "View / 视图",
+            list(CARD_VIEWS),
+            horizontal=True,
+            key=f"{key}card_view",
+            label_visibility="collapsed",
+        )
+        CARD_VIEWS[view](plot, key)
 
         st.markdown("</div></div>", unsafe_allow_html=True)
 
 # ============== Calibration / Normalization Helpers ==============
 
 def make_df():
-    if not st.session_state.annotations:
-        return pd.DataFrame()
-    return pd.DataFrame(st.session_state.annotations)
+    """DataFrame view of the session's annotation table (cached until the next submit)."""
+    return st.session_state.annotations.to_frame()
 
-def per_annotator_zscore_preview(df: pd.DataFrame):
+def per_annotator_zscore_preview(df: "pd.DataFrame", robust: bool = False):
     """
-    For each annotator, compute mean/std on calibration items only (if exist),
-    then show z-scored overall for non-calibration. Preview only.
+    For each annotator, compute mean/std (or median/MAD) on calibration items only (if exist),
+    then add z-scored `<dim>_z` columns (overall_z, Surprise_z, ...) for non-calibration. Preview only.
     """
-    if df.empty:
-        return df
-    if "annotator_id" not in df.columns or "is_calibration" not in df.columns:
-        return df
+    return zscore_frame(df, SCORE_COLUMNS, robust=robust)
+
+def normalized_df(robust: bool = False):
+    """Session annotations with z-score columns, updated incrementally per submit."""
+    engine = st.session_state.norm
+    engine.set_robust(robust)
+    return engine.normalized_frame(st.session_state.annotations)
+
+# ============== Agreement ==============
+
+def agreement_engine() -> AgreementEngine:
+    """Engine folded forward to the latest rows: the shared log if there is one, else this session's table."""
+    store = get_annotation_store()
+    if store is None:
+        engine = st.session_state.setdefault("agreement", AgreementEngine())
+        engine.sync_table(st.session_state.annotations)
+        return engine
+    engine = get_agreement_engine()
+    with engine.lock:
+        new = store.rows_with_ids(engine.cursor)
+        if new:
+            engine.add_rows(r for _, r in new)
+            engine.cursor = new[-1][0]
+    return engine
+
+@fragment
+def agreement_section():
+    """Inter-annotator agreement dashboard (computed only while it is switched on)."""
+    import pandas as pd
 
-    out = df.copy()
-    out["overall_z"] = None
+    st.divider()
+    st.subheader("📐 Inter-Annotator Agreement | 标注者一致性")
+    if not st.checkbox("Show agreement analytics / 显示一致性分析", key="show_agreement"):
+        return
+    engine = agreement_engine()
+    if not engine.n:
+        st.info("No annotations yet. / 还没有任何标注记录。")
+        return
+    with engine.lock:
+        summary = pd.DataFrame(engine.summary(pairwise=False))
+        st.caption("Krippendorff's alpha (ordinal) and ICC(1) / ICC(1,k) over plots rated by at least two annotators "
+                   "(latest rating per annotator and plot). / 基于至少两位标注者评过的剧本（每人每剧本取最新评分）。")
+        st.dataframe(summary, use_container_width=True, hide_index=True)
+
+        dim = st.selectbox("Dimension / 维度", engine.dims, index=len(engine.dims) - 1, key="agreement_dim")
+        c1, c2 = st.columns(2)
+        with c1:
+            st.markdown("**Pairwise rank correlation / 两两秩相关**")
+            pw = pd.DataFrame(engine.pairwise(dim)).sort_values("n", ascending=False)
+            if pw.empty:
+                st.info("No annotator pairs with enough co-rated plots yet. / 尚无足够共同评分的标注者对。")
+            else:
+                st.dataframe(pw, use_container_width=True, hide_index=True, height=260)
+        with c2:
+            st.markdown("**Drift vs gold consensus / 相对校准题共识的漂移**")
+            drift = pd.DataFrame(engine.drift(dim))
+            if drift.empty:
+                st.info("Needs gold plots rated by at least two annotators. / 需要至少两位标注者评过的校准题。")
+            else:
+                drift = drift.sort_values("bias", key=lambda s: s.abs(), ascending=False)
+                st.dataframe(drift, use_container_width=True, hide_index=True, height=260)
 
-    for aid, g in out.groupby("annotator_id"):
-        calib = g[g["is_calibration"] == True]
-        if len(calib) >= 2:
-            mu = calib["overall"].mean()
-            sd = calib["overall"].std(ddof=0)
-            if sd == 0:
-                sd = 1.0
-            idx = (out["annotator_id"] == aid) & (out["is_calibration"] == False)
-            out.loc[idx, "overall_z"] = (out.loc[idx, "overall"] - mu) / sd
+# ============== Graph Features ==============
 
-    return out
+FEATURE_SCORES = ("Surprise", "Coherence", "Conflict", "overall")
+
+def feature_frame() -> "pd.DataFrame":
+    """Graph metrics of every loaded plot; only plots new to the cache are computed (in worker processes)."""
+    table = st.session_state.features
+    # spawn: forking a server process that runs writer / prefetch threads is not safe
+    table.sync(st.session_state.plots, get_feature_cache(), get_plot_id,
+               mp_context=multiprocessing.get_context("spawn"))
+    return table.to_frame()
+
+def plot_score_means() -> "pd.DataFrame":
+    """Mean latest score per plot (all annotators), indexed by plot_id."""
+    import pandas as pd
+
+    engine = agreement_engine()
+    with engine.lock:
+        means = [pd.Series(m["mean"], index=m["plot_id"], name=f"{dim}_mean")
+                 for dim, m in ((dim, engine.plot_means(dim)) for dim in FEATURE_SCORES)]
+        raters = engine.plot_means("overall")
+    return pd.concat(means + [pd.Series(raters["n"], index=raters["plot_id"], name="raters")], axis=1)
+
+@fragment
+def features_section():
+    """Sortable / filterable graph metrics and their correlation with scores (computed only while shown)."""
+    import pandas as pd
+
+    st.divider()
+    st.subheader("🧬 Graph Features | 因果图结构特征")
+    if not st.checkbox("Show graph features / 显示图结构特征", key="show_features"):
+        return
+    with st.spinner("Extracting graph features... / 正在提取图结构特征..."):
+        df = feature_frame()
+    scores = plot_score_means()
+    df = df.join(scores, on="plot_id")
+
+    c1, c2, c3 = st.columns([2, 1, 2])
+    with c1:
+        column = st.selectbox("Filter column / 筛选列", ["—"] + list(df.columns), key="feature_filter_col")
+    if column != "—":
+        flag = pd.api.types.is_bool_dtype(df[column])
+        numeric = pd.api.types.is_numeric_dtype(df[column]) and not flag
+        if numeric:
+            ops = [op for op in FILTER_OPS if op != "contains"]
+        else:
+            ops = ["==", "!="] if flag else ["contains", "==", "!="]
+        with c2:
+            kind = "num" if numeric else "flag" if flag else "text"
+            op = st.selectbox("Operator / 运算符", ops, key=f"feature_filter_op_{kind}")
+        with c3:
+            if numeric:
+                value = st.number_input("Value / 值", value=0.0, key="feature_filter_num")
+            elif flag:
+                value = st.selectbox("Value / 值", [True, False], key="feature_filter_flag")
+            else:
+                value = st.text_input("Value / 值", key="feature_filter_text")
+        if value != "":
+            df = df[filter_mask(df, column, op, value)]
+    st.caption(f"{len(df)} plots · click a column header to sort / 共 {len(df)} 个剧本，点击列名排序")
+    st.dataframe(df, use_container_width=True, hide_index=True, height=320)
+
+    st.markdown("**Spearman correlation with mean scores / 与平均分的 Spearman 相关**")
+    metrics = [c for c in df.columns if c not in scores.columns and pd.api.types.is_numeric_dtype(df[c])
+               and not pd.api.types.is_bool_dtype(df[c])]
+    rated = df[df["raters"].notna()]
+    if len(rated) < 3:
+        st.info("Needs at least 3 rated plots. / 至少需要 3 个已评分的剧本。")
+        return
+    cols = [f"{dim}_mean" for dim in FEATURE_SCORES]
+    corr = rated[metrics + cols].corr(method="spearman").loc[metrics, cols]
+    st.dataframe(corr.round(2), use_container_width=True, height=320)
+
+# ============== Pairwise (A/B) ==============
+
+COMPARE_LABELS = {"A": "🅰️ A", "tie": "Tie / 平局", "B": "🅱️ B"}
+
+def rating_engine() -> RatingEngine:
+    """Engine folded forward to the latest comparisons: the shared log if there is one, else this session's."""
+    store = get_annotation_store()
+    if store is None:
+        engine = st.session_state.setdefault("ratings", RatingEngine())
+        engine.sync_list(st.session_state.comparisons)
+        return engine
+    engine = get_rating_engine()
+    with engine.lock:
+        new = store.comparisons(after_id=engine.cursor)
+        if new:
+            engine.add_rows(r for _, r in new)
+            engine.cursor = new[-1][0]
+    return engine
+
+def pairwise_section(index: CorpusIndex, rows, dims):
+    """Two plots side by side, the A/B form and the leaderboard."""
+    last = len(index) - 1
+    if last < 1:
+        st.info("Load at least 2 plots to compare. / 请至少加载 2 个剧本以进行对比。")
+        return
+    ra, rb = st.session_state.pair_rows or (0, 1)
+    ra, rb = min(ra, last), min(rb, last)
+
+    top = st.columns([1, 1, 1, 2])
+    with top[0]:
+        opts = rows if ra in rows else [ra] + rows
+        ra = st.selectbox("Plot A / 剧本 A", opts, index=opts.index(ra), format_func=index.label)
+    with top[1]:
+        opts = rows if rb in rows else [rb] + rows
+        rb = st.selectbox("Plot B / 剧本 B", opts, index=opts.index(rb), format_func=index.label)
+    with top[2]:
+        if st.button("🎯 Next Pair / 下一对", disabled=not st.session_state.get("annotator_id")):
+            engine = rating_engine()
+            with engine.lock:
+                pair = engine.next_pair(index.cols["plot_id"], st.session_state.annotator_id,
+                                        seed=f"{st.session_state.get('sched_seed', 0)}:{st.session_state.annotator_id}:{engine.n}")
+            if pair is None:
+                st.session_state.sched_msg = "You have compared every available pair. / 你已对比过所有可选的剧本对。"
+            else:
+                st.session_state.pair_rows = tuple(index.row_of(pid) for pid in pair)
+            st.rerun()
+    with top[3]:
+        st.caption("Tip: Next Pair picks the comparison that tells the ratings the most (close, rarely compared plots you have not judged together). / 提示：“下一对”会挑选信息量最大的对比（实力接近、对比次数少、且你未对比过的剧本）。")
+        if st.session_state.get("sched_msg"):
+            st.info(st.session_state.pop("sched_msg"))
+    st.session_state.pair_rows = (int(ra), int(rb))
+
+    if ra == rb:
+        st.warning("Pick two different plots. / 请选择两个不同的剧本。")
+    else:
+        plot_a, plot_b = st.session_state.plots[ra], st.session_state.plots[rb]
+        c1, c2 = st.columns(2)
+        with c1:
+            st.markdown("### 🅰️ Plot A / 剧本 A")
+            render_card(plot_a, key="a_")
+        with c2:
+            st.markdown("### 🅱️ Plot B / 剧本 B")
+            render_card(plot_b, key="b_")
+        comparison_section(plot_a, plot_b, dims)
+    ratings_section(index)
+
+@fragment
+def comparison_section(plot_a, plot_b, dims):
+    """A/B form. Its widgets rerun only this fragment; a saved comparison reruns the app (see rerun_app)."""
+    st.divider()
+    st.subheader("⚖️ Pairwise Comparison (A vs B) | 两两对比（A 对 B）")
+
+    if not st.session_state.get("annotator_id"):
+        st.warning("Please fill in annotator_id on the left sidebar (required) before submitting. / 请先在左侧填写 annotator_id（必填），否则不允许提交。")
+        return
+
+    notice = st.session_state.pop("saved_notice", None)
+    if notice:
+        st.success(notice)
+
+    with st.form("compare_form", clear_on_submit=False):
+        st.markdown("For each dimension, which plot is **better**? / 每个维度上哪个剧本 **更好**？")
+        choice = {}
+        for key, desc in dims + [("overall", "Overall rating | 整体评价")]:
+            choice[key] = st.radio(f"{key} ({desc})", list(COMPARE_LABELS), index=1,
+                                   format_func=COMPARE_LABELS.get, horizontal=True, key=f"C_{key}")
+        st.markdown("---")
+        confidence = st.select_slider(
+            "Confidence (Your certainty about this rating) / 置信度（你对本次评分的把握）",
+            options=["low", "mid", "high"], value="mid", key="C_Confidence",
+        )
+        notes = st.text_area("Notes (Optional) / 备注（可选）", key="C_Notes", height=80)
+
+        if st.form_submit_button("✅ Submit Comparison / 提交对比"):
+            row = {
+                "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+                "annotator_id": st.session_state.annotator_id,
+                "plot_a": get_plot_id(plot_a),
+                "plot_b": get_plot_id(plot_b),
+                "plot_a_title": safe_get(plot_a, "title", ""),
+                "plot_b_title": safe_get(plot_b, "title", ""),
+                **choice,
+                "confidence": confidence,
+                "notes": notes.strip(),
+            }
+            store = get_annotation_store()
+            saved = True
+            if store is not None:
+                try:
+                    store.append_comparison(row)
+                except Exception as e:
+                    saved = False
+                    st.error(f"Could not write to the annotation log: {e} / 写入标注日志失败：{e}")
+            st.session_state.comparisons.append(row)
+            if saved:
+                # the sidebar counter and the leaderboard live outside this fragment
+                st.session_state.saved_notice = f"Comparison saved ✅ Total: {len(st.session_state.comparisons)} / 已保存对比 ✅ 当前累计 {len(st.session_state.comparisons)} 条"
+                rerun_app()
+            else:
+                st.warning(f"Comparison kept in this session only (not in the log): export it before closing the page. "
+                           f"Total in session: {len(st.session_state.comparisons)} / "
+                           f"该对比仅保存在当前会话中（未写入日志），请在关闭页面前导出。当前会话累计 {len(st.session_state.comparisons)} 条")
+
+@fragment
+def ratings_section(index: CorpusIndex):
+    """ELO + Bradley-Terry leaderboard over all comparisons, and this session's download."""
+    import pandas as pd
+
+    st.divider()
+    st.subheader("🏆 Leaderboard (ELO / Bradley-Terry) | 排行榜")
+    engine = rating_engine()
+    if not engine.n:
+        st.info("No comparisons yet. / 还没有任何对比记录。")
+        return
+    dim = st.selectbox("Dimension / 维度", engine.dims, index=len(engine.dims) - 1, key="rating_dim")
+    with engine.lock:
+        fit = engine.fit(dim)
+        n = engine.n
+    board = pd.DataFrame({k: v for k, v in fit.items() if k != "iterations"})
+    board.insert(1, "title", [index.cols["title"][r] if r is not None else "" for r in map(index.row_of, board["plot_id"])])
+    st.caption(f"{n} comparisons. Bradley-Terry rating with 95% interval (ELO scale, 1500 = average); "
+               f"elo = sequential ELO (K=32). / 共 {n} 条对比；Bradley-Terry 评分及 95% 置信区间（ELO 刻度）。")
+    st.dataframe(board.round(1), use_container_width=True, hide_index=True, height=320)
+
+    if st.session_state.comparisons:
+        fmt, incremental = export_options()
+        download_export("⬇️ Download comparisons / 下载对比记录", pd.DataFrame(st.session_state.comparisons),
+                        "comparisons", "plot_comparisons", fmt, incremental)
+
+# ============== Export ==============
+
+def export_options():
+    """Format + scope controls shared by the download buttons."""
+    c1, c2 = st.columns([1, 2])
+    with c1:
+        fmt = st.selectbox("Export format / 导出格式", available_formats(), format_func=str.upper, key="export_fmt")
+    with c2:
+        incremental = st.checkbox("Only rows added since the last export / 仅导出上次导出后新增的记录",
+                                  key="export_incremental")
+    return fmt, incremental
+
+def download_export(label, df, name, file_stem, fmt, incremental, generation=None):
+    """
+    Download button whose file is built in chunks only when clicked (see export.py), plus a
+    button that moves the export checkpoint. A browser download can fail or be cancelled
+    without the app knowing, so rows only count as exported once the annotator confirms.
+    """
+    checkpoints = st.session_state.export_checkpoints
+    lo, hi = checkpoints.pending(name, len(df), generation)
+    if incremental:
+        label += f" · {hi - lo} new / 新增 {hi - lo} 条"
+    mime, ext = FORMATS[fmt]
+    disabled = incremental and hi == lo
+    try:
+        st.download_button(label, data=deferred(lambda: df, fmt, checkpoints, name, incremental, generation),
+                           file_name=file_stem + ext, mime=mime, on_click="ignore", disabled=disabled)
+    except (StreamlitAPIException, TypeError):
+        # Streamlit without deferred downloads: build the file now
+        st.download_button(label, data=export_frame(df.iloc[lo if incremental else 0:hi], fmt),
+                           file_name=file_stem + ext, mime=mime, disabled=disabled)
+    # a regular button: its click reruns the script, so the "new rows" label above is recounted
+    st.button(f"✅ Mark {hi - lo} new rows as exported / 将 {hi - lo} 条新增记录标记为已导出",
+              key=f"export_mark_{name}", disabled=hi == lo,
+              on_click=checkpoints.mark, args=(name, hi, generation),
+              help="Click after the file was saved; until then the rows stay in the next incremental export. / "
+                   "文件保存后再点击；在此之前这些记录仍会包含在下一次增量导出中。")
 
 # ============== Main ==============
 
+PLOT_PAGE_SIZE = 50      # options per page in the plot selector
+GOLD_SEARCH_LIMIT = 20   # search hits offered in the gold picker
+
 def main():
+    setup_page()
     init_state()
     st.title("🚀 Plot Annotation Tool | 剧本标注工具 (v5.3)")
 
@@ -361,6 +867,8 @@ def main():
             value=st.session_state.get("annotator_id", "")
         )
         st.session_state.annotator_id = annotator_id
+        restore_annotations(annotator_id)
+        mode = st.radio("Mode / 模式", ["Absolute (1-10) / 绝对评分", "Pairwise A/B / 两两对比"], key="annot_mode")
 
         st.divider()
         st.subheader("📂 Data Upload / 数据上传")
@@ -373,60 +881,115 @@ def main():
 
         st.metric("Plots Loaded / 已加载剧本", len(st.session_state.plots))
         st.metric("Annotations Saved / 已保存标注", len(st.session_state.annotations))
+        st.metric("Comparisons Saved / 已保存对比", len(st.session_state.comparisons))
 
         if st.button("🗑️ Clear All Plots / 清空所有剧本"):
-            st.session_state.plots = []
+            st.session_state.plots.clear()
+            st.session_state.ingest.reset()
             st.session_state.gold_ids = set()
             st.session_state.sel_idx = 0
+            st.session_state.pair_rows = None
             st.rerun()
 
-        if st.button("🗑️ Clear All Annotations / 清空所有标注"):
-            st.session_state.annotations = []
+        if st.button("🗑️ Clear All Annotations / 清空所有标注",
+                     help="Clears this session's list; rows already written to the annotation log are kept. / 仅清空当前会话列表；已写入日志的记录会保留。"):
+            st.session_state.annotations.clear()
+            st.session_state.comparisons = []
             st.rerun()
 
         st.divider()
         st.subheader("🏆 Calibration (Gold) / 校准题")
         st.caption("Select 1-3 plots as calibration items (for normalizing scales across annotators) / 选择 1-3 个 plot 作为校准题（用于归一化不同标注者的尺度）")
-        if st.session_state.plots:
-            title_map = {f"{i}: {safe_get(p,'title','Untitled')}": get_plot_id(p)
-                         for i, p in enumerate(st.session_state.plots)}
-            gold_keys = st.multiselect(
+        index = st.session_state.corpus_index
+        index.sync(st.session_state.plots)
+        if len(index):
+            gold_query = st.text_input("Find Gold Plots / 查找校准剧本", key="gold_query")
+            gold_rows = sorted(r for r in map(index.row_of, st.session_state.gold_ids) if r is not None)
+            _, found = index.search(gold_query, limit=GOLD_SEARCH_LIMIT)
+            gold_rows = st.multiselect(
                 "Select Gold Plots / 选择校准剧本",
-                options=list(title_map.keys()),
-                default=[],
+                options=gold_rows + [r for r in found if r not in gold_rows],
+                default=gold_rows,
+                format_func=index.label,
             )
-            st.session_state.gold_ids = set(title_map[k] for k in gold_keys)
+            st.session_state.gold_ids = set(index.cols["plot_id"][r] for r in gold_rows)
+
+        st.divider()
+        st.subheader("🎯 Assignment / 任务分配")
+        st.session_state.scheduler.configure(
+            target_per_plot=st.number_input("Target ratings per plot / 每个剧本目标评分数", 1, 100, 3, 1, key="sched_target"),
+            gold_rate=st.slider("Gold injection rate / 校准题插入比例", 0.0, 0.5, 0.1, 0.05, key="sched_gold_rate"),
+            seed=st.number_input("Seed / 随机种子", 0, 2**31 - 1, 0, 1, key="sched_seed"),
+        )
 
     # --- Need data ---
     if len(st.session_state.plots) < 1:
         st.info("👈 Please upload at least 1 JSON file / 请上传至少 1 个 JSON 文件")
         return
 
-    # --- Plot Selection ---
-    titles = [safe_get(p, "title", f"Plot {i}") for i, p in enumerate(st.session_state.plots)]
-    max_idx = len(titles) - 1
+    # --- Plot Selection (server-side search + paging; only one page of options is sent) ---
+    max_idx = len(index) - 1
+    sel = min(int(st.session_state.sel_idx), max_idx)
+
+    search_cols = st.columns([3, 1])
+    with search_cols[0]:
+        query = st.text_input(
+            "Search Plots / 搜索剧本",
+            key="plot_query",
+            placeholder="title / genre / method / seed ...",
+        )
+    total, _ = index.search(query, limit=0)
+    pages = max(1, -(-total // PLOT_PAGE_SIZE))
+    if st.session_state.get("plot_page", 1) > pages:
+        st.session_state.plot_page = 1
+    with search_cols[1]:
+        page = st.number_input(f"Page / 页 (1-{pages})", min_value=1, max_value=pages, step=1, key="plot_page")
+    _, rows = index.search(query, offset=(int(page) - 1) * PLOT_PAGE_SIZE, limit=PLOT_PAGE_SIZE)
+    if mode.startswith("Pairwise"):
+        pairwise_section(index, rows, dims)
+        return
+    options = rows if sel in rows else [sel] + rows
 
     top = st.columns([1, 1, 3])
     with top[0]:
         idx = st.selectbox(
             "Select Plot / 选择剧本",
-            range(len(titles)),
-            index=int(st.session_state.sel_idx),
-            format_func=lambda i: titles[i],
-            key="sel_plot"
+            options,
+            index=options.index(sel),
+            format_func=index.label,
+            help=f"{total} matching plots / 共 {total} 个匹配剧本",
         )
     with top[1]:
-        if st.button("🎲 Random Plot / 随机选择"):
-            st.session_state.sel_idx = random.randint(0, max_idx)
+        if st.button("🎯 Next Assigned Plot / 下一个分配剧本", disabled=not st.session_state.get("annotator_id")):
+            sync_scheduler(index)
+            pid = st.session_state.scheduler.next_for(st.session_state.annotator_id)
+            row = index.row_of(pid) if pid is not None else None
+            if row is None:
+                st.session_state.sched_msg = "All plots reached their target or were rated by you. / 所有剧本均已达到目标评分数或已被你评过。"
+            else:
+                st.session_state.sel_idx = row
             st.rerun()
     with top[2]:
-        st.caption("Tip: Random Plot reduces selection bias; Gold plots calibrate annotator scales. / 提示：随机选择可减少挑选偏差；校准题用于归一化不同标注者的尺度。")
+        st.caption("Tip: Next Assigned Plot picks the least-covered plot you have not rated (with gold plots mixed in); Gold plots calibrate annotator scales. / 提示：“下一个分配剧本”会挑选评分最少且你未评过的剧本（并穿插校准题）；校准题用于归一化不同标注者的尺度。")
+        if st.session_state.get("sched_msg"):
+            st.info(st.session_state.pop("sched_msg"))
 
     st.session_state.sel_idx = int(idx)
 
     plot = st.session_state.plots[st.session_state.sel_idx]
     render_card(plot)
-
+    scoring_section(plot, dims)
+    agreement_section()
+    features_section()
+    # runs while this plot is being read and scored
+    prefetch_next(index, st.session_state.sel_idx, options)
+
+@fragment
+def scoring_section(plot, dims):
+    """
+    Scoring form + collected annotations. Preview / export / normalization widgets rerun
+    only this fragment; a saved annotation reruns the app (see rerun_app).
+    """
     # --- Scoring Form ---
     st.divider()
     st.subheader("⚖️ Scoring / Annotation (1-10) | 评分 / 标注（1-10）")
@@ -438,8 +1001,12 @@ def main():
     pid = get_plot_id(plot)
     is_calibration = (pid in st.session_state.gold_ids)
 
-    seed = safe_get(plot, "seed_id", safe_get(plot, "seed", ""))
-    method = safe_get(plot, "method_name", safe_get(plot, "method", safe_get(plot, "system", "")))
+    seed = get_seed_id(plot)
+    method = get_method_name(plot)
+
+    notice = st.session_state.pop("saved_notice", None)
+    if notice:
+        st.success(notice)
 
     with st.form("score_form", clear_on_submit=False):
         if is_calibration:
@@ -498,8 +1065,23 @@ def main():
             for k, _ in dims:
                 row[k] = int(scores[k])
 
+            store = get_annotation_store()
+            saved = True
+            if store is not None:
+                try:
+                    store.append(row)
+                except Exception as e:
+                    saved = False
+                    st.error(f"Could not write to the annotation log: {e} / 写入标注日志失败：{e}")
             st.session_state.annotations.append(row)
-            st.success(f"Annotation saved ✅ Total: {len(st.session_state.annotations)} / 已保存标注 ✅ 当前累计 {len(st.session_state.annotations)} 条")
+            if saved:
+                # counters outside this fragment (sidebar, progress) need a full rerun to update
+                st.session_state.saved_notice = f"Annotation saved ✅ Total: {len(st.session_state.annotations)} / 已保存标注 ✅ 当前累计 {len(st.session_state.annotations)} 条"
+                rerun_app()
+            else:
+                st.warning(f"Annotation kept in this session only (not in the log): export it before closing the page. "
+                           f"Total in session: {len(st.session_state.annotations)} / "
+                           f"该标注仅保存在当前会话中（未写入日志），请在关闭页面前导出。当前会话累计 {len(st.session_state.annotations)} 条")
 
     # --- Data Preview / Export ---
     st.divider()
@@ -512,33 +1094,26 @@ def main():
 
     st.dataframe(df, use_container_width=True, height=320)
 
-    csv_bytes = df.to_csv(index=False).encode("utf-8")
-    st.download_button(
-        "⬇️ Download CSV (raw) / 下载 CSV（原始数据）",
-        data=csv_bytes,
-        file_name="plot_annotations_raw.csv",
-        mime="text/csv"
-    )
+    fmt, incremental = export_options()
+    generation = st.session_state.annotations.generation
+    download_export("⬇️ Download (raw) / 下载（原始数据）", df, "raw", "plot_annotations_raw", fmt, incremental,
+                    generation)
 
     # --- Normalization preview based on calibration items ---
     st.markdown("### 🧪 Normalization Preview (based on Gold/Calibration) | 归一化预览（基于校准题）")
-    st.caption("Preview only: for each annotator, z-score using mean/std from their calibration records. / 仅预览：对每个标注者，用其校准题的 overall 均值/方差做 z-score。")
-    df_norm = per_annotator_zscore_preview(df)
+    st.caption("Preview only: for each annotator, z-score every dimension using mean/std from their calibration records. / 仅预览：对每个标注者，用其校准题各维度的均值/方差做 z-score。")
+    robust = st.checkbox("Robust (median / MAD) / 稳健模式（中位数 / MAD）", key="norm_robust")
+    df_norm = normalized_df(robust=robust)
 
     show_cols = [
         "timestamp_utc", "annotator_id", "is_calibration",
-        "plot_title", "overall", "overall_z", "confidence", "notes"
-    ]
+        "plot_title", "overall", "overall_z",
+    ] + [f"{k}_z" for k, _ in dims] + ["confidence", "notes"]
     show_cols = [c for c in show_cols if c in df_norm.columns]
     st.dataframe(df_norm[show_cols], use_container_width=True, height=260)
 
-    csv_norm = df_norm.to_csv(index=False).encode("utf-8")
-    st.download_button(
-        "⬇️ Download CSV (with overall_z) / 下载 CSV（含归一化分数）",
-        data=csv_norm,
-        file_name="plot_annotations_with_overall_z.csv",
-        mime="text/csv"
-    )
+    download_export("⬇️ Download (with z-scores) / 下载（含归一化分数）", df_norm, "z",
+                    "plot_annotations_with_overall_z", fmt, incremental, generation)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,472 @@
+"""
+Scaling benchmarks on synthetic data (no Streamlit).
+
+    python benchmark.py --out bench.json                       # default size sweep
+    python benchmark.py --quick                                # small sizes, one repeat
+    python benchmark.py --rows 1000,1000000 --compare bench.json
+
+Synthetic corpora scale the structure of merged_data.json (`--template`): plots keep
+a template's fields, and their causal graph (events, edges, conflicts, characters),
+story tree (depth x branching) and script (acts / scenes up to a target size) are
+grown from the template's own nodes, lines and scenes. Annotation logs are generated
+with per-annotator bias, per-plot quality, noise and a share of gold plots.
+
+Each size axis is swept on its own, timing the code path the app runs:
+
+- plots        load_json (IngestLedger into a fresh CorpusStore)
+- events       get_graph_data (cold / cached), create_causal_chart
+- tree_depth   parse_tree_text_to_graphviz
+- script_kb    script outline + first page of markdown (script_view.py)
+- rows         make_df (AnnotationTable append + to_frame),
+               per_annotator_zscore_preview (zscore_frame), CSV export (export.py)
+
+Every case runs `--repeat` times on fresh state after one untimed warm-up; best and median
+seconds are reported. Results are one JSON document; `--compare` flags cases slower than a
+previous run by more than `--tolerance`. It needs at least COMPARE_REPEAT runs per case, and
+cases under `--min-seconds` in both runs are listed as skipped (timer noise, not regressions).
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TEMPLATE = os.path.join(HERE, "merged_data.json")
+
+DEFAULT_SIZES = {
+    "plots": "100,1000,5000",
+    "events": "10,50,200,1000",
+    "tree_depth": "3,5,7",
+    "script_kb": "16,128,1024",
+    "rows": "1000,10000,100000",
+}
+QUICK_SIZES = {
+    "plots": "50,200",
+    "events": "10,100",
+    "tree_depth": "3,5",
+    "script_kb": "16,64",
+    "rows": "1000,10000",
+}
+COMPARE_REPEAT = 3      # fewest runs per case --compare trusts
+MIN_SECONDS = 0.001     # --compare skips cases faster than this in both runs
+
+
+# ============== synthetic data ==============
+
+def load_templates(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as fh:
+        content = json.load(fh)
+    plots = [p for p in (content if isinstance(content, list) else [content]) if isinstance(p, dict)]
+    for p in plots:
+        if isinstance(p.get("causal_graph"), str):
+            try:
+                p["causal_graph"] = json.loads(p["causal_graph"])
+            except ValueError:
+                p["causal_graph"] = None
+    plots = [p for p in plots if isinstance(p.get("causal_graph"), dict) and p.get("pruned_tree") and p.get("final_plot")]
+    if not plots:
+        raise SystemExit(f"no usable template plots (causal_graph + pruned_tree + final_plot) in {path}")
+    return plots
+
+
+def synthetic_graph(template: dict, events: int, rng: random.Random) -> dict:
+    """Causal graph with `events` events: a causal spine, extra forward edges, conflicts."""
+    g = template["causal_graph"]
+    src_nodes = g.get("event_nodes") or [{"name": "Event", "type": "escalation"}]
+    characters = list(g.get("characters") or [])
+    names = [c.get("name", str(c)) if isinstance(c, dict) else str(c) for c in characters]
+    while len(names) < max(3, events // 8):
+        names.append(f"Character {len(names) + 1}")
+        characters.append({"name": names[-1], "role": "supporting"})
+
+    n_phases = max(1, events // 6)
+    nodes = []
+    for k in range(events):
+        phase = k * n_phases // events
+        src = src_nodes[k % len(src_nodes)]
+        kind = "climax" if k >= events - max(1, events // 10) else \
+            "milestone" if k == 0 or (k * n_phases // events) != ((k - 1) * n_phases // events) else "escalation"
+        nodes.append({
+            "id": f"{phase + 3}.{k + 1}",
+            "name": f"{src.get('name', 'Event')} ({k + 1})",
+            "type": kind,
+            "characters_involved": rng.sample(names, min(len(names), rng.randint(1, 3))),
+        })
+    ids = [n["id"] for n in nodes]
+    edges = [{"from": a, "to": b, "type": "causal", "description": "leads to"} for a, b in zip(ids, ids[1:])]
+    for _ in range(events // 6):
+        a = rng.randrange(events - 1)
+        b = rng.randrange(a + 1, events)
+        edges.append({"from": ids[a], "to": ids[b], "type": rng.choice(["concurrent", "catalyst", "causal"]),
+                      "description": "also affects"})
+    conflict_types = [c.get("type") for c in g.get("conflicts") or () if c.get("type")] or ["Person vs. Person"]
+    conflicts = []
+    for k in range(int(events * 0.8)):
+        pair = rng.sample(names, 2) if len(names) > 1 else names * 2
+        conflicts.append({"event_id": ids[rng.randrange(events)], "type": rng.choice(conflict_types),
+                          "character1": pair[0], "character2": pair[1], "description": "they clash"})
+    return {"characters": characters, "event_nodes": nodes, "conflicts": conflicts, "edges": edges}
+
+
+def synthetic_tree(template: dict, depth: int, branching: int) -> str:
+    """Story tree text (template line format) with every node at depth < `depth` having `branching` children."""
+    labels = [line.strip().lstrip("*").strip().split(" ", 1)[-1]
+              for line in template["pruned_tree"].splitlines() if line.strip()] or ["Event"]
+    lines, count = [], 0
+
+    def walk(level, number):
+        nonlocal count
+        label = labels[count % len(labels)]
+        count += 1
+        lines.append(f"{'    ' * level}* {number} {label}")
+        if level + 1 < depth:
+            for c in range(1, branching + 1):
+                walk(level + 1, f"{level + 2}.{c}")
+
+    walk(0, "1.0")
+    return "\n".join(lines)
+
+
+def synthetic_script(template: dict, kb: int) -> str:
+    """Markdown script of about `kb` KB: acts of scenes whose bodies cycle through the template's text."""
+    body = [line for line in template["final_plot"].splitlines() if line.strip() and not line.lstrip().startswith("#")]
+    title = template.get("title", "Untitled")
+    parts = [f"# **{title}**\n"]
+    size, scene = len(parts[0].encode("utf-8")), 0
+    while size < kb * 1024:
+        if scene % 4 == 0:
+            parts.append(f"\n### **Act {scene // 4 + 1}**\n")
+            size += len(parts[-1])
+        scene += 1
+        text = "\n\n".join(body[(scene * 5 + k) % len(body)] for k in range(5))
+        parts.append(f"\n#### **Scene {scene}**\n\n{text}\n")
+        size += len(parts[-1].encode("utf-8"))
+    return "".join(parts)
+
+
+def synthetic_corpus(templates: list, n_plots: int, events: int = None, tree_depth: int = None,
+                     tree_branching: int = 3, script_kb: int = None, seed: int = 0) -> list:
+    """`n_plots` plots cycling through the templates; None keeps the template's own size for that part."""
+    rng = random.Random(seed)
+    plots = []
+    for i in range(n_plots):
+        t = templates[i % len(templates)]
+        plot = {k: v for k, v in t.items()}
+        plot["title"] = f"{t.get('title', 'Untitled')} #{i}"
+        plot["seed_id"] = f"seed-{i % 97}"
+        plot["method_name"] = f"method-{i % 5}"
+        graph = synthetic_graph(t, events, rng) if events else t["causal_graph"]
+        plot["causal_graph"] = json.dumps(graph, ensure_ascii=False)   # stored as a JSON string, like the template
+        if tree_depth:
+            plot["pruned_tree"] = synthetic_tree(t, tree_depth, tree_branching)
+        if script_kb:
+            plot["final_plot"] = synthetic_script(t, script_kb)
+        plots.append(plot)
+    return plots
+
+
+def synthetic_annotations(n_rows: int, plot_ids: list, n_annotators: int = 50, gold: int = 3,
+                          gold_rate: float = 0.1, seed: int = 0) -> list:
+    """Rows shaped like the scoring form's: annotator bias + plot quality + noise, 1-10 integers."""
+    from annotation_table import SCORE_COLUMNS
+
+    rng = random.Random(seed)
+    bias = [rng.gauss(0, 1) for _ in range(n_annotators)]
+    quality = {pid: rng.gauss(6, 1.5) for pid in plot_ids}
+    gold_ids = plot_ids[:gold]
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(n_rows):
+        a = i % n_annotators
+        is_gold = rng.random() < gold_rate
+        pid = rng.choice(gold_ids) if is_gold else rng.choice(plot_ids)
+        row = {
+            "timestamp_utc": (start + timedelta(seconds=i)).isoformat(timespec="seconds"),
+            "annotator_id": f"annotator-{a}",
+            "is_calibration": is_gold,
+            "plot_id": pid,
+            "plot_title": pid.split("||")[0],
+            "plot_genre": "",
+            "plot_status": "",
+            "seed_id": "",
+            "method_name": "",
+            "confidence": rng.choice(["low", "mid", "high"]),
+            "notes": "" if rng.random() < 0.8 else "synthetic note",
+        }
+        for dim in SCORE_COLUMNS:
+            row[dim] = int(min(10, max(1, round(quality[pid] + bias[a] + rng.gauss(0, 1)))))
+        rows.append(row)
+    return rows
+
+
+# ============== timing ==============
+
+def timed(run, setup=None, repeat: int = 3, warmup: bool = True):
+    """Run `run(state)` on fresh `setup()` state `repeat` times -> (seconds per run, last result).
+
+    An untimed first run (`warmup`) keeps lazy imports and first-call setup out of the numbers.
+    """
+    times, result = [], None
+    if warmup:
+        run(setup() if setup is not None else None)
+    for _ in range(max(1, repeat)):
+        state = setup() if setup is not None else None
+        t0 = time.perf_counter()
+        result = run(state)
+        times.append(time.perf_counter() - t0)
+    return times, result
+
+
+def record(case: str, axis: str, size, times: list, items: int = None, **extra) -> dict:
+    best = min(times)
+    out = {"case": case, "axis": axis, "size": size, "repeat": len(times),
+           "seconds_best": round(best, 6), "seconds_median": round(statistics.median(times), 6)}
+    if items:
+        out["items"] = items
+        out["per_item_us"] = round(best / items * 1e6, 3)
+    out.update(extra)
+    return out
+
+
+# ============== cases ==============
+
+def bench_plots(templates, sizes, repeat, seed) -> list:
+    from corpus_store import CorpusStore, CorpusView
+    from ingest import IngestLedger
+    from plot_utils import get_plot_id
+
+    out = []
+    for n in sizes:
+        data = json.dumps(synthetic_corpus(templates, n, seed=seed), ensure_ascii=False).encode("utf-8")
+        dirs = []
+
+        def setup():
+            f = io.BytesIO(data)
+            f.name = f"synthetic_{n}.json"
+            dirs.append(tempfile.mkdtemp(prefix="bench_corpus_"))
+            return f, CorpusStore(dirs[-1], id_fn=get_plot_id)
+
+        def run(state):
+            f, store = state
+            added = IngestLedger().ingest([f], CorpusView(store), get_plot_id)
+            store.close()
+            return added
+
+        try:
+            times, added = timed(run, setup, repeat)
+        finally:
+            for d in dirs:
+                shutil.rmtree(d, ignore_errors=True)
+        out.append(record("load_json", "plots", n, times, items=added, bytes=len(data)))
+    return out
+
+
+def bench_events(templates, sizes, repeat, seed) -> list:
+    import charts
+    from render_cache import RenderCache
+
+    out = []
+    for n in sizes:
+        plot = synthetic_corpus(templates, 1, events=n, seed=seed)[0]
+        edges = len(json.loads(plot["causal_graph"])["edges"])
+
+        times, data = timed(lambda cache: charts.graph_data(plot, cache), lambda: RenderCache(max_entries=8), repeat)
+        out.append(record("get_graph_data", "events", n, times, edges=edges))
+
+        warm = RenderCache(max_entries=8)
+        charts.graph_data(plot, warm)
+        times, _ = timed(lambda _: charts.graph_data(plot, warm), repeat=repeat)
+        out.append(record("get_graph_data_cached", "events", n, times, edges=edges))
+
+        if charts.HAS_GRAPHVIZ:
+            times, chart = timed(lambda _: charts.create_causal_chart(data), repeat=repeat)
+            out.append(record("create_causal_chart", "events", n, times, edges=edges,
+                              dot_bytes=len(chart.source) if chart is not None else 0))
+        else:
+            out.append({"case": "create_causal_chart", "axis": "events", "size": n, "skipped": "graphviz not installed"})
+    return out
+
+
+def bench_tree(templates, sizes, repeat, seed, branching) -> list:
+    import charts
+    from story_tree import parse_tree
+
+    out = []
+    for depth in sizes:
+        text = synthetic_tree(templates[0], depth, branching)
+        nodes = len(parse_tree(text))
+        if charts.HAS_GRAPHVIZ:
+            times, chart = timed(lambda _: charts.parse_tree_text_to_graphviz(text), parse_tree.cache_clear, repeat)
+            out.append(record("parse_tree_text_to_graphviz", "tree_depth", depth, times, items=nodes,
+                              branching=branching, dot_bytes=len(chart.source) if chart is not None else 0))
+        else:
+            out.append({"case": "parse_tree_text_to_graphviz", "axis": "tree_depth", "size": depth,
+                        "skipped": "graphviz not installed"})
+        times, _ = timed(lambda _: parse_tree(text), parse_tree.cache_clear, repeat)   # parse_tree is memoized
+        out.append(record("parse_tree", "tree_depth", depth, times, items=nodes, branching=branching))
+    return out
+
+
+def bench_script(templates, sizes, repeat, seed) -> list:
+    from script_view import split_sections
+
+    out = []
+    for kb in sizes:
+        text = synthetic_script(templates[0], kb)
+
+        def run(_):
+            sections = split_sections(text)
+            page = sections[:3]
+            return sections, text[page[0]["start"]:page[-1]["end"]]
+
+        times, (sections, page) = timed(run, repeat=repeat)
+        out.append(record("script_first_page", "script_kb", kb, times, sections=len(sections),
+                          script_bytes=len(text.encode("utf-8")), page_bytes=len(page.encode("utf-8"))))
+    return out
+
+
+def bench_rows(templates, sizes, repeat, seed, n_annotators) -> list:
+    from annotation_table import SCORE_COLUMNS, AnnotationTable
+    from export import export_frame
+    from normalization import zscore_frame
+    from plot_utils import get_plot_id
+
+    plot_ids = [get_plot_id(p) for p in synthetic_corpus(templates, 500, seed=seed)]
+    out = []
+    for n in sizes:
+        rows = synthetic_annotations(n, plot_ids, n_annotators, seed=seed)
+
+        times, table = timed(lambda _: AnnotationTable.from_rows(rows), repeat=repeat)
+        out.append(record("annotation_table_append", "rows", n, times, items=n))
+
+        times, df = timed(lambda t: t.to_frame(), lambda: AnnotationTable.from_rows(rows), repeat)
+        out.append(record("make_df", "rows", n, times, items=n))
+
+        times, _ = timed(lambda _: zscore_frame(df, SCORE_COLUMNS), repeat=repeat)
+        out.append(record("per_annotator_zscore_preview", "rows", n, times, items=n, annotators=n_annotators))
+
+        times, size = timed(lambda _: len(export_frame(df, "csv")), repeat=repeat)
+        out.append(record("export_csv", "rows", n, times, items=n, bytes=size))
+    return out
+
+
+# ============== main ==============
+
+def _sizes(text: str) -> list:
+    return [int(x) for x in str(text).split(",") if x.strip()]
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def compare(results: list, baseline_path: str, tolerance: float, min_seconds: float = MIN_SECONDS) -> tuple:
+    """(slower, skipped): cases whose best time is more than `tolerance` x the baseline's (same
+    case, axis and size), and cases too fast in both runs (< `min_seconds`) to judge."""
+    with open(baseline_path, "r", encoding="utf-8") as fh:
+        base = {(r["case"], r["axis"], r["size"]): r for r in json.load(fh).get("results", []) if "seconds_best" in r}
+    slower, skipped = [], []
+    for r in results:
+        b = base.get((r["case"], r["axis"], r["size"]))
+        if b and "seconds_best" in r and b["seconds_best"] > 0:
+            if max(r["seconds_best"], b["seconds_best"]) < min_seconds:
+                skipped.append({"case": r["case"], "axis": r["axis"], "size": r["size"]})
+                continue
+            ratio = r["seconds_best"] / b["seconds_best"]
+            if ratio > tolerance:
+                slower.append({"case": r["case"], "axis": r["axis"], "size": r["size"], "ratio": round(ratio, 2),
+                               "seconds_best": r["seconds_best"], "baseline_seconds_best": b["seconds_best"]})
+    return slower, skipped
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Time the app's data paths on synthetic corpora and annotation logs.")
+    ap.add_argument("--template", default=DEFAULT_TEMPLATE, help="JSON corpus whose structure is scaled")
+    ap.add_argument("--quick", action="store_true", help="small sizes and one repeat (smoke run)")
+    for axis in DEFAULT_SIZES:
+        ap.add_argument(f"--{axis.replace('_', '-')}", dest=axis, default=None,
+                        help=f"comma-separated sizes (default: {DEFAULT_SIZES[axis]})")
+    ap.add_argument("--tree-branching", type=int, default=3)
+    ap.add_argument("--annotators", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=None, help="runs per case (default: 3, --quick without --compare: 1)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--only", default=None, help="comma-separated axes to run (default: all)")
+    ap.add_argument("-o", "--out", default=None, help="write the JSON report here (default: stdout)")
+    ap.add_argument("--compare", default=None, help="previous report; exit 1 if a case got slower")
+    ap.add_argument("--tolerance", type=float, default=1.25, help="allowed slowdown ratio for --compare")
+    ap.add_argument("--min-seconds", type=float, default=MIN_SECONDS,
+                    help="--compare skips cases faster than this in both runs")
+    args = ap.parse_args(argv)
+    if args.compare and args.repeat is not None and args.repeat < COMPARE_REPEAT:
+        ap.error(f"--compare needs --repeat >= {COMPARE_REPEAT}")
+
+    preset = QUICK_SIZES if args.quick else DEFAULT_SIZES
+    sizes = {axis: _sizes(getattr(args, axis) or preset[axis]) for axis in DEFAULT_SIZES}
+    repeat = args.repeat or (1 if args.quick and not args.compare else COMPARE_REPEAT)
+    only = set(args.only.split(",")) if args.only else set(DEFAULT_SIZES)
+    templates = load_templates(args.template)
+
+    t0 = time.perf_counter()
+    results = []
+    if "plots" in only:
+        results += bench_plots(templates, sizes["plots"], repeat, args.seed)
+    if "events" in only:
+        results += bench_events(templates, sizes["events"], repeat, args.seed)
+    if "tree_depth" in only:
+        results += bench_tree(templates, sizes["tree_depth"], repeat, args.seed, args.tree_branching)
+    if "script_kb" in only:
+        results += bench_script(templates, sizes["script_kb"], repeat, args.seed)
+    if "rows" in only:
+        results += bench_rows(templates, sizes["rows"], repeat, args.seed, args.annotators)
+
+    import numpy
+    import pandas
+    report = {
+        "meta": {
+            "created_utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": numpy.__version__,
+            "pandas": pandas.__version__,
+            "template": os.path.basename(args.template),
+            "template_plots": len(templates),
+            "sizes": sizes,
+            "repeat": repeat,
+            "seed": args.seed,
+            "seconds_total": round(time.perf_counter() - t0, 3),
+            "peak_rss_mb": _peak_rss_mb(),
+        },
+        "results": results,
+    }
+    status = 0
+    if args.compare:
+        report["regressions"], report["skipped"] = compare(results, args.compare, args.tolerance, args.min_seconds)
+        status = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+        print(f"wrote {len(results)} results to {args.out}", file=sys.stderr)
+    else:
+        print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Chart builders for causal graphs and story trees (no Streamlit import).
+
+Every function that produces something expensive takes a RenderCache, so the app,
+its background prefetcher (prefetch.py) and the offline pre-render tool
+(prerender.py) compute the same content-addressed keys and share cache entries.
+"""
+
+import importlib.util
+import json
+import subprocess
+
+from graph_layout import ROUTING_TIERS, layout_plan, wrap_label
+from render_cache import content_hash
+from story_tree import default_view, parse_tree
+
+# ---------------- Graphviz (optional, imported on first chart) ----------------
+HAS_GRAPHVIZ = importlib.util.find_spec("graphviz") is not None
+
+_HAS_DOT_BINARY = True
+DOT_TIMEOUT = 30.0      # seconds one `dot` layout may take before it counts as failed
+# bumped when layout plans / causal or tree DOT change shape, so stale disk-tier entries are not reused
+_LAYOUT_REV = "3"
+_TREE_REV = "2"
+# negative cache entry for DOT sources Graphviz cannot lay out; kept in memory only, so a
+# transient failure (timeout, `dot` missing for a while) is retried after a restart
+_FAILED_SVG = ""
+
+
+def _cached(cache, kind, key, compute):
+    return cache.get_or_compute(kind, key, compute) if cache is not None else compute()
+
+
+def graph_key(plot) -> str:
+    """Content hash of a plot's causal_graph payload (string or dict)."""
+    return content_hash(plot.get('causal_graph'))
+
+
+def graph_data(plot, cache=None):
+    """Parsed causal_graph dict (cached by content hash). Treat the result as read-only."""
+    raw = plot.get('causal_graph')
+    if not isinstance(raw, str):
+        return raw
+
+    def _parse():
+        try:
+            return json.loads(raw)
+        except Exception:
+            return None
+
+    return _cached(cache, "graph", content_hash(raw), _parse)
+
+
+def parse_tree_text_to_graphviz(tree_text, max_depth=None, max_children=None, collapsed=()):
+    """Text tree -> Graphviz object (optionally depth-capped / sibling-truncated / collapsed)"""
+    if not HAS_GRAPHVIZ or not tree_text:
+        return None
+    return parse_tree(tree_text).to_dot(max_depth=max_depth, max_children=max_children, collapsed=collapsed)
+
+
+def causal_layout(data, cache=None, key=None, expand=(), mode="auto", tiers=None):
+    """layout_plan() cached by graph content + view; `key` is graph_key(plot), else the dict is hashed."""
+    expand = tuple(sorted(expand))
+    tiers = tiers or ROUTING_TIERS
+    key = (key or content_hash(data)) + "-" + content_hash([expand, mode, _LAYOUT_REV, tiers])
+    return _cached(cache, "layout", key, lambda: layout_plan(data, expand=expand, mode=mode, tiers=tiers))
+
+
+def create_causal_chart(data, expand=(), mode="auto", plan=None, tiers=None):
+    """Causal graph -> Graphviz object (large graphs are simplified, see graph_layout.py)"""
+    if not HAS_GRAPHVIZ or not data:
+        return None
+    import graphviz
+
+    if plan is None:
+        plan = layout_plan(data, expand=expand, mode=mode, tiers=tiers)
+    dot = graphviz.Digraph()
+    dot.attr(rankdir='LR', splines=plan["splines"], nodesep='0.4', ranksep='0.6')
+    if plan["compact"]:
+        dot.attr(newrank='true')
+    dot.attr('node', fontname='Arial', style='filled', penwidth='0', fontcolor='white')
+
+    def add_node(g, n):
+        extra = {'penwidth': '2', 'color': '#263238'} if n.get("chain") else {}
+        g.node(n["id"], label=wrap_label(n["name"]), fillcolor=n["color"], shape='box', style='rounded,filled', **extra)
+
+    by_id = {n["id"]: n for n in plan["nodes"]}
+    clustered = set()
+    for k, (label, ids) in enumerate(plan["clusters"]):
+        with dot.subgraph(name=f"cluster_{k}") as c:
+            c.attr(label=label, style='dashed', color='#B0BEC5', fontname='Arial', fontcolor='#607D8B')
+            for i in ids:
+                add_node(c, by_id[i])
+                clustered.add(i)
+    for n in plan["nodes"]:
+        if n["id"] not in clustered:
+            add_node(dot, n)
+
+    for e in plan["edges"]:
+        et = e["type"]
+        color = '#FF7043' if et == 'catalyst' else '#455A64'
+        style = 'dashed' if et == 'concurrent' else 'solid'
+        dot.edge(e["from"], e["to"], color=color, style=style)
+
+    return dot
+
+
+def causal_chart_source(data, cache=None, key=None, expand=(), mode="auto", tiers=None):
+    """DOT source for a causal graph dict; `key` is graph_key(plot), else the dict is hashed."""
+    if not HAS_GRAPHVIZ or not data:
+        return None
+    expand = tuple(sorted(expand))
+    tiers = tiers or ROUTING_TIERS
+    graph = key or content_hash(data)
+
+    def _build():
+        plan = causal_layout(data, cache, graph, expand, mode, tiers)
+        chart = create_causal_chart(data, expand=expand, mode=mode, plan=plan)
+        return chart.source if chart else None
+
+    key = f"causal{_LAYOUT_REV}-" + graph + "-" + content_hash([expand, mode, tiers])
+    return _cached(cache, "dot", key, _build)
+
+
+def tree_chart_source(tree_text, cache=None, max_depth=None, max_children=None, collapsed=()):
+    """DOT source for a story tree view, cached by content hash + view limits."""
+    if not HAS_GRAPHVIZ or not tree_text:
+        return None
+    collapsed = tuple(sorted(collapsed))
+
+    def _build():
+        chart = parse_tree_text_to_graphviz(tree_text, max_depth, max_children, collapsed)
+        return chart.source if chart else None
+
+    key = f"tree{_TREE_REV}-" + content_hash([tree_text, max_depth, max_children, collapsed])
+    return _cached(cache, "dot", key, _build)
+
+
+def has_dot_binary() -> bool:
+    return HAS_GRAPHVIZ and _HAS_DOT_BINARY
+
+
+def render_svg(source, cache=None, timeout: float = DOT_TIMEOUT):
+    """Lay out DOT source server-side once; None if `dot` is unavailable, fails or times out."""
+    global _HAS_DOT_BINARY
+    if not source or not HAS_GRAPHVIZ or not _HAS_DOT_BINARY:
+        return None
+    key = content_hash(source)
+    svg = cache.get("svg", key) if cache is not None else None
+    if svg is not None:
+        return svg or None   # "" = layout failed before, don't run dot again
+    try:
+        proc = subprocess.run(["dot", "-Tsvg"], input=source.encode("utf-8"),
+                              capture_output=True, timeout=timeout)
+    except FileNotFoundError:
+        _HAS_DOT_BINARY = False
+        return None
+    except (subprocess.TimeoutExpired, OSError):
+        proc = None
+    if proc is None or proc.returncode != 0:
+        if cache is not None:
+            cache.put("svg", key, _FAILED_SVG, disk=False)
+        return None
+    svg = proc.stdout.decode("utf-8", errors="replace")
+    # drop the XML prolog / doctype so the markup can be inlined
+    start = svg.find("<svg")
+    svg = svg[start:] if start >= 0 else svg
+    return cache.put("svg", key, svg) if cache is not None else svg
+
+
+def warm_plot(plot, cache, svg: bool = True) -> dict:
+    """Fill `cache` with everything the default plot card shows; counts of what was built."""
+    stats = {"graphs": 0, "trees": 0, "svgs": 0}
+    data = graph_data(plot, cache)
+    if data:
+        src = causal_chart_source(data, cache, key=graph_key(plot))
+        if src:
+            stats["graphs"] += 1
+            if svg and render_svg(src, cache):
+                stats["svgs"] += 1
+    tree_text = plot.get('pruned_tree')
+    if tree_text and isinstance(tree_text, str):
+        src = tree_chart_source(tree_text, cache, *default_view(parse_tree(tree_text)))
+        if src:
+            stats["trees"] += 1
+            if svg and render_svg(src, cache):
+                stats["svgs"] += 1
+    return stats
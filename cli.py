@@ -0,0 +1,308 @@
+"""
+Headless command-line tools for the annotation corpus (no Streamlit).
+
+    python cli.py ingest a.json b.json more.plotc -o corpus.plotc     # merge + de-dup plot corpora
+    python cli.py merge export1.csv export2.jsonl annotations.db -o all.csv
+    python cli.py --workers 8 normalize all.csv -o all_z.csv [--robust] [--min-calibration 2]
+    python cli.py export annotations.db -o new.parquet --checkpoint nightly
+    python cli.py features corpus.plotc --cache $PLOT_CORPUS_DIR/features.jsonl -o features.csv
+
+`ingest` parses input files in worker processes and keeps the first plot seen for
+each plot_id (same rule as uploading them in the app). Output is .json or .plotc.
+
+`merge` streams annotation exports (CSV / JSONL / the SQLite log) into one file,
+dropping rows already seen (same timestamp_utc + annotator_id + plot_id).
+
+`normalize` adds `<dim>_z` columns, computed exactly like the app's normalization
+preview, in two streaming passes over worker processes: calibration statistics per
+shard (merged in the parent), then z-scores per shard into part files that are
+concatenated in input order. Memory stays bounded by the shard size.
+
+`export` writes the SQLite log in chunks (see export.py); with `--checkpoint NAME`
+only rows added since the previous export under that name are written.
+
+`features` computes causal-graph metrics (graph_features.py) in worker processes
+for plots not in the feature cache yet; point `--cache` at the app's corpus
+directory so the app finds them there.
+
+Heavy modules are imported inside the commands, so start-up stays cheap.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+
+def _pool(workers):
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def _out_format(path: str) -> str:
+    from annotation_io import file_format
+    fmt = file_format(path)
+    if fmt == "db":
+        raise SystemExit("output must be .csv or .jsonl")
+    return fmt
+
+
+# ============== ingest ==============
+
+def _load_corpus(path: str) -> list:
+    """[(plot_id, plot dict)] from one .json / .plotc file (runs in a worker)."""
+    from corpus_format import ColumnarCorpus, is_columnar
+    from plot_utils import get_plot_id
+
+    with open(path, "rb") as fh:
+        data = fh.read()
+    if is_columnar(data):
+        corpus = ColumnarCorpus.from_bytes(data)
+        return [(corpus.plot_id(i), corpus[i].to_dict()) for i in range(len(corpus))]
+    content = json.loads(data)
+    items = content if isinstance(content, list) else [content]
+    return [(get_plot_id(p), p) for p in items if isinstance(p, dict)]
+
+
+def cmd_ingest(args) -> dict:
+    from corpus_format import write_columnar
+
+    seen, plots = set(), []
+    with _pool(args.workers) as pool:
+        for items in pool.map(_load_corpus, args.inputs):
+            for pid, plot in items:
+                if pid not in seen:
+                    seen.add(pid)
+                    plots.append(plot)
+    if args.output.lower().endswith(".plotc"):
+        write_columnar(plots, args.output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(plots, fh, ensure_ascii=False, indent=2)
+    return {"inputs": len(args.inputs), "plots": len(plots)}
+
+
+# ============== merge ==============
+
+def cmd_merge(args) -> dict:
+    from annotation_io import RowWriter, open_output, read_header, read_rows, row_key
+
+    fmt = _out_format(args.output)
+    fieldnames = {}
+    if fmt == "csv":
+        for path in args.inputs:
+            for k in read_header(path):
+                fieldnames.setdefault(k, None)
+    seen, read, written = set(), 0, 0
+    with open_output(args.output) as fh:
+        writer = RowWriter(fh, fmt, fieldnames)
+        for path in args.inputs:
+            for row in read_rows(path):
+                read += 1
+                key = row_key(row)
+                if key in seen:
+                    continue
+                seen.add(key)
+                writer.write(row)
+                written += 1
+    return {"rows_read": read, "rows_written": written, "duplicates": read - written}
+
+
+# ============== normalize ==============
+
+def _shard_stats(task):
+    """Pass 1 (worker): calibration statistics and column names of one shard."""
+    from annotation_io import as_bool, as_score, read_rows
+    from normalization import CalibrationStats
+
+    (path, start, end), dims, robust = task
+    stats = CalibrationStats(dims, robust=robust)
+    columns, n = {}, 0
+    for row in read_rows(path, start, end):
+        n += 1
+        for k in row:
+            columns.setdefault(k, None)
+        if as_bool(row.get("is_calibration")) and row.get("annotator_id") not in (None, ""):
+            stats.add(str(row["annotator_id"]), [as_score(row.get(d)) for d in dims])
+    return stats, list(columns), n
+
+
+def _shard_zscores(task):
+    """Pass 2 (worker): write one shard's rows plus `<dim>_z` columns to a part file."""
+    from annotation_io import RowWriter, as_bool, as_score, open_output, read_rows
+    from normalization import zscore_values
+
+    (path, start, end), dims, params, fmt, fieldnames, part = task
+    n = 0
+    with open_output(part) as fh:
+        writer = RowWriter(fh, fmt, fieldnames, header=False)
+        for row in read_rows(path, start, end):
+            scores = [as_score(row.get(d)) for d in dims]
+            if as_bool(row.get("is_calibration")):
+                z = [None] * len(dims)
+            else:
+                z = zscore_values(scores, params.get(str(row.get("annotator_id"))))
+            row.update({f"{d}_z": v for d, v in zip(dims, z)})
+            writer.write(row)
+            n += 1
+    return n
+
+
+def cmd_normalize(args) -> dict:
+    import shutil
+    import tempfile
+    from annotation_io import RowWriter, open_output, shards
+    from annotation_table import SCORE_COLUMNS
+    from normalization import CalibrationStats
+
+    fmt = _out_format(args.output)
+    dims = tuple(args.dims.split(",")) if args.dims else SCORE_COLUMNS
+    tasks = shards(args.inputs, shard_bytes=max(1, args.shard_mb) << 20)
+
+    stats, columns, n_rows = CalibrationStats(dims, robust=args.robust), {}, 0
+    with _pool(args.workers) as pool:
+        for part_stats, part_cols, n in pool.map(_shard_stats, [(t, dims, args.robust) for t in tasks]):
+            stats.merge(part_stats)
+            for k in part_cols:
+                columns.setdefault(k, None)
+            n_rows += n
+        params = stats.params(args.min_calibration)
+        fieldnames = [c for c in columns if c not in {f"{d}_z" for d in dims}] + [f"{d}_z" for d in dims]
+
+        tmp = tempfile.mkdtemp(prefix="normalize_", dir=os.path.dirname(os.path.abspath(args.output)))
+        try:
+            parts = [os.path.join(tmp, f"part-{i:05d}") for i in range(len(tasks))]
+            jobs = [(t, dims, params, fmt, fieldnames, p) for t, p in zip(tasks, parts)]
+            written = sum(pool.map(_shard_zscores, jobs))
+            with open_output(args.output) as out:
+                RowWriter(out, fmt, fieldnames)  # header only
+                for p in parts:
+                    with open(p, "r", encoding="utf-8", newline="") as fh:
+                        shutil.copyfileobj(fh, out)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    calibrated = sum(1 for centers, _ in params.values() if any(c is not None for c in centers))
+    return {"rows": written, "shards": len(tasks), "annotators": len(params),
+            "annotators_calibrated": calibrated, "rows_scanned": n_rows}
+
+
+# ============== export ==============
+
+def cmd_export(args) -> dict:
+    from annotation_store import AnnotationStore
+    from export import FORMATS, typed_frame, write_frames
+
+    fmt = args.format or next((f for f, (_, ext) in FORMATS.items() if args.output.lower().endswith(ext)), "csv")
+    if not os.path.isfile(args.db):
+        # AnnotationStore would create an empty log at a mistyped path
+        raise SystemExit(f"annotation log not found: {args.db}")
+    store = AnnotationStore(args.db)
+    try:
+        start = store.get_checkpoint(args.checkpoint) if args.checkpoint else 0
+        end = store.last_id()   # rows committed after this point go to the next export
+        columns = store.columns(start)
+        last = start
+
+        def frames():
+            nonlocal last
+            yielded = False
+            while last < end:
+                batch = [(i, r) for i, r in store.rows_with_ids(last, limit=args.chunk_rows) if i <= end]
+                if not batch:
+                    break
+                last = batch[-1][0]
+                yielded = True
+                yield typed_frame([r for _, r in batch], columns)
+            if not yielded:
+                yield typed_frame([], columns)  # still write a valid (empty) file
+
+        with open(args.output, "wb") as fh:
+            n = write_frames(frames(), fh, fmt)
+        if args.checkpoint:
+            store.set_checkpoint(args.checkpoint, last)
+    finally:
+        store.close()
+    return {"format": fmt, "rows": n, "after_id": start, "last_id": last}
+
+
+# ============== features ==============
+
+def cmd_features(args) -> dict:
+    from export import FORMATS, write_frames
+    from graph_features import FeatureCache, FeatureTable
+    from plot_utils import get_plot_id
+
+    cache = FeatureCache(args.cache)
+    before = len(cache)
+    plots = []
+    with _pool(args.workers) as pool:
+        for items in pool.map(_load_corpus, args.inputs):
+            plots += [plot for _, plot in items]
+    table = FeatureTable()
+    table.sync(plots, cache, get_plot_id, workers=args.workers)
+    result = {"plots": len(table), "computed": len(cache) - before, "cache": args.cache}
+    if args.output:
+        fmt = next((f for f, (_, ext) in FORMATS.items() if args.output.lower().endswith(ext)), "csv")
+        with open(args.output, "wb") as fh:
+            write_frames([table.to_frame()], fh, fmt)
+        result["output"] = args.output
+    return result
+
+
+# ============== main ==============
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="cli.py", description="Plot annotation tools (headless).")
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("ingest", help="merge plot corpora (.json / .plotc), de-duplicated by plot_id")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("-o", "--output", required=True, help=".json or .plotc")
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("merge", help="merge annotation exports (.csv / .jsonl / .db), dropping duplicates")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("-o", "--output", required=True, help=".csv or .jsonl")
+    p.set_defaults(func=cmd_merge)
+
+    p = sub.add_parser("normalize", help="add per-annotator calibration z-scores (<dim>_z columns)")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("-o", "--output", required=True, help=".csv or .jsonl")
+    p.add_argument("--robust", action="store_true", help="median / MAD instead of mean / std")
+    p.add_argument("--min-calibration", type=int, default=2)
+    p.add_argument("--dims", default=None, help="comma-separated score columns (default: all)")
+    p.add_argument("--shard-mb", type=int, default=32, help="JSONL shard size per worker task")
+    p.set_defaults(func=cmd_normalize)
+
+    p = sub.add_parser("export", help="export the SQLite annotation log to CSV / Parquet / Arrow in chunks")
+    p.add_argument("db", help="annotation log (PLOT_ANNOTATION_DB)")
+    p.add_argument("-o", "--output", required=True)
+    p.add_argument("--format", choices=["csv", "parquet", "arrow"], default=None,
+                   help="default: from the output extension")
+    p.add_argument("--checkpoint", default=None,
+                   help="export only rows added since the last export under this name, then advance it")
+    p.add_argument("--chunk-rows", type=int, default=5000)
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("features", help="compute causal-graph metrics per plot into the feature cache")
+    p.add_argument("inputs", nargs="+", help="corpus files (.json / .plotc)")
+    p.add_argument("--cache", default=os.path.join(os.environ.get("PLOT_CORPUS_DIR") or ".", "features.jsonl"),
+                   help="feature cache file (default: $PLOT_CORPUS_DIR/features.jsonl)")
+    p.add_argument("-o", "--output", default=None, help="also write the table (.csv / .parquet / .arrow)")
+    p.set_defaults(func=cmd_features)
+    return ap
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    t0 = time.perf_counter()
+    result = args.func(args)
+    result["seconds"] = round(time.perf_counter() - t0, 3)
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
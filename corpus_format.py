@@ -0,0 +1,210 @@
+"""
+Compact columnar corpus format (.plotc) with per-field random access.
+
+Small metadata (plot_id, title, genre, status, seed_id, method_name) lives in one
+compressed table that is decoded when the file is opened; `meta_row()` serves it
+to the plot selector index without touching any blob. Every other field
+(final_plot, pruned_tree, causal_graph, setting, ...) is stored as individually
+zlib-compressed JSON blobs with a per-field offset index, so one plot's script
+is decompressed only when something reads it.
+
+Layout:
+    MAGIC | blobs ... | meta table | per-field index arrays | header JSON | u64 header_len | MAGIC
+
+Each index array holds one (u64 offset, u32 length) pair per plot; length 0 means
+the plot has no such field.
+
+CLI:
+    python corpus_format.py convert merged_data.json merged_data.plotc
+    python corpus_format.py info merged_data.plotc
+"""
+
+import argparse
+import json
+import mmap
+import struct
+import sys
+import zlib
+
+from plot_utils import get_method_name, get_plot_id, get_seed_id
+
+MAGIC = b"PLOTCOL1"
+VERSION = 1
+
+# meta columns; the first three are the plot's own fields, stored verbatim (None = absent)
+VERBATIM_META = ("title", "genre", "status")
+META_COLUMNS = ("plot_id",) + VERBATIM_META + ("seed_id", "method_name")
+
+_ENTRY = struct.Struct("<QI")
+_TAIL = struct.Struct("<Q")
+
+
+def is_columnar(data) -> bool:
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+
+def _encode(value, level: int) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"), level)
+
+
+def write_columnar(plots, path: str, id_fn=get_plot_id, level: int = 6) -> int:
+    """Write an iterable of plot dicts to `path`. Returns the number of plots written."""
+    meta = {c: [] for c in META_COLUMNS}
+    index = {}  # field -> list of (offset, length), one per plot
+    n = 0
+    with open(path, "wb") as fh:
+        fh.write(MAGIC)
+        for plot in plots:
+            if not isinstance(plot, dict):
+                continue
+            meta["plot_id"].append(id_fn(plot))
+            for k in VERBATIM_META:
+                meta[k].append(plot.get(k))
+            meta["seed_id"].append(str(get_seed_id(plot)))
+            meta["method_name"].append(str(get_method_name(plot)))
+            for field, value in plot.items():
+                if field in VERBATIM_META:
+                    continue
+                blob = _encode(value, level)
+                entries = index.setdefault(field, [])
+                # fields first seen on a later plot are absent on earlier ones
+                entries.extend([(0, 0)] * (n - len(entries)))
+                entries.append((fh.tell(), len(blob)))
+                fh.write(blob)
+            n += 1
+
+        meta_blob = _encode(meta, level)
+        header = {"version": VERSION, "n": n, "meta": [fh.tell(), len(meta_blob)], "fields": {}}
+        fh.write(meta_blob)
+        for field, entries in index.items():
+            entries.extend([(0, 0)] * (n - len(entries)))
+            header["fields"][field] = fh.tell()
+            fh.write(b"".join(_ENTRY.pack(off, length) for off, length in entries))
+
+        header_blob = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        fh.write(header_blob)
+        fh.write(_TAIL.pack(len(header_blob)))
+        fh.write(MAGIC)
+    return n
+
+
+class ColumnarCorpus:
+    """Read-only reader over a .plotc file (mmap) or an in-memory buffer."""
+
+    def __init__(self, buf, path: str = None):
+        self._buf = buf
+        self.path = path
+        if not is_columnar(buf) or bytes(buf[-len(MAGIC):]) != MAGIC:
+            raise ValueError("not a columnar plot corpus")
+        try:
+            tail = len(buf) - len(MAGIC) - _TAIL.size
+            (header_len,) = _TAIL.unpack_from(buf, tail)
+            self.header = json.loads(bytes(buf[tail - header_len:tail]))
+            if self.header.get("version") != VERSION:
+                raise ValueError(f"unsupported corpus version: {self.header.get('version')}")
+            self.n = int(self.header["n"])
+            self._fields = self.header["fields"]
+            off, length = self.header["meta"]
+            self.meta = json.loads(zlib.decompress(buf[off:off + length]))
+            if any(len(self.meta[c]) != self.n for c in META_COLUMNS):
+                raise ValueError("corpus metadata does not match the plot count")
+        except (zlib.error, struct.error, KeyError, IndexError, TypeError, AttributeError) as exc:
+            # a damaged file is reported like any other unreadable corpus
+            raise ValueError(f"corrupt columnar plot corpus: {exc!r}") from exc
+
+    @classmethod
+    def open(cls, path: str) -> "ColumnarCorpus":
+        with open(path, "rb") as fh:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(mm, path=path)
+        except ValueError:
+            mm.close()
+            raise
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ColumnarCorpus":
+        return cls(data)
+
+    # ---------- store protocol (see corpus_store.LazyPlot) ----------
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, index: int):
+        from corpus_store import LazyPlot
+        if not 0 <= index < self.n:
+            raise IndexError(index)
+        return LazyPlot(self, index)
+
+    def __iter__(self):
+        for i in range(self.n):
+            yield self[i]
+
+    def plot_id(self, index: int) -> str:
+        return self.meta["plot_id"][index]
+
+    def meta_row(self, index: int) -> dict:
+        """The meta columns of one plot (verbatim ones are None when the plot lacks them)."""
+        return {c: self.meta[c][index] for c in META_COLUMNS}
+
+    def _entry(self, index: int, field: str):
+        pos = self._fields.get(field)
+        if pos is None:
+            return None
+        off, length = _ENTRY.unpack_from(self._buf, pos + index * _ENTRY.size)
+        return (off, length) if length else None
+
+    def field_names(self, index: int) -> list:
+        names = [k for k in VERBATIM_META if self.meta[k][index] is not None]
+        return names + [f for f in self._fields if self._entry(index, f)]
+
+    def has_field(self, index: int, key: str) -> bool:
+        if key in VERBATIM_META:
+            return self.meta[key][index] is not None
+        return self._entry(index, key) is not None
+
+    def read_field(self, index: int, key: str):
+        if key in VERBATIM_META:
+            value = self.meta[key][index]
+            if value is None:
+                raise KeyError(key)
+            return value
+        entry = self._entry(index, key)
+        if entry is None:
+            raise KeyError(key)
+        off, length = entry
+        return json.loads(zlib.decompress(self._buf[off:off + length]))
+
+
+# ============== CLI ==============
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Convert / inspect columnar plot corpora.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    conv = sub.add_parser("convert", help="JSON corpus -> .plotc")
+    conv.add_argument("src")
+    conv.add_argument("dst")
+    conv.add_argument("--level", type=int, default=6, help="zlib level (default 6)")
+    info = sub.add_parser("info", help="summary of a .plotc file")
+    info.add_argument("path")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "convert":
+        with open(args.src, "r", encoding="utf-8") as fh:
+            content = json.load(fh)
+        items = content if isinstance(content, list) else [content]
+        n = write_columnar(items, args.dst, level=args.level)
+        print(f"wrote {n} plots to {args.dst}")
+    else:
+        corpus = ColumnarCorpus.open(args.path)
+        print(json.dumps({
+            "plots": len(corpus),
+            "meta_columns": list(corpus.meta),
+            "fields": list(corpus.header["fields"]),
+        }, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Searchable index over a plot list, for the plot selector and gold picker.
+
+Keeps the small per-plot columns (plot_id, title, genre, seed_id, method_name) and an
+inverted index from lower-cased word tokens to row numbers. `sync(plots)` only
+reads plots appended since the last call, so a rerun never scans the corpus, and
+`search()` returns one page of matches so the browser only ever gets a page of
+options. Plots served from a columnar corpus are indexed from its meta columns
+(`meta_row()`), so no field blob is decoded.
+
+Query syntax: whitespace-separated terms, all of which must match (prefix match on
+words of title / genre / seed_id / method_name / plot_id).
+"""
+
+import bisect
+import re
+
+from plot_utils import get_method_name, get_plot_id, get_seed_id, safe_get
+
+COLUMNS = ("plot_id", "title", "genre", "seed_id", "method_name")
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN.findall(str(text).lower())
+
+
+class CorpusIndex:
+    def __init__(self):
+        self.cols = {c: [] for c in COLUMNS}
+        self._row_of = {}       # plot_id -> first row
+        self._postings = {}     # token -> list of rows (ascending)
+        self._vocab = []        # sorted tokens, for prefix lookups
+        self._vocab_dirty = False
+        self._source = None
+        self._last = (None, -1, [])  # (terms, len at search time, sorted hits)
+
+    def __len__(self):
+        return len(self.cols["plot_id"])
+
+    def reset(self):
+        self.__init__()
+
+    def add(self, plot):
+        row = len(self)
+        meta = plot.meta_row() if hasattr(plot, "meta_row") else None
+        if meta is not None:
+            values = {
+                "plot_id": meta["plot_id"],
+                "title": str(safe_get(meta, "title", f"Plot {row}")),
+                "genre": str(safe_get(meta, "genre", "")),
+                "seed_id": meta["seed_id"],
+                "method_name": meta["method_name"],
+            }
+        else:
+            values = {
+                "plot_id": get_plot_id(plot),
+                "title": str(safe_get(plot, "title", f"Plot {row}")),
+                "genre": str(safe_get(plot, "genre", "")),
+                "seed_id": str(get_seed_id(plot)),
+                "method_name": str(get_method_name(plot)),
+            }
+        for c in COLUMNS:
+            self.cols[c].append(values[c])
+        self._row_of.setdefault(values["plot_id"], row)
+        for tok in set(tokenize(" ".join(values.values()))):
+            posting = self._postings.get(tok)
+            if posting is None:
+                self._postings[tok] = [row]
+                self._vocab_dirty = True
+            else:
+                posting.append(row)
+
+    def sync(self, plots):
+        """Index plots appended to `plots` since the last call (rebuild if the list was replaced or shrank)."""
+        if plots is not self._source or len(plots) < len(self):
+            self.reset()
+            self._source = plots
+        for i in range(len(self), len(plots)):
+            self.add(plots[i])
+
+    def row_of(self, plot_id: str):
+        return self._row_of.get(plot_id)
+
+    def label(self, row: int) -> str:
+        title = self.cols["title"][row]
+        extra = " · ".join(v for v in (self.cols["genre"][row], self.cols["method_name"][row]) if v)
+        return f"{row}: {title}" + (f"  ({extra})" if extra else "")
+
+    def _prefix_rows(self, prefix: str) -> set:
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        rows = set()
+        i = bisect.bisect_left(self._vocab, prefix)
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix):
+            rows.update(self._postings[self._vocab[i]])
+            i += 1
+        return rows
+
+    def search(self, query: str = "", offset: int = 0, limit: int = 50):
+        """(total matches, rows on this page). Empty query matches everything, in corpus order."""
+        terms = tokenize(query or "")
+        offset = max(0, int(offset))
+        if not terms:
+            total = len(self)
+            return total, list(range(offset, min(total, offset + limit)))
+        key = tuple(sorted(set(terms)))
+        if self._last[0] == key and self._last[1] == len(self):
+            ordered = self._last[2]   # paging through the same query
+        else:
+            hits = None
+            for term in sorted(key, key=len, reverse=True):
+                rows = self._prefix_rows(term)
+                hits = rows if hits is None else hits & rows
+                if not hits:
+                    break
+            ordered = sorted(hits or ())
+            self._last = (key, len(self), ordered)
+        return len(ordered), ordered[offset:offset + limit]
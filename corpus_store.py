@@ -0,0 +1,315 @@
+"""
+Shared, memory-mapped plot corpus.
+
+One CorpusStore per server process holds every uploaded plot. Each top-level field
+of a plot is written as its own JSON blob to an append-only data file, and an
+offset index (kept in compact arrays) points at it. Reads go through `mmap`, so
+plot text lives in the OS page cache instead of in every session's heap.
+
+Sessions only hold a CorpusView (a list of plot indices); indexing a view returns
+a LazyPlot that decodes a field the first time it is touched.
+
+Plots can also be attached from a read-only source with the same field protocol
+(e.g. corpus_format.ColumnarCorpus); those are served from the source and are not
+written to disk, so they are gone after a restart.
+
+Adding a plot whose id is already stored is a no-op only if its content hash
+matches; a regenerated plot (same id, new content) is appended as a new revision
+and the id points at it from then on. Older revisions stay readable, so indices
+held by existing views never change meaning.
+
+Files (in `root_dir`):
+- corpus.dat : concatenated UTF-8 JSON field blobs
+- corpus.idx : one JSON line per plot: {"pid": ..., "hash": ..., "fields": [[name, offset, length], ...]}
+
+A store without `root_dir` lives in a temporary directory that is removed on
+close(), or at interpreter exit if it is never closed.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from array import array
+from collections.abc import Mapping, Sequence
+
+
+class LazyPlot(Mapping):
+    """Read-only dict-like view of one stored plot; fields are decoded on first access."""
+
+    __slots__ = ("_store", "index", "_cache")
+
+    def __init__(self, store, index: int):
+        self._store = store
+        self.index = index
+        self._cache = {}
+
+    def __getitem__(self, key):
+        if key in self._cache:
+            return self._cache[key]
+        value = self._store.read_field(self.index, key)  # raises KeyError
+        self._cache[key] = value
+        return value
+
+    def __contains__(self, key):
+        return key in self._cache or self._store.has_field(self.index, key)
+
+    def __iter__(self):
+        return iter(self._store.field_names(self.index))
+
+    def __len__(self):
+        return len(self._store.field_names(self.index))
+
+    def to_dict(self) -> dict:
+        return {k: self[k] for k in self}
+
+    def meta_row(self):
+        """Precomputed meta columns from a columnar source, or None (see ColumnarCorpus.meta_row)."""
+        return self._store.meta_row(self.index)
+
+    def __repr__(self):
+        return f"LazyPlot(index={self.index})"
+
+
+class CorpusStore:
+    """Append-only, process-wide plot store. Reads are lock-free; appends take a lock."""
+
+    def __init__(self, root_dir: str = None, id_fn=None):
+        self._temp_dir = root_dir is None
+        self.root_dir = root_dir or tempfile.mkdtemp(prefix="plot_corpus_")
+        # removed again on close(), or at exit for stores nobody closes (e.g. st.cache_resource)
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.root_dir, ignore_errors=True) \
+            if self._temp_dir else None
+        os.makedirs(self.root_dir, exist_ok=True)
+        self.data_path = os.path.join(self.root_dir, "corpus.dat")
+        self.index_path = os.path.join(self.root_dir, "corpus.idx")
+        self.id_fn = id_fn
+
+        self._lock = threading.Lock()
+        self._names = []          # field-name vocabulary
+        self._name_ids = {}
+        self._rec_start = array("Q", [0])   # plot i -> slice [rec_start[i], rec_start[i+1]) of the arrays below
+        self._field = array("H")
+        self._offset = array("Q")
+        self._length = array("Q")
+        self._src = array("i")      # -1 = stored here, else index into self._sources
+        self._src_index = array("q")
+        self._sources = []
+        self._source_ids = {}
+        self._pids = []
+        self._hashes = []          # content hash per plot (None: attached, or written before hashes)
+        self._by_pid = {}          # plot id -> index of its latest revision
+        self._map = (None, 0)   # (mmap, mapped size), swapped as one tuple so readers never mix them
+
+        self._load_index()
+        self._data_fh = open(self.data_path, "ab")
+        self._index_fh = open(self.index_path, "a", encoding="utf-8")
+
+    # ---------- index ----------
+
+    def _name_id(self, name: str) -> int:
+        nid = self._name_ids.get(name)
+        if nid is None:
+            nid = len(self._names)
+            self._names.append(name)
+            self._name_ids[name] = nid
+        return nid
+
+    def _index_record(self, pid: str, fields, digest: str = None):
+        for name, off, length in fields:
+            self._field.append(self._name_id(name))
+            self._offset.append(off)
+            self._length.append(length)
+        self._rec_start.append(len(self._field))
+        self._src.append(-1)
+        self._src_index.append(-1)
+        self._by_pid[pid] = len(self._pids)
+        self._pids.append(pid)
+        self._hashes.append(digest)
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        good = 0    # end of the last complete record
+        with open(self.index_path, "rb") as fh:
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    break  # torn trailing line from a crash
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break
+                fields = rec.get("fields", [])
+                if any(off + length > data_size for _, off, length in fields):
+                    break
+                self._index_record(rec.get("pid", ""), fields, rec.get("hash"))
+                good += len(line)
+        if good < os.path.getsize(self.index_path):
+            # cut the torn tail, or records appended after it would be unreadable on the next load
+            with open(self.index_path, "r+b") as fh:
+                fh.truncate(good)
+
+    # ---------- mmap ----------
+
+    def _view(self, end: int):
+        mm, size = self._map
+        if mm is None or end > size:
+            with self._lock:
+                mm, size = self._map
+                if mm is None or end > size:
+                    self._data_fh.flush()
+                    size = os.path.getsize(self.data_path)
+                    if size == 0:
+                        return None
+                    with open(self.data_path, "rb") as fh:
+                        # older maps stay valid for readers still holding them
+                        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._map = (mm, size)
+        return mm
+
+    def _locate(self, index: int, key: str):
+        nid = self._name_ids.get(key)
+        if nid is None:
+            return None
+        for j in range(self._rec_start[index], self._rec_start[index + 1]):
+            if self._field[j] == nid:
+                return self._offset[j], self._length[j]
+        return None
+
+    # ---------- public API ----------
+
+    def __len__(self):
+        return len(self._pids)
+
+    def __getitem__(self, index: int) -> LazyPlot:
+        if not 0 <= index < len(self._pids):
+            raise IndexError(index)
+        return LazyPlot(self, index)
+
+    def plot_id(self, index: int) -> str:
+        return self._pids[index]
+
+    def index_of(self, pid: str):
+        return self._by_pid.get(pid)
+
+    def meta_row(self, index: int):
+        src = self._src[index]
+        if src >= 0 and hasattr(self._sources[src], "meta_row"):
+            return self._sources[src].meta_row(self._src_index[index])
+        return None
+
+    def field_names(self, index: int) -> list:
+        src = self._src[index]
+        if src >= 0:
+            return self._sources[src].field_names(self._src_index[index])
+        lo, hi = self._rec_start[index], self._rec_start[index + 1]
+        return [self._names[self._field[j]] for j in range(lo, hi)]
+
+    def has_field(self, index: int, key: str) -> bool:
+        src = self._src[index]
+        if src >= 0:
+            return self._sources[src].has_field(self._src_index[index], key)
+        return self._locate(index, key) is not None
+
+    def read_raw(self, index: int, key: str) -> bytes:
+        loc = self._locate(index, key)
+        if loc is None:
+            raise KeyError(key)
+        off, length = loc
+        mm = self._view(off + length)
+        return mm[off:off + length] if mm is not None else b""
+
+    def read_field(self, index: int, key: str):
+        src = self._src[index]
+        if src >= 0:
+            return self._sources[src].read_field(self._src_index[index], key)
+        return json.loads(self.read_raw(index, key))
+
+    def add(self, plot: dict, pid: str = None) -> int:
+        """
+        Store a plot and return its index. The same id with the same content returns the
+        stored index; with different content the plot is stored as a new revision.
+        """
+        if pid is None:
+            pid = self.id_fn(plot) if self.id_fn else str(len(self._pids))
+        blobs = [(str(name), json.dumps(value, ensure_ascii=False).encode("utf-8")) for name, value in plot.items()]
+        h = hashlib.blake2b(digest_size=16)
+        for name, blob in blobs:
+            h.update(json.dumps(name).encode("utf-8"))
+            h.update(blob)
+        digest = h.hexdigest()
+        with self._lock:
+            existing = self._by_pid.get(pid)
+            if existing is not None and (self._src[existing] >= 0 or self._hashes[existing] == digest):
+                return existing    # attached plots are read-only sources; they are not revised
+            off = self._data_fh.tell()
+            fields = []
+            for name, blob in blobs:
+                self._data_fh.write(blob)
+                fields.append((name, off, len(blob)))
+                off += len(blob)
+            self._data_fh.flush()
+            # the index line goes last so it never points at unwritten data
+            self._index_fh.write(json.dumps({"pid": pid, "hash": digest, "fields": fields}, ensure_ascii=False) + "\n")
+            self._index_fh.flush()
+            self._index_record(pid, fields, digest)
+            return len(self._pids) - 1
+
+    def attach(self, source, src_index: int, pid: str = None) -> int:
+        """Register plot `src_index` of a read-only source without copying it. Returns its index."""
+        if pid is None:
+            pid = source.plot_id(src_index)
+        with self._lock:
+            existing = self._by_pid.get(pid)
+            if existing is not None:
+                return existing
+            sid = self._source_ids.get(id(source))
+            if sid is None:
+                sid = len(self._sources)
+                self._sources.append(source)
+                self._source_ids[id(source)] = sid
+            self._rec_start.append(len(self._field))
+            self._src.append(sid)
+            self._src_index.append(src_index)
+            self._by_pid[pid] = len(self._pids)
+            self._pids.append(pid)
+            self._hashes.append(None)
+            return len(self._pids) - 1
+
+    def close(self):
+        with self._lock:
+            self._data_fh.close()
+            self._index_fh.close()
+            self._map = (None, 0)
+        if self._cleanup is not None:
+            self._cleanup()
+
+
+class CorpusView(Sequence):
+    """A session's window onto the shared store: just a list of plot indices."""
+
+    def __init__(self, store: CorpusStore, indices=None):
+        self.store = store
+        self.indices = list(indices or [])
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.store[j] for j in self.indices[i]]
+        return self.store[self.indices[i]]
+
+    def append(self, plot: dict):
+        self.indices.append(self.store.add(plot))
+
+    def append_external(self, source, src_index: int, pid: str = None):
+        self.indices.append(self.store.attach(source, src_index, pid))
+
+    def clear(self):
+        self.indices.clear()
@@ -0,0 +1,146 @@
+"""
+Chunked export of annotation frames to CSV, Parquet or Arrow (no Streamlit).
+
+Files are written chunk by chunk (`CHUNK_ROWS` rows at a time) into one byte
+buffer, so exporting never holds a whole CSV string plus its encoded bytes in
+memory, and nothing is generated until a caller asks for it (the app passes
+`deferred(...)` to st.download_button, which runs it only on click and accepts
+bytes from it).
+
+Incremental exports: `ExportCheckpoints` remembers how many rows of a dataset were
+exported last time, so "new rows only" exports cover [checkpoint, len). Building a file
+never moves the checkpoint: a browser download can still fail or be cancelled, so the
+caller calls `mark` once the user confirms the rows were saved (the app has a "mark as
+exported" button). The SQLite log keeps its own durable checkpoints by row id
+(AnnotationStore.get_checkpoint / set_checkpoint, used by `cli.py export`).
+
+Parquet / Arrow need pyarrow (optional; it is imported on first use).
+"""
+
+import importlib.util
+import io
+
+from annotation_table import BOOL_COLUMNS, SCORE_COLUMNS
+
+CHUNK_ROWS = 5000
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# format -> (mime type, file extension)
+FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "arrow": ("application/vnd.apache.arrow.file", ".arrow"),
+}
+
+
+def available_formats() -> list:
+    return [f for f in FORMATS if f == "csv" or HAS_PYARROW]
+
+
+def iter_chunks(df, chunk_rows: int = CHUNK_ROWS):
+    for lo in range(0, len(df), chunk_rows):
+        yield df.iloc[lo:lo + chunk_rows]
+
+
+def typed_frame(rows, columns):
+    """DataFrame for a chunk of row dicts with stable dtypes, so every chunk has the same schema."""
+    import pandas as pd
+
+    df = pd.DataFrame.from_records(rows, columns=list(columns))
+    for c in df.columns:
+        if c in SCORE_COLUMNS:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
+        elif c in BOOL_COLUMNS:
+            df[c] = df[c].astype("boolean")
+        elif c.endswith("_z"):
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("float64")
+        else:
+            df[c] = df[c].astype("string")
+    return df
+
+
+def write_frames(frames, fh, fmt: str, schema=None) -> int:
+    """Write an iterable of DataFrame chunks (same columns) to binary file `fh`. Returns rows written."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format: {fmt}")
+    n = 0
+    if fmt == "csv":
+        first = True
+        for chunk in frames:
+            fh.write(chunk.to_csv(index=False, header=first).encode("utf-8"))
+            first = False
+            n += len(chunk)
+        return n
+
+    import pyarrow as pa
+
+    writer = None
+    try:
+        for chunk in frames:
+            if schema is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                if fmt == "parquet":
+                    import pyarrow.parquet as pq
+                    writer = pq.ParquetWriter(fh, schema)
+                else:
+                    writer = pa.ipc.new_file(fh, schema)
+            writer.write_table(table)
+            n += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n
+
+
+def export_frame(df, fmt: str, chunk_rows: int = CHUNK_ROWS) -> bytes:
+    """Whole DataFrame -> file contents."""
+    out = io.BytesIO()
+    schema = None
+    if fmt != "csv" and len(df):
+        import pyarrow as pa
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+    write_frames(iter_chunks(df, chunk_rows), out, fmt, schema=schema)
+    return out.getvalue()
+
+
+class ExportCheckpoints(dict):
+    """dataset name -> rows already exported (for append-only tables)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.generations = {}   # dataset name -> table generation the row count refers to
+
+    def pending(self, name: str, n_rows: int, generation=None):
+        """(lo, hi) row range not exported yet; a table that shrank or was reset starts over."""
+        lo = self.get(name, 0)
+        if lo > n_rows or self.generations.get(name) != generation:
+            lo = 0
+        return lo, n_rows
+
+    def mark(self, name: str, n_rows: int, generation=None):
+        self[name] = n_rows
+        self.generations[name] = generation
+
+
+def deferred(frame_fn, fmt: str, checkpoints: ExportCheckpoints = None, name: str = None,
+             incremental: bool = False, generation=None):
+    """
+    Zero-argument callable that returns the export's bytes when called. `frame_fn()`
+    returns the current DataFrame; with `incremental`, only rows past the checkpoint are
+    written. The checkpoint is only read here, never moved (see ExportCheckpoints.mark).
+    `generation` identifies the source table (AnnotationTable.generation), so a reset
+    table starts over.
+    """
+    def build():
+        df = frame_fn()
+        lo, hi = (0, len(df))
+        if checkpoints is not None and name is not None:
+            lo, hi = checkpoints.pending(name, len(df), generation)
+            if not incremental:
+                lo = 0
+        return export_frame(df.iloc[lo:hi], fmt)
+
+    return build
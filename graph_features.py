@@ -0,0 +1,276 @@
+"""
+Per-plot causal-graph metrics (no Streamlit).
+
+`extract()` turns one `causal_graph` payload into a flat dict of numbers:
+
+- size: events, edges, characters, conflicts, density
+- shape: depth (longest causal path, in events; cycles are left out), roots, leaves,
+  mean / max branching factor (out-degree of events that have successors)
+- event types: milestone / escalation / climax / other counts
+- conflicts: one `conflict_<type>` count per conflict type
+- edges: one `edge_<type>_ratio` per edge type (share of all edges)
+- characters: degree centrality in the co-occurrence graph (characters linked when
+  they share an event): max, Freeman centralization, the protagonist's, and the
+  share of events the most central character is involved in
+
+Metrics are cached by the content hash of the payload (the same key the render
+cache uses) in a JSON Lines file next to the corpus index (FEATURES_FILE in the
+corpus directory), so every corpus is processed once. Missing plots are computed in
+a process pool (`compute_many`); FeatureTable keeps them aligned with the rows of a
+plot list, like CorpusIndex.
+"""
+
+import json
+import os
+import re
+import threading
+from collections import Counter
+
+from graph_layout import node_id
+from render_cache import content_hash
+
+FEATURES_FILE = "features.jsonl"
+FEATURE_VERSION = 1     # bump when metrics change; cache lines of other versions are ignored
+INLINE_BELOW = 32       # fewer missing plots than this are computed in-process
+EVENT_TYPES = ("milestone", "escalation", "climax")
+
+_NON_WORD = re.compile(r"\W+", re.UNICODE)
+
+
+def _slug(value) -> str:
+    return _NON_WORD.sub("_", str(value or "unknown").lower()).strip("_") or "unknown"
+
+
+def _names(value) -> list:
+    if isinstance(value, str):
+        return [value] if value else []
+    return [str(v) for v in value or () if v]
+
+
+# ============== extraction ==============
+
+def extract(raw) -> dict:
+    """Metrics of one causal_graph payload (JSON string or dict); {"has_graph": False} if unusable."""
+    data = raw
+    if isinstance(raw, (str, bytes)):
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            data = None
+    if not isinstance(data, dict):
+        return {"has_graph": False}
+
+    nodes = [n for n in data.get("event_nodes") or () if isinstance(n, dict)]
+    edges = [e for e in data.get("edges") or () if isinstance(e, dict)]
+    conflicts = [c for c in data.get("conflicts") or () if isinstance(c, dict)]
+    characters = [c for c in data.get("characters") or () if c]
+    n = len(nodes)
+    out = {"has_graph": True, "events": n, "edges": len(edges), "conflicts": len(conflicts),
+           "density": len(edges) / (n * (n - 1)) if n > 1 else 0.0}
+
+    # ---- event types ----
+    types = Counter()
+    for node in nodes:
+        t = str(node.get("type", "")).lower()
+        types[next((k for k in EVENT_TYPES if k in t), "other")] += 1
+    for k in EVENT_TYPES + ("other",):
+        out[f"{k}_count"] = types[k]
+
+    # ---- shape: longest path over the acyclic part (Kahn), branching ----
+    ids = {node_id(node) for node in nodes}
+    succ = {v: [] for v in ids}
+    indeg = dict.fromkeys(ids, 0)
+    for e in edges:
+        u, v = str(e.get("from", "")), str(e.get("to", ""))
+        if u in ids and v in ids and u != v:
+            succ[u].append(v)
+            indeg[v] += 1
+    outdeg = [len(s) for s in succ.values()]
+    out["roots"] = sum(1 for v in ids if indeg[v] == 0)
+    out["leaves"] = sum(1 for d in outdeg if d == 0)
+    branching = [d for d in outdeg if d]
+    out["branching_mean"] = sum(branching) / len(branching) if branching else 0.0
+    out["branching_max"] = max(branching, default=0)
+
+    remaining = dict(indeg)
+    level = dict.fromkeys(ids, 1)
+    frontier = [v for v in ids if remaining[v] == 0]
+    seen = 0
+    while frontier:
+        u = frontier.pop()
+        seen += 1
+        for v in succ[u]:
+            level[v] = max(level[v], level[u] + 1)
+            remaining[v] -= 1
+            if remaining[v] == 0:
+                frontier.append(v)
+    out["depth"] = max((level[v] for v in ids if remaining[v] <= 0), default=0)
+    out["cyclic_events"] = len(ids) - seen
+
+    # ---- conflicts / edge types ----
+    for t, c in Counter(_slug(c.get("type")) for c in conflicts).items():
+        out[f"conflict_{t}"] = c
+    for t, c in Counter(_slug(e.get("type") or "causal") for e in edges).items():
+        out[f"edge_{t}_ratio"] = c / len(edges)
+
+    # ---- character co-occurrence centrality ----
+    roles = {}
+    for c in characters:
+        if isinstance(c, dict):
+            roles.setdefault(str(c.get("name", "")), str(c.get("role", "")).lower())
+        else:
+            roles.setdefault(str(c), "")
+    neighbors = {name: set() for name in roles if name}
+    events_of = Counter()
+    for node in nodes:
+        involved = set(_names(node.get("characters_involved")))
+        for name in involved:
+            neighbors.setdefault(name, set()).update(involved - {name})
+            events_of[name] += 1
+    k = len(neighbors)
+    out["characters"] = k
+    if k > 1:
+        degree = {name: len(nb) / (k - 1) for name, nb in neighbors.items()}
+        top = max(degree, key=lambda name: (degree[name], events_of[name]))
+        out["centrality_max"] = degree[top]
+        out["centralization"] = (sum(degree[top] - d for d in degree.values()) / (k - 2)) if k > 2 else 0.0
+        out["top_character"] = top
+        out["top_character_event_share"] = events_of[top] / n if n else 0.0
+        protagonist = next((name for name, role in roles.items() if "protagonist" in role and name in degree), None)
+        out["protagonist_centrality"] = degree[protagonist] if protagonist is not None else None
+    return out
+
+
+def _extract_payload(raw) -> tuple:
+    """(content hash, metrics) for one payload. Runs in a worker process."""
+    return content_hash(raw), extract(raw)
+
+
+def compute_many(raws, workers: int = None, mp_context=None, chunksize: int = 16) -> list:
+    """[(content hash, metrics)] for payloads, in order; large batches go to a process pool."""
+    raws = list(raws)
+    if len(raws) < INLINE_BELOW or workers == 1:
+        return [_extract_payload(r) for r in raws]
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        return list(pool.map(_extract_payload, raws, chunksize=chunksize))
+
+
+# ============== cache ==============
+
+class FeatureCache:
+    """content hash -> metrics, appended to a JSON Lines file (None = memory only)."""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._data = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn trailing line from a crash
+                    if (isinstance(rec, dict) and rec.get("v") == FEATURE_VERSION
+                            and isinstance(rec.get("key"), str) and isinstance(rec.get("f"), dict)):
+                        self._data[rec["key"]] = rec["f"]
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: str):
+        return self._data.get(key)
+
+    def put_many(self, items):
+        items = list(items)
+        with self._lock:
+            # filtered under the lock, so two sessions adding the same plots write them once
+            new = [(k, f) for k, f in items if k not in self._data]
+            if not new:
+                return
+            self._data.update(new)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as fh:
+                    for k, f in new:
+                        fh.write(json.dumps({"v": FEATURE_VERSION, "key": k, "f": f}, ensure_ascii=False) + "\n")
+
+    def ensure(self, raws, workers: int = None, mp_context=None) -> list:
+        """Metrics for each payload, computing (and caching) only the ones not seen before."""
+        keys = [content_hash(r) for r in raws]
+        missing = {}
+        for k, r in zip(keys, raws):
+            if k not in self._data and k not in missing:
+                missing[k] = r
+        if missing:
+            self.put_many(compute_many(missing.values(), workers, mp_context))
+        return [self._data[k] for k in keys]
+
+
+# ============== table ==============
+
+class FeatureTable:
+    """Metrics for each row of a plot list, kept in step with it (see CorpusIndex.sync)."""
+
+    def __init__(self):
+        self.plot_ids = []
+        self.rows = []
+        self._source = None
+        self._frame = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def sync(self, plots, cache: FeatureCache, id_fn, workers: int = None, mp_context=None):
+        """Add metrics for plots appended since the last call (rebuild if the list was replaced or shrank)."""
+        if plots is not self._source or len(plots) < len(self):
+            self.__init__()
+            self._source = plots
+        if len(plots) == len(self):
+            return
+        new = [plots[i] for i in range(len(self), len(plots))]
+        self.rows += cache.ensure([p.get("causal_graph") for p in new], workers, mp_context)
+        self.plot_ids += [id_fn(p) for p in new]
+        self._frame = None
+
+    def to_frame(self):
+        """DataFrame with one row per plot (plot_id first), cached until the next sync adds rows."""
+        if self._frame is None:
+            import pandas as pd
+
+            df = pd.DataFrame.from_records(self.rows)
+            conflict = sorted(c for c in df.columns if c.startswith("conflict_"))
+            edge = sorted(c for c in df.columns if c.startswith("edge_"))
+            df = df[[c for c in df.columns if c not in conflict and c not in edge] + conflict + edge]
+            df[conflict] = df[conflict].fillna(0).astype(int)
+            df[edge] = df[edge].fillna(0.0)
+            df.insert(0, "plot_id", self.plot_ids)
+            self._frame = df
+        return self._frame
+
+
+# ============== filtering ==============
+
+# operator -> comparison on a column Series; the feature table is filtered with these
+# boolean masks only (never DataFrame.query / eval, which run arbitrary expressions)
+FILTER_OPS = {
+    ">=": lambda col, v: col >= v,
+    ">": lambda col, v: col > v,
+    "<=": lambda col, v: col <= v,
+    "<": lambda col, v: col < v,
+    "==": lambda col, v: col == v,
+    "!=": lambda col, v: col != v,
+    "contains": lambda col, v: col.astype("string").str.contains(str(v), case=False, regex=False),
+}
+
+
+def filter_mask(df, column: str, op: str, value):
+    """Boolean mask of the rows where `column <op> value`; missing values never match."""
+    if column not in df.columns:
+        raise KeyError(column)
+    if op not in FILTER_OPS:
+        raise ValueError(f"unknown filter operator: {op}")
+    col = df[column]
+    return (FILTER_OPS[op](col, value) & col.notna()).fillna(False).astype(bool)
+
@@ -0,0 +1,295 @@
+"""
+Size-aware preprocessing and layout settings for causal graphs.
+
+Small graphs are drawn exactly as before (every event, orthogonal edges). Above the
+size thresholds the graph is simplified before it reaches Graphviz:
+
+1) Linear chains of `causal` edges (each link is the only way out of one event and
+   the only way into the next) are collapsed into one summary node; `expand` lists
+   chain ids to keep open.
+2) Transitive reduction drops `causal` edges implied by a longer causal path
+   (catalyst / concurrent edges are always kept).
+3) Events are grouped into clusters: by an explicit `act` field when present,
+   otherwise into phases that start at each run of milestone events.
+4) Edge routing gets cheaper as the graph grows: ortho -> polyline -> line.
+
+The size thresholds are the routing tiers: pass `tiers` to layout_plan / is_large, or
+set PLOT_LAYOUT_TIERS (e.g. "40:60:ortho,150:300:polyline") to change the defaults.
+"""
+
+import os
+import textwrap
+
+DEFAULT_TIERS = (
+    (40, 60, "ortho"),
+    (150, 300, "polyline"),
+)
+LARGE_SPLINES = "line"
+CHAIN_MIN_LEN = 3
+
+TYPE_COLORS = {
+    'milestone': '#00BCD4',
+    'escalation': '#66BB6A',
+    'climax': '#EF5350',
+    'default': '#78909C'
+}
+
+
+def parse_tiers(text: str) -> tuple:
+    """"max_nodes:max_edges:splines,..." -> routing tiers (ascending); ValueError if malformed."""
+    tiers = []
+    for part in (text or "").split(","):
+        if part.strip():
+            nodes, edges, splines = part.strip().split(":")
+            tiers.append((int(nodes), int(edges), splines.strip()))
+    if not tiers:
+        raise ValueError("no routing tiers")
+    return tuple(sorted(tiers))
+
+
+# routing tiers: (max nodes, max edges, splines); above the last tier LARGE_SPLINES is used.
+# The first tier is also the "large graph" threshold.
+ROUTING_TIERS = parse_tiers(os.environ["PLOT_LAYOUT_TIERS"]) if os.environ.get("PLOT_LAYOUT_TIERS") else DEFAULT_TIERS
+
+
+def node_id(n: dict) -> str:
+    name = str(n.get('name', n.get('label', n.get('id', ''))))
+    return str(n.get('id', name))
+
+
+def node_color(n: dict) -> str:
+    ntype = str(n.get('type', 'default')).lower()
+    return next((v for k, v in TYPE_COLORS.items() if k in ntype), TYPE_COLORS['default'])
+
+
+def _is_causal(e: dict) -> bool:
+    return str(e.get('type', 'causal') or 'causal').lower() == 'causal'
+
+
+def pick_splines(n_nodes: int, n_edges: int, tiers=None) -> str:
+    for max_nodes, max_edges, splines in tiers or ROUTING_TIERS:
+        if n_nodes <= max_nodes and n_edges <= max_edges:
+            return splines
+    return LARGE_SPLINES
+
+
+def is_large(data: dict, tiers=None) -> bool:
+    n_nodes = len(data.get('event_nodes', []) or [])
+    n_edges = len(data.get('edges', []) or [])
+    first_nodes, first_edges, _ = (tiers or ROUTING_TIERS)[0]
+    return n_nodes > first_nodes or n_edges > first_edges
+
+
+def find_chains(ids, edges, min_len: int = CHAIN_MIN_LEN) -> list:
+    """Maximal linear runs of causal edges, as lists of node ids (only runs of >= min_len)."""
+    out_deg, in_deg, succ = {}, {}, {}
+    for e in edges:
+        a, b = str(e.get('from')), str(e.get('to'))
+        out_deg[a] = out_deg.get(a, 0) + 1
+        in_deg[b] = in_deg.get(b, 0) + 1
+        if _is_causal(e):
+            succ[a] = b
+
+    def link(a):
+        # a -> b is a chain link if it is a's only out-edge, b's only in-edge, and causal
+        b = succ.get(a)
+        if b is None or out_deg.get(a) != 1 or in_deg.get(b) != 1 or b == a:
+            return None
+        return b
+
+    linked_to = {}
+    for a in ids:
+        b = link(a)
+        if b is not None:
+            linked_to[b] = a
+    chains, seen = [], set()
+    for a in ids:
+        if a in linked_to or a in seen:
+            continue  # not a chain head
+        run = [a]
+        seen.add(a)
+        b = link(a)
+        while b is not None and b not in seen:
+            run.append(b)
+            seen.add(b)
+            b = link(b)
+        if len(run) >= min_len:
+            chains.append(run)
+    return chains
+
+
+def _components(ids, succ) -> dict:
+    """node -> strongly connected component number (iterative Tarjan)."""
+    index, low, comp, stack, on_stack = {}, {}, {}, [], set()
+    counter = n_comp = 0
+    for root in ids:
+        if root in index:
+            continue
+        work = [(root, iter(succ.get(root, ())))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            v, it = work[-1]
+            w = next(it, None)
+            if w is not None:
+                if w not in index:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(succ.get(w, ()))))
+                elif w in on_stack:
+                    low[v] = min(low[v], index[w])
+                continue
+            work.pop()
+            if work:
+                low[work[-1][0]] = min(low[work[-1][0]], low[v])
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    comp[w] = n_comp
+                    if w == v:
+                        break
+                n_comp += 1
+    return comp
+
+
+def transitive_reduction(ids, edges) -> list:
+    """
+    Drop causal edges u->v when v is also reachable from u through a longer causal path.
+    Works on the condensation (strongly connected components), so edges inside a cycle
+    are always kept and a cycle cannot justify dropping the edges that lead into it.
+    """
+    succ = {i: set() for i in ids}
+    for e in edges:
+        if _is_causal(e):
+            succ.setdefault(str(e.get('from')), set()).add(str(e.get('to')))
+    comp = _components(list(succ), succ)
+    csucc = {}
+    for u, vs in succ.items():
+        for v in vs:
+            if comp[u] != comp[v]:
+                csucc.setdefault(comp[u], set()).add(comp[v])
+
+    memo = {}
+
+    def redundant(cu, cv):
+        # is cv reachable from cu without taking the direct cu -> cv step?
+        if (cu, cv) not in memo:
+            stack = [w for w in csucc.get(cu, ()) if w != cv]
+            seen = set(stack)
+            found = False
+            while stack and not found:
+                w = stack.pop()
+                for x in csucc.get(w, ()):
+                    if x == cv:
+                        found = True
+                        break
+                    if x not in seen:
+                        seen.add(x)
+                        stack.append(x)
+            memo[(cu, cv)] = found
+        return memo[(cu, cv)]
+
+    out = []
+    for e in edges:
+        if _is_causal(e):
+            cu, cv = comp[str(e.get('from'))], comp[str(e.get('to'))]
+            if cu != cv and redundant(cu, cv):
+                continue
+        out.append(e)
+    return out
+
+
+def find_clusters(nodes) -> list:
+    """[(label, [node ids])]: by `act` when every node has one, else milestone-led phases."""
+    if nodes and all(n.get('act') not in (None, '') for n in nodes):
+        groups = {}
+        for n in nodes:
+            groups.setdefault(str(n['act']), []).append(node_id(n))
+        return [(f"Act {act}", ids) for act, ids in groups.items()]
+    clusters, prev_milestone = [], False
+    for n in nodes:
+        milestone = 'milestone' in str(n.get('type', '')).lower()
+        if not clusters or (milestone and not prev_milestone):
+            clusters.append((f"Phase {len(clusters) + 1}", []))
+        clusters[-1][1].append(node_id(n))
+        prev_milestone = milestone
+    return clusters
+
+
+def layout_plan(data: dict, expand=(), mode: str = "auto", tiers=None) -> dict:
+    """
+    What to draw: {"nodes", "edges", "clusters", "chains", "splines", "compact"}.
+    mode: "auto" (compact only above the first routing tier), "full" or "compact";
+    tiers: routing tiers (default ROUTING_TIERS).
+    Nodes in the plan carry "id", "name", "color"; collapsed chains have ids "chain_<first id>"
+    and also list their members under "chain".
+    """
+    nodes = list(data.get('event_nodes', []) or [])
+    edges = list(data.get('edges', []) or [])
+    compact = mode == "compact" or (mode == "auto" and is_large(data, tiers))
+
+    plan_nodes = [{"id": node_id(n), "name": str(n.get('name', n.get('label', n.get('id', '')))),
+                   "color": node_color(n)} for n in nodes]
+    plan_edges = [{"from": str(e.get('from')), "to": str(e.get('to')), "type": str(e.get('type', '')).lower()}
+                  for e in edges]
+    if not compact:
+        return {"nodes": plan_nodes, "edges": plan_edges, "clusters": [], "chains": {},
+                "splines": pick_splines(len(plan_nodes), len(plan_edges), tiers), "compact": False}
+
+    ids = [n["id"] for n in plan_nodes]
+    by_id = {n["id"]: n for n in plan_nodes}
+    # no ':' in chain ids: Graphviz reads "a:b" in an edge endpoint as node a, port b
+    chains = {f"chain_{run[0]}": run for run in find_chains(ids, edges)}
+    expand = set(expand)
+    owner = {}
+    for cid, run in chains.items():
+        if cid in expand:
+            continue
+        for i in run:
+            owner[i] = cid
+
+    out_nodes, emitted = [], set()
+    for n in plan_nodes:
+        cid = owner.get(n["id"])
+        if cid is None:
+            out_nodes.append(n)
+        elif cid not in emitted:
+            run = chains[cid]
+            colors = [by_id[i]["color"] for i in run if i in by_id]
+            color = TYPE_COLORS['climax'] if TYPE_COLORS['climax'] in colors else colors[0]
+            out_nodes.append({"id": cid, "name": f"{n['name']} … (+{len(run) - 1} events)",
+                              "color": color, "chain": run})
+            emitted.add(cid)
+
+    seen_edges, out_edges = set(), []
+    for e in plan_edges:
+        a, b = owner.get(e["from"], e["from"]), owner.get(e["to"], e["to"])
+        if a == b or (a, b, e["type"]) in seen_edges:
+            continue
+        seen_edges.add((a, b, e["type"]))
+        out_edges.append({"from": a, "to": b, "type": e["type"]})
+    out_ids = [n["id"] for n in out_nodes]
+    out_edges = transitive_reduction(out_ids, out_edges)
+
+    clusters, placed = [], set()
+    for label, members in find_clusters(nodes):
+        mapped = []
+        for i in members:
+            j = owner.get(i, i)
+            if j not in placed:  # a chain spanning two phases stays in the first
+                placed.add(j)
+                mapped.append(j)
+        if mapped:
+            clusters.append((label, mapped))
+
+    return {"nodes": out_nodes, "edges": out_edges, "clusters": clusters, "chains": chains,
+            "splines": pick_splines(len(out_nodes), len(out_edges), tiers), "compact": True}
+
+
+def wrap_label(name: str) -> str:
+    return "\\n".join(textwrap.wrap(name, 20))
@@ -0,0 +1,109 @@
+"""
+Upload ingest ledger.
+
+`st.file_uploader` returns the same file list on every rerun; the ledger remembers
+which files were already ingested (by name + size + content hash) so they are
+skipped without re-parsing, and keeps the set of known plot ids so dedup never
+rescans the corpus.
+
+Accepts JSON files and columnar `.plotc` corpora (see corpus_format.py).
+"""
+
+import hashlib
+import json
+
+from corpus_format import ColumnarCorpus, is_columnar
+
+
+def _read_bytes(f) -> bytes:
+    """Bytes of an uploaded file / file-like / path, without consuming Streamlit buffers."""
+    if isinstance(f, str):
+        with open(f, "rb") as fh:
+            return fh.read()
+    if hasattr(f, "getvalue"):
+        return f.getvalue()
+    if hasattr(f, "seek"):
+        f.seek(0)
+    data = f.read()
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+
+class IngestLedger:
+    """Per-corpus record of ingested files and plot ids."""
+
+    def __init__(self):
+        self.files = {}       # (name, size, sha1) -> number of plots added
+        self._fast = {}       # (name, size, upload file_id) -> ledger key
+        self.plot_ids = set()
+
+    @staticmethod
+    def _fast_key(f):
+        # Streamlit gives every upload a unique file_id; reruns hand back the same one
+        file_id = getattr(f, "file_id", None)
+        if file_id is None:
+            return None
+        return (getattr(f, "name", ""), getattr(f, "size", None), file_id)
+
+    def reset(self):
+        self.files.clear()
+        self._fast.clear()
+        self.plot_ids.clear()
+
+    def ingest(self, files, plots: list, id_fn) -> int:
+        """Append new, de-duplicated plots from `files` to `plots`. Returns the number added."""
+        added_total = 0
+        for f in files:
+            fast = self._fast_key(f)
+            if fast is not None and fast in self._fast:
+                continue
+            try:
+                data = _read_bytes(f)
+            except Exception:
+                continue
+            key = (getattr(f, "name", str(f)), len(data), hashlib.sha1(data).hexdigest())
+            if fast is not None:
+                self._fast[fast] = key
+            if key in self.files:
+                continue
+            if is_columnar(data):
+                added = self._ingest_columnar(data, plots)
+                self.files[key] = added
+                added_total += added
+                continue
+            try:
+                content = json.loads(data)
+            except Exception:
+                self.files[key] = 0
+                continue
+            items = content if isinstance(content, list) else [content]
+            added = 0
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                pid = id_fn(item)
+                if pid not in self.plot_ids:
+                    plots.append(item)
+                    self.plot_ids.add(pid)
+                    added += 1
+            self.files[key] = added
+            added_total += added
+        return added_total
+
+    def _ingest_columnar(self, data: bytes, plots) -> int:
+        # ids come from the metadata table; heavy fields stay compressed until read
+        try:
+            corpus = ColumnarCorpus.from_bytes(data)
+        except ValueError:
+            return 0
+        added = 0
+        for i in range(len(corpus)):
+            pid = corpus.plot_id(i)
+            if pid in self.plot_ids:
+                continue
+            if hasattr(plots, "append_external"):
+                plots.append_external(corpus, i, pid)
+            else:
+                plots.append(corpus[i].to_dict())
+            self.plot_ids.add(pid)
+            added += 1
+        return added
@@ -0,0 +1,320 @@
+"""
+Per-annotator calibration normalization for every score dimension.
+
+NormalizationEngine follows an AnnotationTable: `sync(table)` folds only the rows
+appended since the last call into running per-annotator calibration statistics
+(Welford mean / variance per dimension) and z-scores only those rows. When a new
+calibration row shifts an annotator's statistics, just that annotator's rows are
+re-scored, in one vectorized pass.
+
+Like the original overall_z preview: statistics come from calibration (gold) rows
+only, an annotator needs at least `min_calibration` of them, sd == 0 is treated as
+1, and only non-calibration rows get a z-score (NaN elsewhere).
+
+robust=True uses median / MAD (scaled by 1.4826) of the calibration scores instead.
+
+CalibrationStats / zscore_values are the dependency-free, mergeable equivalent used
+by the command-line tools (cli.py) to normalize files larger than memory.
+"""
+
+import warnings
+
+import numpy as np
+
+from annotation_table import SCORE_COLUMNS
+
+MAD_SCALE = 1.4826
+
+
+class NormalizationEngine:
+    def __init__(self, dims=SCORE_COLUMNS, min_calibration: int = 2, robust: bool = False):
+        self.dims = tuple(dims)
+        self.min_calibration = int(min_calibration)
+        self.robust = bool(robust)
+        self.reset()
+
+    def reset(self):
+        d = len(self.dims)
+        self._table = None
+        self._generation = None
+        self._seen = 0
+        self._aids = {}                          # annotator_id -> stats row
+        self._count = np.zeros((0, d), dtype=np.int64)
+        self._mean = np.zeros((0, d))
+        self._m2 = np.zeros((0, d))
+        self._calib = []                         # stats row -> list of (d,) float arrays (robust mode)
+        self._center = np.zeros((0, d))
+        self._scale = np.ones((0, d))
+        self._z = np.full((0, d), np.nan)
+
+    # ---------- statistics ----------
+
+    def _stats_row(self, aid: str) -> int:
+        a = self._aids.get(aid)
+        if a is None:
+            a = len(self._aids)
+            self._aids[aid] = a
+            d = len(self.dims)
+            self._count = np.vstack([self._count, np.zeros((1, d), dtype=np.int64)])
+            self._mean = np.vstack([self._mean, np.zeros((1, d))])
+            self._m2 = np.vstack([self._m2, np.zeros((1, d))])
+            self._center = np.vstack([self._center, np.zeros((1, d))])
+            self._scale = np.vstack([self._scale, np.ones((1, d))])
+            self._calib.append([])
+        return a
+
+    def _observe_calibration(self, a: int, x: np.ndarray, present: np.ndarray):
+        # Welford update, per dimension that has a value
+        cnt = self._count[a] + present
+        delta = np.where(present, x - self._mean[a], 0.0)
+        safe = np.maximum(cnt, 1)
+        self._mean[a] = self._mean[a] + delta / safe
+        self._m2[a] = self._m2[a] + delta * np.where(present, x - self._mean[a], 0.0)
+        self._count[a] = cnt
+        self._calib[a].append(np.where(present, x, np.nan))
+
+    def _refresh_params(self, rows):
+        for a in rows:
+            if self.robust and self._calib[a]:
+                vals = np.vstack(self._calib[a])
+                with np.errstate(all="ignore"), warnings.catch_warnings():
+                    warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN dimension
+                    center = np.nanmedian(vals, axis=0)
+                    scale = MAD_SCALE * np.nanmedian(np.abs(vals - center), axis=0)
+            else:
+                center = self._mean[a]
+                with np.errstate(all="ignore"):
+                    scale = np.sqrt(self._m2[a] / np.maximum(self._count[a], 1))
+            scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+            self._center[a] = center
+            self._scale[a] = scale
+
+    # ---------- table sync ----------
+
+    def _matrix(self, table, lo: int, hi: int):
+        d = len(self.dims)
+        x = np.zeros((hi - lo, d))
+        present = np.zeros((hi - lo, d), dtype=bool)
+        cols = set(table.columns)
+        for j, dim in enumerate(self.dims):
+            if dim in cols:
+                x[:, j] = table.column(dim)[lo:hi]
+                present[:, j] = ~table.missing(dim)[lo:hi]
+        return x, present
+
+    def _stats_map(self, table) -> np.ndarray:
+        """Table annotator code -> stats row (table categories are append-only)."""
+        return np.array([self._stats_row(aid) for aid in table.categories("annotator_id")], dtype=np.int64)
+
+    def _score(self, table, tmap, lo: int, hi: int, rows=None):
+        """z-score table rows [lo, hi) (optionally only those whose stats row is in `rows`)."""
+        codes = table.column("annotator_id")[lo:hi]
+        calib = table.column("is_calibration")[lo:hi]
+        sel = np.arange(lo, hi)
+        a = np.where(codes >= 0, tmap[np.maximum(codes, 0)], -1)
+        if rows is not None:
+            keep = np.isin(a, rows)
+            sel, a, calib = sel[keep], a[keep], calib[keep]
+            if not len(sel):
+                return
+        if not len(self._count):
+            self._z[sel] = np.nan
+            return
+        x, present = self._matrix(table, lo, hi)
+        x, present = x[sel - lo], present[sel - lo]
+        a_safe = np.maximum(a, 0)
+        enough = self._count[a_safe] >= self.min_calibration
+        valid = present & enough & ~calib[:, None] & (a >= 0)[:, None]
+        with np.errstate(all="ignore"):
+            z = (x - self._center[a_safe]) / self._scale[a_safe]
+        self._z[sel] = np.where(valid, z, np.nan)
+
+    def sync(self, table):
+        """Fold rows appended to `table` since the last call into the statistics and z-scores."""
+        n = len(table)
+        if table is not self._table or table.generation != self._generation or n < self._seen:
+            self.reset()
+            self._table = table
+            self._generation = table.generation
+        lo = self._seen
+        if n == lo or "annotator_id" not in table.columns or "is_calibration" not in table.columns:
+            self._seen = n
+            return
+
+        tmap = self._stats_map(table)
+        codes = table.column("annotator_id")[lo:n]
+        calib = table.column("is_calibration")[lo:n]
+        changed = set()
+        calib_rows = np.nonzero(calib & (codes >= 0))[0]
+        if len(calib_rows):
+            x, present = self._matrix(table, lo, n)
+            for r in calib_rows:   # gold rows are a small fraction; update them one by one
+                a = int(tmap[codes[r]])
+                self._observe_calibration(a, x[r], present[r])
+                changed.add(a)
+            self._refresh_params(sorted(changed))
+
+        if len(self._z) < n:
+            grow = np.full((max(n, 2 * len(self._z)) - len(self._z), len(self.dims)), np.nan)
+            self._z = np.vstack([self._z, grow])
+        if changed and lo:
+            self._score(table, tmap, 0, lo, rows=np.array(sorted(changed)))
+        self._score(table, tmap, lo, n)
+        self._seen = n
+
+    def set_robust(self, robust: bool):
+        if bool(robust) != self.robust:
+            table = self._table
+            self.robust = bool(robust)
+            self.reset()
+            if table is not None:
+                self.sync(table)
+
+    # ---------- outputs ----------
+
+    def zscores(self) -> dict:
+        """{f"{dim}_z": float array} for the synced rows (views; NaN where undefined)."""
+        return {f"{dim}_z": self._z[:self._seen, j] for j, dim in enumerate(self.dims)}
+
+    def normalized_frame(self, table):
+        """table.to_frame() plus one `<dim>_z` column per dimension."""
+        self.sync(table)
+        df = table.to_frame()
+        if df.empty or "annotator_id" not in df.columns or "is_calibration" not in df.columns:
+            return df
+        return df.assign(**self.zscores())
+
+    def stats_frame(self):
+        """Per-annotator calibration count / center / scale for each dimension."""
+        import pandas as pd
+
+        aids = sorted(self._aids, key=self._aids.get)
+        cols = {"annotator_id": aids}
+        for j, dim in enumerate(self.dims):
+            cols[f"{dim}_n"] = self._count[:, j]
+            cols[f"{dim}_center"] = self._center[:, j]
+            cols[f"{dim}_scale"] = self._scale[:, j]
+        return pd.DataFrame(cols)
+
+
+def zscore_frame(df, dims=SCORE_COLUMNS, min_calibration: int = 2, robust: bool = False):
+    """
+    One-shot version for a plain DataFrame: adds `<dim>_z` columns using each annotator's
+    calibration rows, computed with a single groupby + vectorized arithmetic.
+    """
+    import pandas as pd
+
+    if df.empty or "annotator_id" not in df.columns or "is_calibration" not in df.columns:
+        return df
+    cols = [c for c in dims if c in df.columns]
+    if not cols:
+        return df
+    values = df[cols].apply(pd.to_numeric, errors="coerce")
+    is_calib = df["is_calibration"].astype(bool).to_numpy()
+    aid = df["annotator_id"].astype(str)
+
+    grouped = values[is_calib].groupby(aid[is_calib].to_numpy())
+    count = grouped.count()
+    if robust:
+        center = grouped.median()
+        dev = (values[is_calib] - center.reindex(aid[is_calib].to_numpy()).to_numpy()).abs()
+        scale = dev.groupby(aid[is_calib].to_numpy()).median() * MAD_SCALE
+    else:
+        center = grouped.mean()
+        scale = grouped.std(ddof=0)
+    scale = scale.where(scale > 0, 1.0)
+    center = center.where(count >= min_calibration)
+
+    mu = center.reindex(aid.to_numpy()).to_numpy(dtype=float)
+    sd = scale.reindex(aid.to_numpy()).to_numpy(dtype=float)
+    z = (values.to_numpy(dtype=float) - mu) / sd
+    z[is_calib] = np.nan
+    return df.assign(**{f"{c}_z": z[:, j] for j, c in enumerate(cols)})
+
+
+class CalibrationStats:
+    """
+    Mergeable per-annotator calibration statistics in plain Python, for streaming files
+    in worker processes: each worker folds its shard with `add`, the parent `merge`s the
+    partial results (Chan et al. parallel variance) and calls `params`.
+    Gives the same center / scale as zscore_frame and NormalizationEngine.
+    """
+
+    def __init__(self, dims=SCORE_COLUMNS, robust: bool = False):
+        self.dims = tuple(dims)
+        self.robust = bool(robust)
+        self.count = {}    # annotator_id -> [n per dim]
+        self.mean = {}
+        self.m2 = {}
+        self.values = {}   # annotator_id -> [[values] per dim] (robust mode only)
+
+    def _slot(self, aid: str):
+        if aid not in self.count:
+            d = len(self.dims)
+            self.count[aid] = [0] * d
+            self.mean[aid] = [0.0] * d
+            self.m2[aid] = [0.0] * d
+            if self.robust:
+                self.values[aid] = [[] for _ in range(d)]
+        return self.count[aid], self.mean[aid], self.m2[aid]
+
+    def add(self, aid: str, scores):
+        """Fold one calibration row; `scores` has one float (or None) per dimension."""
+        count, mean, m2 = self._slot(aid)
+        for j, x in enumerate(scores):
+            if x is None:
+                continue
+            count[j] += 1
+            delta = x - mean[j]
+            mean[j] += delta / count[j]
+            m2[j] += delta * (x - mean[j])
+            if self.robust:
+                self.values[aid][j].append(x)
+
+    def merge(self, other: "CalibrationStats") -> "CalibrationStats":
+        for aid, o_count in other.count.items():
+            count, mean, m2 = self._slot(aid)
+            for j, nb in enumerate(o_count):
+                if not nb:
+                    continue
+                na = count[j]
+                n = na + nb
+                delta = other.mean[aid][j] - mean[j]
+                mean[j] += delta * nb / n
+                m2[j] += other.m2[aid][j] + delta * delta * na * nb / n
+                count[j] = n
+                if self.robust:
+                    self.values[aid][j].extend(other.values[aid][j])
+        return self
+
+    def params(self, min_calibration: int = 2) -> dict:
+        """annotator_id -> (centers, scales); a center is None below `min_calibration` rows."""
+        out = {}
+        for aid, count in self.count.items():
+            centers, scales = [], []
+            for j, n in enumerate(count):
+                if self.robust:
+                    vals = self.values[aid][j]
+                    center = _median(vals) if vals else None
+                    scale = MAD_SCALE * _median([abs(v - center) for v in vals]) if vals else 0.0
+                else:
+                    center = self.mean[aid][j] if n else None
+                    scale = (self.m2[aid][j] / n) ** 0.5 if n else 0.0
+                centers.append(center if n >= min_calibration else None)
+                scales.append(scale if scale > 0 else 1.0)
+            out[aid] = (centers, scales)
+        return out
+
+
+def _median(vals):
+    s = sorted(vals)
+    mid = len(s) // 2
+    return s[mid] if len(s) % 2 else (s[mid - 1] + s[mid]) / 2
+
+
+def zscore_values(scores, params):
+    """z-scores for one non-calibration row given that annotator's `params` entry (None where undefined)."""
+    if params is None:
+        return [None] * len(scores)
+    centers, scales = params
+    return [None if x is None or c is None else (x - c) / s for x, c, s in zip(scores, centers, scales)]
@@ -0,0 +1,24 @@
+"""
+Plot dict helpers shared by the app and the offline tools (no Streamlit import).
+"""
+
+
+def safe_get(plot: dict, key: str, default=""):
+    v = plot.get(key, default)
+    return default if v is None else v
+
+def get_plot_id(plot: dict) -> str:
+    """Stable-ish id for plots: prefer explicit id, else title+seed+method."""
+    for k in ["plot_id", "id", "uuid"]:
+        if plot.get(k):
+            return str(plot[k])
+    title = str(plot.get("title", ""))
+    seed = str(plot.get("seed_id", plot.get("seed", "")))
+    method = str(plot.get("method", plot.get("method_name", plot.get("system", ""))))
+    return f"{title}||{seed}||{method}"
+
+def get_seed_id(plot: dict) -> str:
+    return safe_get(plot, "seed_id", safe_get(plot, "seed", ""))
+
+def get_method_name(plot: dict) -> str:
+    return safe_get(plot, "method_name", safe_get(plot, "method", safe_get(plot, "system", "")))
@@ -0,0 +1,102 @@
+"""
+Background prefetch of the plots an annotator is likely to open next.
+
+While a plot is being read and scored the server is idle. The app names the likely
+next plots (next in the selector, the scheduler's next pick, the next gold plot) and
+a small thread pool warms the shared RenderCache for them: parsed causal graph, story
+tree model, DOT sources and SVG. Opening one of those plots is then a cache hit.
+
+The pool is bounded twice: `max_workers` threads, and at most `max_pending` queued
+jobs (further requests are dropped, not queued). A plot already warmed recently, or
+already in flight, is not submitted again.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher:
+    """Bounded, de-duplicating background runner for `warm_fn(*args)` jobs keyed by plot id."""
+
+    def __init__(self, warm_fn, max_workers: int = 2, max_pending: int = 8, remember: int = 1024):
+        self.warm_fn = warm_fn
+        self.max_pending = max(1, int(max_pending))
+        self.remember = max(1, int(remember))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)),
+                                        thread_name_prefix="plot-prefetch")
+        self._lock = threading.Lock()
+        self._pending = {}          # key -> Future
+        self._warmed = OrderedDict()  # recently warmed keys (bounded LRU)
+        self.submitted = 0
+        self.dropped = 0
+        self.errors = 0
+        self._closed = False
+
+    def submit(self, key, *args) -> bool:
+        """Queue `warm_fn(*args)` unless `key` is in flight, recently warmed, the queue is full or closed."""
+        with self._lock:
+            if self._closed or key in self._pending:
+                return False
+            if key in self._warmed:
+                self._warmed.move_to_end(key)
+                return False
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self.submitted += 1
+            future = self._pool.submit(self._run, key, args)
+            self._pending[key] = future
+            return True
+
+    def _run(self, key, args):
+        try:
+            self.warm_fn(*args)
+            ok = True
+        except Exception:
+            ok = False
+        with self._lock:
+            self._pending.pop(key, None)
+            if ok:
+                self._warmed[key] = True
+                while len(self._warmed) > self.remember:
+                    self._warmed.popitem(last=False)
+            else:
+                self.errors += 1
+
+    def forget(self, key=None):
+        """Allow `key` (or every key) to be warmed again, e.g. after the cache was cleared."""
+        with self._lock:
+            if key is None:
+                self._warmed.clear()
+            else:
+                self._warmed.pop(key, None)
+
+    def wait(self, timeout: float = None):
+        """Block until the jobs queued so far are finished (tests / benchmarks)."""
+        with self._lock:
+            futures = list(self._pending.values())
+        for f in futures:
+            try:
+                f.result(timeout=timeout)
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "warmed": len(self._warmed),
+                "submitted": self.submitted,
+                "dropped": self.dropped,
+                "errors": self.errors,
+            }
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting jobs and cancel the queued ones; a job already running is not interrupted."""
+        with self._lock:
+            self._closed = True
+            for key, future in list(self._pending.items()):
+                if future.cancel():
+                    del self._pending[key]
+        self._pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,99 @@
+"""
+Offline batch pre-render of a plot corpus into the on-disk render cache.
+
+    python prerender.py merged_data.json --cache-dir .render_cache --workers 8
+
+For every plot, in a process pool: parse `causal_graph`, build the DOT source of the
+causal graph and of the story tree (the views the app opens with) and lay both out
+to SVG, and split the script into sections (the paged viewer's outline).
+Everything is written to a content-addressed RenderCache directory; start the app
+with PLOT_RENDER_CACHE_DIR pointing at the same directory and the plot card is
+served from cache instead of doing layout work on the annotation hot path.
+
+Accepts JSON corpora and columnar .plotc files (see corpus_format.py).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import charts
+import script_view
+from corpus_format import ColumnarCorpus
+from render_cache import RenderCache
+
+_CACHE = None
+_SVG = True
+
+
+def iter_payloads(path: str):
+    """(causal_graph, pruned_tree, final_plot) for each plot in a .json or .plotc corpus."""
+    with open(path, "rb") as fh:
+        head = fh.read(8)
+    if head == b"PLOTCOL1":
+        corpus = ColumnarCorpus.open(path)
+        for plot in corpus:
+            yield plot.get("causal_graph"), plot.get("pruned_tree"), plot.get("final_plot")
+        return
+    with open(path, "r", encoding="utf-8") as fh:
+        content = json.load(fh)
+    for plot in content if isinstance(content, list) else [content]:
+        if isinstance(plot, dict):
+            yield plot.get("causal_graph"), plot.get("pruned_tree"), plot.get("final_plot")
+
+
+def _init_worker(cache_dir: str, svg: bool):
+    global _CACHE, _SVG
+    # the memory tier is irrelevant here; entries go straight to disk
+    _CACHE = RenderCache(max_entries=8, disk_dir=cache_dir)
+    _SVG = svg
+
+
+def render_payload(payload) -> dict:
+    """Warm every cache entry the app needs for one plot. Runs in a worker process."""
+    raw_graph, tree_text, script = payload
+    stats = {"graphs": 0, "trees": 0, "svgs": 0, "scripts": 0, "errors": 0}
+    try:
+        stats.update(charts.warm_plot({"causal_graph": raw_graph, "pruned_tree": tree_text}, _CACHE, svg=_SVG))
+        stats["scripts"] = script_view.warm_script(script, _CACHE)
+    except Exception:
+        stats["errors"] += 1
+    return stats
+
+
+def prerender(path: str, cache_dir: str, workers: int = None, svg: bool = True, chunksize: int = 4) -> dict:
+    t0 = time.perf_counter()
+    totals = {"plots": 0, "graphs": 0, "trees": 0, "svgs": 0, "scripts": 0, "errors": 0}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_dir, svg)) as pool:
+        for stats in pool.map(render_payload, iter_payloads(path), chunksize=chunksize):
+            totals["plots"] += 1
+            for k, v in stats.items():
+                totals[k] += v
+    totals["seconds"] = round(time.perf_counter() - t0, 3)
+    return totals
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Pre-render causal graphs and story trees into the render cache.")
+    ap.add_argument("corpus", help="corpus file (.json or .plotc)")
+    ap.add_argument("--cache-dir", default=os.environ.get("PLOT_RENDER_CACHE_DIR", ".render_cache"),
+                    help="render cache directory (default: $PLOT_RENDER_CACHE_DIR or .render_cache)")
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    ap.add_argument("--no-svg", action="store_true", help="only parse and build DOT sources")
+    args = ap.parse_args(argv)
+
+    svg = not args.no_svg
+    if svg and not (charts.HAS_GRAPHVIZ and shutil.which("dot")):
+        print("Graphviz `dot` not found: caching parsed graphs and DOT sources only", file=sys.stderr)
+        svg = False
+    totals = prerender(args.corpus, args.cache_dir, workers=args.workers, svg=svg)
+    print(json.dumps(totals, indent=2))
+    return 1 if totals["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+Pairwise (A/B) ratings: incremental ELO plus a batch Bradley-Terry fit (NumPy, no Streamlit).
+
+RatingEngine takes comparison rows (`plot_a`, `plot_b` and, per dimension, "A", "B"
+or "tie") incrementally. Each comparison updates the per-dimension ELO ratings at
+once (start 1500, K = 32, as in the README) and is appended to a compact log of item
+codes and outcomes, so the Bradley-Terry model can be refitted from the whole log:
+
+- `fit(dim)` collapses the log into unique item pairs (np.unique + bincount) and fits
+  by Newton's method on the information matrix (up to FULL_COV_ITEMS items) or by the
+  MM algorithm (Hunter 2004) as bincount sweeps over those pairs. A weak prior,
+  `prior` virtual ties against an average item, keeps items without wins or losses
+  finite and pins the scale. Standard errors come from the Fisher information of the
+  log-strengths (full inverse for up to FULL_COV_ITEMS items, its diagonal above).
+  Ratings and confidence intervals are reported on the ELO scale (1500 = average).
+- `next_pair()` picks the comparison with the highest expected information: outcome
+  variance p(1 - p) (from the current ELO ratings, averaged over dimensions) times
+  the pair's combined rating variance, searched from the least-compared items that
+  still have a partner this annotator has not judged them against (pairs already
+  judged are skipped), so None means every pair has been judged.
+
+Ties count as half a win for each side. Results are cached until the next `add_rows`.
+"""
+
+import math
+import random
+import threading
+
+import numpy as np
+
+from annotation_table import SCORE_COLUMNS
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+ELO_SCALE = 400 / math.log(10)   # log-strength -> ELO points
+OUTCOMES = {"A": 1.0, "B": 0.0, "tie": 0.5}
+PRIOR = 1.0                      # virtual ties per item against an average item
+FULL_COV_ITEMS = 2000            # above this, confidence intervals use the diagonal information
+Z_95 = 1.959964
+nan = float("nan")
+
+
+def expected_score(ra, rb):
+    """ELO win probability of A against B."""
+    return 1.0 / (1.0 + 10.0 ** ((rb - ra) / 400.0))
+
+
+def _grow(arr: np.ndarray, n: int, fill) -> np.ndarray:
+    if n <= arr.shape[-1]:
+        return arr
+    shape = arr.shape[:-1] + (max(n, 2 * arr.shape[-1], 64),)
+    out = np.full(shape, fill, dtype=arr.dtype)
+    out[..., :arr.shape[-1]] = arr
+    return out
+
+
+# "A" / "B" / "tie" in any case -> score of A (anything else is "not judged")
+_SCORE_OF = {v: x for k, x in OUTCOMES.items() for v in (k, k.lower(), k.upper(), k.capitalize())}
+
+
+# ============== Bradley-Terry ==============
+
+def _information(i, j, games, p, prior):
+    """Fisher information of the log-strengths: (pair weights, diagonal)."""
+    w = games * p[i] * p[j] / (p[i] + p[j]) ** 2
+    diag = np.bincount(i, w, len(p)) + np.bincount(j, w, len(p)) + prior * p / (p + 1) ** 2
+    return w, diag
+
+
+def _dense(i, j, w, diag):
+    m = len(diag)
+    off = np.bincount(i * m + j, w, m * m).reshape(m, m)
+    return np.diag(diag) - off - off.T
+
+
+def bradley_terry(i: np.ndarray, j: np.ndarray, games: np.ndarray, wins_i: np.ndarray, n_items: int,
+                  prior: float = PRIOR, max_iter: int = 500, tol: float = 1e-8):
+    """
+    Fit on aggregated pairs: `games[k]` comparisons between items i[k] and j[k], of which
+    i[k] won `wins_i[k]`. Returns (log-strengths, standard errors, iterations).
+
+    Newton steps on the dense information matrix up to FULL_COV_ITEMS items (a handful
+    of iterations); MM updates above that (cheap per sweep, linear convergence).
+    """
+    wins = (np.bincount(i, wins_i, n_items) + np.bincount(j, games - wins_i, n_items)
+            + prior / 2)
+    theta = np.zeros(n_items)
+    dense = n_items <= FULL_COV_ITEMS
+    it = 0
+    for it in range(1, max_iter + 1):
+        p = np.exp(theta)
+        if dense:
+            t = games / (p[i] + p[j])
+            grad = wins - p * (np.bincount(i, t, n_items) + np.bincount(j, t, n_items) + prior / (p + 1))
+            w, diag = _information(i, j, games, p, prior)
+            step = np.linalg.solve(_dense(i, j, w, diag), grad)
+            # the log-likelihood is concave; cap the step so the first iterations stay in range
+            step *= min(1.0, 2.0 / max(np.abs(step).max(), 1e-300))
+        else:
+            t = games / (p[i] + p[j])
+            denom = np.bincount(i, t, n_items) + np.bincount(j, t, n_items) + prior / (p + 1)
+            step = np.log(wins / denom) - theta
+        theta += step
+        if not n_items or np.abs(step).max() < tol:
+            break
+
+    p = np.exp(theta)
+    w, diag = _information(i, j, games, p, prior)
+    if dense:
+        se = np.sqrt(np.diag(np.linalg.inv(_dense(i, j, w, diag))))
+    else:
+        se = 1.0 / np.sqrt(diag)
+    return theta, se, it
+
+
+# ============== engine ==============
+
+class RatingEngine:
+    def __init__(self, dims=SCORE_COLUMNS, k: float = K_FACTOR, initial: float = INITIAL_RATING,
+                 prior: float = PRIOR):
+        self.dims = tuple(dims)
+        self.k = float(k)
+        self.initial = float(initial)
+        self.prior = float(prior)
+        self.lock = threading.RLock()   # for callers sharing one engine between threads
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.version = 0
+        self.cursor = 0     # caller's position in its row source (log id / list index) already folded in
+        self._codes = {}
+        self.items = []
+        self._elo = np.zeros((len(self.dims), 0))
+        self._games = np.zeros(0, dtype=np.int64)
+        self._a = np.zeros(0, dtype=np.int32)
+        self._b = np.zeros(0, dtype=np.int32)
+        self._s = np.zeros((len(self.dims), 0), dtype=np.float32)   # score of A, NaN = not judged
+        self._judged = {}   # annotator_id -> {plot_id: set of plot_ids compared with it}
+        self._cache = {}
+
+    def _code(self, plot_id) -> int:
+        plot_id = str(plot_id)
+        code = self._codes.get(plot_id)
+        if code is None:
+            code = self._codes[plot_id] = len(self.items)
+            self.items.append(plot_id)
+            self._elo = _grow(self._elo, code + 1, self.initial)
+            self._games = _grow(self._games, code + 1, 0)
+        return code
+
+    def add_rows(self, rows) -> int:
+        """Fold new comparison rows; ELO ratings are updated in row order."""
+        a_codes, b_codes, scores = [], [], []
+        for r in rows:
+            a_id, b_id = r.get("plot_a"), r.get("plot_b")
+            if a_id in (None, "") or b_id in (None, "") or str(a_id) == str(b_id):
+                continue
+            s = [_SCORE_OF.get(r.get(dim), nan) for dim in self.dims]
+            if s.count(nan) == len(s):   # same NaN object, so count() matches it
+                continue
+            a_codes.append(self._code(a_id))
+            b_codes.append(self._code(b_id))
+            scores.append(s)
+            aid = r.get("annotator_id")
+            if aid not in (None, ""):
+                judged = self._judged.setdefault(str(aid), {})
+                judged.setdefault(str(a_id), set()).add(str(b_id))
+                judged.setdefault(str(b_id), set()).add(str(a_id))
+        if not scores:
+            return 0
+        lo, hi = self.n, self.n + len(scores)
+        self._a = _grow(self._a, hi, 0)
+        self._b = _grow(self._b, hi, 0)
+        self._s = _grow(self._s, hi, np.nan)
+        self._a[lo:hi], self._b[lo:hi] = a_codes, b_codes
+        self._s[:, lo:hi] = np.array(scores, dtype=np.float32).T
+        self.n = hi
+        np.add.at(self._games, self._a[lo:hi], 1)
+        np.add.at(self._games, self._b[lo:hi], 1)
+
+        # ELO is order-dependent: replay the batch on plain floats of the touched items only
+        touched = np.unique(np.concatenate([self._a[lo:hi], self._b[lo:hi]]))
+        local = {int(c): k for k, c in enumerate(touched)}
+        elo = self._elo[:, touched].T.tolist()
+        k = self.k
+        for a, b, s in zip(a_codes, b_codes, scores):
+            ea, eb = elo[local[a]], elo[local[b]]
+            for d, x in enumerate(s):
+                if x == x:
+                    delta = k * (x - 1.0 / (1.0 + 10.0 ** ((eb[d] - ea[d]) / 400.0)))
+                    ea[d] += delta
+                    eb[d] -= delta
+        self._elo[:, touched] = np.array(elo).T
+        self.version += 1
+        self._cache.clear()
+        return len(scores)
+
+    def sync_list(self, rows: list):
+        """Fold rows appended to a list since the last call (a cleared list starts over)."""
+        n = len(rows)
+        if n < self.cursor:
+            self.reset()
+        if n > self.cursor:
+            self.add_rows(rows[self.cursor:n])
+        self.cursor = n
+
+    # ---------- queries ----------
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def elo(self, dim: str) -> dict:
+        d = self.dims.index(dim)
+        return dict(zip(self.items, self._elo[d, :len(self.items)].tolist()))
+
+    def fit(self, dim: str) -> dict:
+        """Bradley-Terry ratings with 95% intervals (and the current ELO) of one dimension, best first."""
+        return self._cached(("fit", dim), lambda: self._fit(dim))
+
+    def _fit(self, dim: str) -> dict:
+        d = self.dims.index(dim)
+        m = len(self.items)
+        s = self._s[d, :self.n]
+        ok = ~np.isnan(s)
+        a, b, s = self._a[:self.n][ok].astype(np.int64), self._b[:self.n][ok].astype(np.int64), s[ok]
+        lo, hi = np.minimum(a, b), np.maximum(a, b)
+        pairs, inv = np.unique(lo * max(m, 1) + hi, return_inverse=True)
+        games = np.bincount(inv, minlength=len(pairs)).astype(float)
+        wins_lo = np.bincount(inv, np.where(a == lo, s, 1 - s), len(pairs))
+        i, j = pairs // max(m, 1), pairs % max(m, 1)
+        theta, se, iters = bradley_terry(i, j, games, wins_lo, m, self.prior)
+
+        played = np.bincount(i, games, m) + np.bincount(j, games, m)
+        won = np.bincount(i, wins_lo, m) + np.bincount(j, games - wins_lo, m)
+        rating = self.initial + ELO_SCALE * theta
+        half = Z_95 * ELO_SCALE * se
+        has = np.flatnonzero(played > 0)
+        order = has[np.argsort(-rating[has], kind="stable")]
+        return {"plot_id": [self.items[k] for k in order], "rating": rating[order],
+                "ci_low": rating[order] - half[order], "ci_high": rating[order] + half[order],
+                "comparisons": played[order].astype(np.int64), "wins": won[order],
+                "elo": self._elo[d, order], "iterations": iters}
+
+    def next_pair(self, candidates, annotator_id: str = None, anchors: int = 16, seed=None):
+        """
+        Most informative (plot_a, plot_b) among `candidates` (plot ids) for this annotator,
+        or None once they have judged every pair. A/B order is randomised so position bias
+        averages out.
+        """
+        cand = list(dict.fromkeys(str(c) for c in candidates))
+        if len(cand) < 2:
+            return None
+        rng = random.Random(seed)
+        codes = np.array([self._codes.get(c, -1) for c in cand])
+        known = codes >= 0
+        games = np.zeros(len(cand))
+        games[known] = self._games[codes[known]]
+        elo = np.full((len(self.dims), len(cand)), self.initial)
+        elo[:, known] = self._elo[:, codes[known]]
+        # Bradley-Terry variance of a log-strength after g even games: 1 / (p(1-p) (g + prior)), p = 1/2
+        var = 4.0 / (games + self.prior)
+
+        judged = self._judged.get(str(annotator_id), {}) if annotator_id not in (None, "") else {}
+        pos = {c: k for k, c in enumerate(cand)}
+        # anchors come only from items with an unjudged partner left, so the search can't dead-end
+        open_ = np.ones(len(cand), dtype=bool)
+        for k, c in enumerate(cand):
+            done = judged.get(c)
+            if done and sum(1 for other in done if other in pos and other != c) >= len(cand) - 1:
+                open_[k] = False
+        if not open_.any():
+            return None
+
+        noise = np.array([rng.random() for _ in cand]) * 1e-9
+        order = np.argsort(-(var + noise), kind="stable")
+        anchor = order[open_[order]][:max(1, anchors)]
+        p = expected_score(elo[:, anchor, None], elo[:, None, :])
+        gain = (p * (1 - p)).mean(axis=0) * (var[anchor, None] + var[None, :]) + noise[None, :]
+        gain[np.arange(len(anchor)), anchor] = -np.inf
+
+        if judged:
+            for r, k in enumerate(anchor):
+                for other in judged.get(cand[k], ()):
+                    if other in pos:
+                        gain[r, pos[other]] = -np.inf
+        r, k = np.unravel_index(np.argmax(gain), gain.shape)
+        if not np.isfinite(gain[r, k]):
+            return None
+        pair = [cand[anchor[r]], cand[k]]
+        rng.shuffle(pair)
+        return tuple(pair)
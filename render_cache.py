@@ -0,0 +1,161 @@
+"""
+Content-addressed render cache for causal graphs, story trees and script outlines.
+
+Entries are keyed by a hash of the plot content that produced them, so the same
+`causal_graph` / `pruned_tree` text maps to the same parsed dict, DOT source and
+SVG no matter which session, plot index or rerun asks for it.
+
+Two tiers:
+1) In-memory LRU, bounded by entry count (shared by every session in the process)
+2) Optional on-disk tier (one file per entry), survives restarts
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# kind -> file extension used by the disk tier
+KINDS = {
+    "graph": ".json",   # parsed causal_graph dict
+    "dot": ".dot",      # DOT source text
+    "svg": ".svg",      # pre-laid-out SVG markup
+    "layout": ".json",  # causal graph layout plan (graph_layout.layout_plan)
+    "script_outline": ".json",   # script section offsets (script_view.py)
+}
+JSON_KINDS = {"graph", "layout", "script_outline"}
+
+_MISSING = object()
+
+
+def content_hash(value) -> str:
+    """Stable hex digest of a str / bytes / JSON-able value."""
+    if value is None:
+        value = ""
+    if not isinstance(value, (str, bytes)):
+        value = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return hashlib.blake2b(value, digest_size=16).hexdigest()
+
+
+class RenderCache:
+    """Bounded LRU cache with an optional disk tier. Thread-safe."""
+
+    def __init__(self, max_entries: int = 256, disk_dir: str = None):
+        self.max_entries = max(1, int(max_entries))
+        self.disk_dir = disk_dir
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # ---------- disk tier ----------
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.disk_dir, kind, key[:2], key + KINDS[kind])
+
+    def _disk_get(self, kind: str, key: str):
+        if not self.disk_dir:
+            return _MISSING
+        try:
+            with open(self._path(kind, key), "r", encoding="utf-8") as fh:
+                text = fh.read()
+        except OSError:
+            return _MISSING
+        if kind in JSON_KINDS:
+            try:
+                return json.loads(text)
+            except ValueError:
+                return _MISSING
+        return text
+
+    def _disk_put(self, kind: str, key: str, value):
+        if not self.disk_dir or value is None:
+            return
+        path = self._path(kind, key)
+        text = json.dumps(value, ensure_ascii=False) if kind in JSON_KINDS else str(value)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write-then-rename so concurrent readers never see a partial file
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                fh.write(text)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            pass
+
+    # ---------- public API ----------
+
+    def get(self, kind: str, key: str, default=None):
+        if kind not in KINDS:
+            raise ValueError(f"unknown cache kind: {kind}")
+        mkey = (kind, key)
+        with self._lock:
+            if mkey in self._mem:
+                self._mem.move_to_end(mkey)
+                self.hits += 1
+                return self._mem[mkey]
+        value = self._disk_get(kind, key)
+        if value is _MISSING:
+            with self._lock:
+                self.misses += 1
+            return default
+        with self._lock:
+            self.hits += 1
+            self._remember(mkey, value)
+        return value
+
+    def put(self, kind: str, key: str, value, disk: bool = True):
+        """Store `value`; disk=False keeps it in memory only (e.g. negative entries that may heal)."""
+        if kind not in KINDS:
+            raise ValueError(f"unknown cache kind: {kind}")
+        with self._lock:
+            self._remember((kind, key), value)
+        if disk:
+            self._disk_put(kind, key, value)
+        return value
+
+    def get_or_compute(self, kind: str, key: str, compute):
+        """Return the cached value, computing and storing it on a miss."""
+        value = self.get(kind, key, _MISSING)
+        if value is not _MISSING:
+            return value
+        return self.put(kind, key, compute())
+
+    def __contains__(self, item) -> bool:
+        kind, key = item
+        with self._lock:
+            if (kind, key) in self._mem:
+                return True
+        return bool(self.disk_dir) and os.path.exists(self._path(kind, key))
+
+    def clear(self, disk: bool = False):
+        with self._lock:
+            self._mem.clear()
+            self.hits = self.misses = 0
+        if disk and self.disk_dir:
+            import shutil
+            for kind in KINDS:
+                shutil.rmtree(os.path.join(self.disk_dir, kind), ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._mem),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_dir": self.disk_dir,
+            }
+
+    def _remember(self, mkey, value):
+        # caller holds the lock
+        self._mem[mkey] = value
+        self._mem.move_to_end(mkey)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
@@ -0,0 +1,119 @@
+"""
+Coverage-balancing assignment scheduler.
+
+Hands each annotator the least-covered plot they have not rated yet, using a
+min-heap keyed by (ratings so far, seeded tie-break). Entries are invalidated
+lazily: `record()` pushes a fresh entry and stale ones are dropped when popped, so
+picking the next plot costs O(log N) plus the plots this annotator already rated
+at the front of the queue.
+
+Gold (calibration) plots are kept out of the regular queue and injected with
+probability `gold_rate`. Plots that reached `target_per_plot` ratings are no
+longer handed out. Every draw is reproducible from `seed`, the annotator id and
+how many plots that annotator has been given.
+"""
+
+import heapq
+import random
+
+
+class AssignmentScheduler:
+    def __init__(self, target_per_plot: int = 3, gold_rate: float = 0.1, seed: int = 0):
+        self.target_per_plot = max(1, int(target_per_plot))
+        self.gold_rate = float(gold_rate)
+        self.seed = int(seed)
+        self._heap = []           # (coverage, tie-break, plot_id)
+        self._coverage = {}       # plot_id -> number of ratings (also for plots not queued here)
+        self._queued = set()      # plots this scheduler may hand out
+        self._tiebreak = {}
+        self._rated = {}          # annotator_id -> set of plot_ids
+        self._handed = {}         # annotator_id -> number of plots handed out
+        self.gold = set()
+
+    def __len__(self):
+        return len(self._queued)
+
+    # ---------- updates ----------
+
+    def add_plot(self, plot_id: str):
+        if plot_id in self._queued:
+            return
+        self._queued.add(plot_id)
+        cov = self._coverage.setdefault(plot_id, 0)
+        # seeded per plot, so the order among equally covered plots does not depend on insert order
+        self._tiebreak[plot_id] = random.Random(f"{self.seed}:{plot_id}").random()
+        heapq.heappush(self._heap, (cov, self._tiebreak[plot_id], plot_id))
+
+    def set_gold(self, plot_ids):
+        self.gold = set(plot_ids)
+
+    def record(self, annotator_id: str, plot_id: str):
+        """Count one rating of `plot_id` by `annotator_id`."""
+        self._rated.setdefault(annotator_id, set()).add(plot_id)
+        self._coverage[plot_id] = self._coverage.get(plot_id, 0) + 1
+        if plot_id in self._queued:
+            heapq.heappush(self._heap, (self._coverage[plot_id], self._tiebreak[plot_id], plot_id))
+
+    def configure(self, target_per_plot: int = None, gold_rate: float = None, seed: int = None):
+        if target_per_plot is not None:
+            self.target_per_plot = max(1, int(target_per_plot))
+        if gold_rate is not None:
+            self.gold_rate = float(gold_rate)
+        if seed is not None and int(seed) != self.seed:
+            self.seed = int(seed)
+            self._tiebreak = {pid: random.Random(f"{self.seed}:{pid}").random() for pid in self._queued}
+            self._heap = [(self._coverage[pid], self._tiebreak[pid], pid) for pid in self._queued]
+            heapq.heapify(self._heap)
+
+    # ---------- queries ----------
+
+    def coverage(self, plot_id: str) -> int:
+        return self._coverage.get(plot_id, 0)
+
+    def rated_by(self, annotator_id: str) -> set:
+        return self._rated.get(annotator_id, set())
+
+    def peek_gold(self, annotator_id: str):
+        """Least-covered gold plot `annotator_id` has not rated yet, or None."""
+        rated = self.rated_by(annotator_id)
+        todo = [pid for pid in self.gold if pid in self._queued and pid not in rated]
+        if not todo:
+            return None
+        return min(todo, key=lambda pid: (self._coverage.get(pid, 0), self._tiebreak.get(pid, 0.0), pid))
+
+    def next_for(self, annotator_id: str):
+        """plot_id to show next to `annotator_id`, or None when nothing is left for them."""
+        step = self._handed.get(annotator_id, 0)
+        self._handed[annotator_id] = step + 1
+        return self._pick(annotator_id, step)
+
+    def peek_for(self, annotator_id: str):
+        """What `next_for` would return now, without handing it out (used for prefetching)."""
+        return self._pick(annotator_id, self._handed.get(annotator_id, 0))
+
+    def _pick(self, annotator_id: str, step: int):
+        rng = random.Random(f"{self.seed}:{annotator_id}:{step}")
+        if self.gold and rng.random() < self.gold_rate:
+            pid = self.peek_gold(annotator_id)
+            if pid is not None:
+                return pid
+
+        rated = self.rated_by(annotator_id)
+        skipped = []
+        found = None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            cov, _, pid = entry
+            if cov != self._coverage.get(pid):
+                continue  # stale entry, a newer one is in the heap
+            if cov >= self.target_per_plot:
+                skipped.append(entry)
+                break  # everything left is at target
+            skipped.append(entry)
+            if pid in rated or pid in self.gold:
+                continue
+            found = pid
+            break
+        for entry in skipped:
+            heapq.heappush(self._heap, entry)
+        return found
@@ -0,0 +1,107 @@
+"""
+Paged script viewer support: split `final_plot` markdown into sections (no Streamlit).
+
+`script_outline()` splits a script once at its ATX headings (ignoring fenced code):
+a heading with little text of its own (under MIN_SECTION_CHARS, e.g. an act title and
+a one-line summary) is merged into the next section ("Act 1 › Scene 1"),
+so sections are scenes when the script has them. Sections longer than
+MAX_SECTION_CHARS are cut further at blank lines (outside fences). Only
+(title, level, start, end) offsets are kept, cached by the script's content hash;
+the viewer sends the markdown of the sections being read to st.markdown as is.
+"""
+
+import re
+
+from render_cache import content_hash
+
+MAX_SECTION_CHARS = 8000
+MIN_SECTION_CHARS = 200
+
+_HEADING = re.compile(r"^ {0,3}(#{1,6})[ \t]+(.*?)[ \t#]*$")
+_FENCE = re.compile(r"^ {0,3}(```|~~~)")
+
+
+def _cached(cache, kind, key, compute):
+    return cache.get_or_compute(kind, key, compute) if cache is not None else compute()
+
+
+def _fence(line: str, fence):
+    """(open fence marker or None, whether `line` is a fence line); only the opening marker closes a fence."""
+    m = _FENCE.match(line)
+    if not m:
+        return fence, False
+    if fence is None:
+        return m.group(1), True
+    return (None, True) if m.group(1) == fence else (fence, False)
+
+
+def _plain(title: str) -> str:
+    """Heading text without markdown emphasis markers."""
+    return re.sub(r"[*_`]+", "", title).strip() or "…"
+
+
+# ============== sections ==============
+
+def split_sections(text: str, max_chars: int = MAX_SECTION_CHARS) -> list:
+    """[{"title", "level", "start", "end"}] covering `text` in order (see module docstring)."""
+    heads = []   # (offset, level, title, offset of the line after the heading)
+    pos, fence = 0, None
+    for line in text.splitlines(keepends=True):
+        fence, was_fence = _fence(line, fence)
+        if not was_fence and fence is None:
+            m = _HEADING.match(line.rstrip("\r\n"))
+            if m:
+                heads.append((pos, len(m.group(1)), _plain(m.group(2)), pos + len(line)))
+        pos += len(line)
+
+    raw = []
+    if text[:heads[0][0] if heads else len(text)].strip():
+        raw.append({"title": "Opening / 开头", "level": 1, "start": 0, "end": heads[0][0] if heads else len(text)})
+    for k, (start, level, title, body) in enumerate(heads):
+        end = heads[k + 1][0] if k + 1 < len(heads) else len(text)
+        raw.append({"title": title, "level": level, "start": start, "end": end, "short": len(text[body:end].strip()) < MIN_SECTION_CHARS})
+
+    sections, carry = [], None
+    for sec in raw:
+        if carry is not None:
+            sec = {**sec, "title": f"{carry['title']} › {sec['title']}", "level": carry["level"], "start": carry["start"]}
+        if sec.get("short") and sec is not raw[-1]:
+            carry = sec
+            continue
+        carry = None
+        sections += _cut(text, sec, max_chars)
+    return sections or [{"title": "Script / 剧本", "level": 1, "start": 0, "end": len(text)}]
+
+
+def _cut(text: str, sec: dict, max_chars: int) -> list:
+    """Split an over-long section at blank lines (outside code fences) into parts of <= max_chars."""
+    start, end = sec["start"], sec["end"]
+    if end - start <= max_chars:
+        return [{"title": sec["title"], "level": sec["level"], "start": start, "end": end}]
+    cuts, last, fence = [start], start, None
+    pos = start
+    for line in text[start:end].splitlines(keepends=True):
+        fence, _ = _fence(line, fence)
+        pos += len(line)
+        if fence is None and not line.strip() and pos - cuts[-1] >= max_chars // 2:
+            last = pos
+        if pos - cuts[-1] > max_chars and last > cuts[-1]:
+            cuts.append(last)
+    cuts.append(end)
+    parts = [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+    return [{"title": f"{sec['title']} ({k}/{len(parts)})" if len(parts) > 1 else sec["title"],
+             "level": sec["level"], "start": a, "end": b} for k, (a, b) in enumerate(parts, start=1)]
+
+
+def script_outline(text: str, cache=None) -> list:
+    """Cached `split_sections(text)`."""
+    return _cached(cache, "script_outline", content_hash(text), lambda: split_sections(text))
+
+
+def warm_script(text, cache) -> int:
+    """Cache the outline the viewer opens with."""
+    if not text or not isinstance(text, str):
+        return 0
+    script_outline(text, cache)
+    return 1
+
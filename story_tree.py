@@ -0,0 +1,180 @@
+"""
+Story-tree model for `pruned_tree` text.
+
+The indented bullet text is parsed once, in a single pass, into an array-backed
+node table (parent / depth / label / detail columns, plus children in CSR form).
+`parse_tree` is memoized on the text, and `to_dot` renders a bounded view of the
+tree: cap the depth, keep only the first N children per node (and N top-level nodes), and collapse chosen
+subtrees into a single summary node. `auto_depth` picks the deepest level that
+fits a node budget, so the chart size stays bounded for any input size.
+
+With no limits, `to_dot` produces the same graph the app always drew.
+"""
+
+from array import array
+from functools import lru_cache
+
+NODE_ATTRS = dict(shape='box', style='filled', fillcolor='#E1F5FE',
+                  fontname='Arial', fontsize='11', margin='0.15')
+NODE_BUDGET = 150   # trees larger than this are shown as a bounded view by default
+MAX_CHILDREN = 12
+
+SUMMARY_ATTRS = dict(shape='box', style='rounded,filled,dashed', fillcolor='#ECEFF1',
+                     fontname='Arial', fontsize='10', fontcolor='#455A64')
+
+
+def _split(content: str):
+    """(label, detail): `[label] detail`, else a 25-char label and the whole line as detail."""
+    lo = content.find('[')
+    if lo >= 0:
+        hi = content.find(']', lo + 1)
+        if hi >= 0:
+            return content[lo + 1:hi], content.replace(content[lo:hi + 1], '')
+    label = content[:25] + '..' if len(content) > 25 else content
+    return label, content
+
+
+class TreeModel:
+    __slots__ = ("parent", "depth", "label", "detail", "child_start", "child_list", "size")
+
+    def __init__(self, text: str):
+        self.parent = array("i")
+        self.depth = array("i")
+        self.label = []
+        self.detail = []
+        stack = []  # (indent, node)
+        for line in text.split('\n'):
+            content = line.strip()
+            if not content:
+                continue
+            indent = len(line) - len(line.lstrip())
+            content = content.replace('*', '').strip()
+            label, detail = _split(content)
+
+            while stack and stack[-1][0] >= indent:
+                stack.pop()
+            node = len(self.label)
+            self.parent.append(stack[-1][1] if stack else -1)
+            self.depth.append(len(stack))
+            self.label.append(label)
+            self.detail.append(detail)
+            stack.append((indent, node))
+        self._index_children()
+
+    def _index_children(self):
+        n = len(self.label)
+        counts = array("i", [0]) * (n + 1)
+        for p in self.parent:
+            if p >= 0:
+                counts[p + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        self.child_start = counts
+        self.child_list = array("i", [0]) * counts[n]
+        fill = array("i", counts[:n])
+        for node, p in enumerate(self.parent):
+            if p >= 0:
+                self.child_list[fill[p]] = node
+                fill[p] += 1
+        # subtree sizes: parents always precede children, so one reverse pass is enough
+        self.size = array("i", [1]) * n
+        for node in range(n - 1, -1, -1):
+            p = self.parent[node]
+            if p >= 0:
+                self.size[p] += self.size[node]
+
+    def __len__(self):
+        return len(self.label)
+
+    @property
+    def max_depth(self) -> int:
+        return max(self.depth) if len(self.depth) else 0
+
+    def children(self, node: int):
+        return self.child_list[self.child_start[node]:self.child_start[node + 1]]
+
+    def roots(self):
+        return [i for i, p in enumerate(self.parent) if p < 0]
+
+    def visible(self, max_depth: int = None, max_children: int = None, collapsed=()):
+        """
+        Nodes shown under the given limits, in document order, plus {node: hidden children count}.
+        `max_children` also caps the top-level nodes; roots cut that way are counted under key -1.
+        """
+        collapsed = set(collapsed)
+        shown, hidden = [], {}
+        roots = self.roots()
+        if max_children is not None and len(roots) > max_children:
+            hidden[-1] = len(roots) - max_children
+            roots = roots[:max_children]
+        todo = list(reversed(roots))
+        while todo:
+            node = todo.pop()
+            shown.append(node)
+            kids = self.children(node)
+            if not len(kids):
+                continue
+            if node in collapsed or (max_depth is not None and self.depth[node] >= max_depth):
+                hidden[node] = len(kids)
+                continue
+            if max_children is not None and len(kids) > max_children:
+                hidden[node] = len(kids) - max_children
+                kids = kids[:max_children]
+            todo.extend(reversed(kids))
+        return shown, hidden
+
+    def auto_depth(self, budget: int = 150, max_children: int = None) -> int:
+        """Deepest depth cap whose view (with `max_children` applied) has at most `budget` nodes."""
+        level = self.roots()[:max_children]
+        total, depth = len(level), 0
+        while level:
+            nxt = []
+            for node in level:
+                nxt.extend(self.children(node)[:max_children])
+            total += len(nxt)
+            if not nxt or total > budget:
+                break
+            depth += 1
+            level = nxt
+        return depth
+
+    def to_dot(self, max_depth: int = None, max_children: int = None, collapsed=()):
+        """graphviz.Digraph of the bounded view (graphviz is imported lazily)."""
+        import graphviz
+
+        dot = graphviz.Digraph()
+        dot.attr(rankdir='TB')
+        dot.attr('node', **NODE_ATTRS)
+        dot.attr('edge', color='#666')
+
+        shown, hidden = self.visible(max_depth, max_children, collapsed)
+        for node in shown:
+            wrap_label = f"<{self.label[node]}<br/><font point-size='9' color='#555'>{self.detail[node][:40]}</font>>"
+            dot.node(f"n{node}", label=wrap_label)
+            p = self.parent[node]
+            if p >= 0:
+                dot.edge(f"n{p}", f"n{node}")
+        for node, count in hidden.items():
+            if node < 0:
+                dot.node("h_roots", label=f"+{count} more", **SUMMARY_ATTRS)
+                continue
+            if count == len(self.children(node)):
+                text = f"+{self.size[node] - 1} collapsed"
+            else:
+                text = f"+{count} more"
+            dot.node(f"h{node}", label=text, **SUMMARY_ATTRS)
+            dot.edge(f"n{node}", f"h{node}", style='dashed')
+        return dot
+
+
+@lru_cache(maxsize=256)
+def parse_tree(text: str) -> TreeModel:
+    """Memoized parse; treat the returned model as read-only."""
+    return TreeModel(text)
+
+
+def default_view(model: TreeModel):
+    """(max_depth, max_children) the app starts with: no limits unless the tree exceeds NODE_BUDGET."""
+    if len(model) <= NODE_BUDGET:
+        return None, None
+    return model.auto_depth(NODE_BUDGET, MAX_CHILDREN), MAX_CHILDREN
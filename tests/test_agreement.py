@@ -0,0 +1,102 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from agreement import AgreementEngine, icc_oneway, krippendorff_alpha_ordinal, rank_correlations
+from annotation_table import AnnotationTable
+
+# Krippendorff (2011), "Computing Krippendorff's Alpha-Reliability": 4 observers, 12 units, values 1-5
+KRIPPENDORFF_2011 = [
+    [1, 2, 3, 3, 2, 1, 4, 1, 2, None, None, None],
+    [1, 2, 3, 3, 2, 2, 4, 1, 2, 5, None, 3],
+    [None, 3, 3, 3, 2, 3, 4, 2, 2, 5, 1, None],
+    [1, 2, 3, 3, 2, 4, 4, 1, 2, 5, 1, None],
+]
+
+# Shrout & Fleiss (1979), Table 2: 6 targets x 4 judges
+SHROUT_FLEISS = [[9, 2, 5, 8], [6, 1, 3, 2], [8, 4, 6, 8], [7, 1, 2, 6], [10, 5, 6, 9], [6, 2, 4, 7]]
+
+
+def _counts(units, levels):
+    out = np.zeros((len(units), len(levels)), dtype=np.int64)
+    for u, values in enumerate(units):
+        for v in values:
+            out[u, levels.index(v)] += 1
+    return out
+
+
+def test_krippendorff_alpha_ordinal_reference():
+    units = [[coder[u] for coder in KRIPPENDORFF_2011 if coder[u] is not None] for u in range(12)]
+    assert krippendorff_alpha_ordinal(_counts(units, [1, 2, 3, 4, 5])) == pytest.approx(0.815, abs=5e-4)
+
+
+def test_krippendorff_alpha_perfect_agreement_and_no_pairs():
+    assert krippendorff_alpha_ordinal(_counts([[2, 2], [5, 5, 5], [1, 1]], [1, 2, 3, 4, 5])) == pytest.approx(1.0)
+    assert np.isnan(krippendorff_alpha_ordinal(_counts([[2], [5]], [1, 2, 3, 4, 5])))
+
+
+def test_icc_oneway_reference():
+    levels = list(range(1, 11))
+    icc1, icc1k = icc_oneway(_counts(SHROUT_FLEISS, levels), np.array(levels, dtype=float))
+    assert icc1 == pytest.approx(0.166, abs=1e-3)
+    assert icc1k == pytest.approx(0.443, abs=1e-3)
+
+
+def _tau_b(x, y):
+    s = sum(np.sign(x[i] - x[j]) * np.sign(y[i] - y[j]) for i, j in itertools.combinations(range(len(x)), 2))
+    n0 = len(x) * (len(x) - 1) / 2
+    t1 = sum(c * (c - 1) / 2 for c in np.unique(x, return_counts=True)[1])
+    t2 = sum(c * (c - 1) / 2 for c in np.unique(y, return_counts=True)[1])
+    return s / np.sqrt((n0 - t1) * (n0 - t2))
+
+
+def test_rank_correlations_match_direct_formulas():
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    x = rng.integers(0, 5, 40)
+    y = np.clip(x + rng.integers(-1, 2, 40), 0, 4)
+    table = np.zeros((1, 5, 5), dtype=np.int64)
+    np.add.at(table[0], (x, y), 1)
+    n, rho, tau = rank_correlations(table)
+    assert n[0] == 40
+    assert rho[0] == pytest.approx(pd.Series(x).rank().corr(pd.Series(y).rank()))   # Pearson of mid-ranks
+    assert tau[0] == pytest.approx(_tau_b(x, y))
+
+
+def _rows(table, annotators, gold=()):
+    return [{"annotator_id": annotators[j], "plot_id": f"p{i}", "is_calibration": f"p{i}" in gold, "overall": v}
+            for i, row in enumerate(table) for j, v in enumerate(row)]
+
+
+def test_engine_matches_estimators_and_pairwise():
+    engine = AgreementEngine(dims=("overall",))
+    engine.add_rows(_rows(SHROUT_FLEISS, ["j1", "j2", "j3", "j4"]))
+    assert engine.icc("overall")[0] == pytest.approx(0.166, abs=1e-3)
+    pw = engine.pairwise("overall")
+    assert len(pw["a1"]) == 6 and set(pw["n"]) == {6}
+    k = next(i for i in range(6) if {pw["a1"][i], pw["a2"][i]} == {"j1", "j2"})
+    j1, j2 = np.array(SHROUT_FLEISS)[:, 0], np.array(SHROUT_FLEISS)[:, 1]
+    assert pw["kendall"][k] == pytest.approx(_tau_b(j1, j2))
+
+
+def test_resubmitted_scores_count_once():
+    engine = AgreementEngine(dims=("overall",))
+    engine.add_rows(_rows([[5, 5, 9]], ["a", "b", "c"], gold={"p0"}))
+    engine.add_rows([{"annotator_id": "c", "plot_id": "p0", "is_calibration": True, "overall": 6}])
+    assert engine.counts("overall").sum() == 3
+    drift = engine.drift("overall")
+    c = drift["annotator_id"].index("c")
+    assert drift["n"][c] == 1 and drift["bias"][c] == pytest.approx(1.0)
+    assert engine.plot_means("overall")["mean"][0] == pytest.approx(16 / 3)
+
+
+def test_sync_table_starts_over_after_clear():
+    table, engine = AnnotationTable(), AgreementEngine(dims=("overall",))
+    table.extend(_rows([[5, 5, 9]], ["a", "b", "c"]))
+    engine.sync_table(table)
+    table.clear()
+    table.extend(_rows([[2, 3, 4, 5]], ["d", "e", "f", "g"]))
+    engine.sync_table(table)
+    assert engine.n == 4 and engine.annotators == ["d", "e", "f", "g"]
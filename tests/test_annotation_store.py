@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import annotation_store
+from annotation_store import AnnotationStore
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _row(i, annotator="a1"):
+    return {"annotator_id": annotator, "plot_id": f"p{i % 3}", "is_calibration": i == 0, "overall": i % 10 + 1}
+
+
+def _crash_after_writes(path, batches):
+    """Append `batches` (one group commit each) in a child process that dies without closing the store."""
+    code = textwrap.dedent(f"""
+        import os, sys
+        sys.path.insert(0, {HERE!r})
+        from annotation_store import AnnotationStore
+        store = AnnotationStore({path!r})
+        n = 0
+        for size in {batches!r}:
+            store.append_many([{{"annotator_id": "a1", "plot_id": "p", "overall": n + k}} for k in range(size)])
+            n += size
+        os._exit(0)
+    """)
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_append_read_and_filters(tmp_path):
+    store = AnnotationStore(str(tmp_path / "a.db"))
+    ids = store.append_many([_row(i) for i in range(5)] + [_row(9, "a2")])
+    assert ids == sorted(ids) and len(ids) == 6
+    assert store.count() == 6 and store.count(annotator_id="a2") == 1
+    assert [r["overall"] for r in store.rows(plot_id="p0")] == [1, 4, 10]
+    assert [r["overall"] for r in store.rows(after_id=ids[3])] == [5, 10]
+    assert store.append_comparison({"annotator_id": "a1", "plot_a": "p0", "plot_b": "p1", "overall": "A"})
+    assert store.comparisons("a1")[0][1]["overall"] == "A"
+    store.close()
+
+
+def test_failed_batch_is_rolled_back(tmp_path):
+    store = AnnotationStore(str(tmp_path / "a.db"))
+    store.append(_row(1))
+    with pytest.raises(TypeError):
+        store.append_many([_row(2), {"annotator_id": "a1", "overall": object()}])
+    assert store.count() == 1
+    store.append(_row(3))
+    assert [r["overall"] for r in store.rows()] == [2, 4]
+    store.close()
+
+
+def test_bad_row_fails_only_its_own_append(tmp_path):
+    store = AnnotationStore(str(tmp_path / "a.db"))
+    # queued without waiting, so they share group commits with the bad append below
+    for i in range(20):
+        store.append_many([_row(i, "a2")], wait=False)
+    with pytest.raises(TypeError):
+        store.append_many([{"annotator_id": "a1", "overall": object()}])
+    for i in range(20, 40):
+        store.append_many([_row(i, "a2")], wait=False)
+    store.close()
+    store = AnnotationStore(str(tmp_path / "a.db"))
+    assert [r["overall"] for r in store.rows()] == [i % 10 + 1 for i in range(40)]
+    store.close()
+
+
+def test_writer_that_cannot_connect_fails_appends(tmp_path, monkeypatch):
+    real, calls = annotation_store._connect, []
+
+    def connect(path, busy_timeout_ms):
+        calls.append(path)
+        if len(calls) == 2:   # the writer thread's connection
+            raise sqlite3.OperationalError("database is locked")
+        return real(path, busy_timeout_ms)
+
+    monkeypatch.setattr(annotation_store, "_connect", connect)
+    store = AnnotationStore(str(tmp_path / "a.db"), write_timeout=5)
+    with pytest.raises(sqlite3.OperationalError):
+        store.append(_row(1))
+    with pytest.raises(sqlite3.OperationalError):
+        store.append(_row(2))
+    store.close()
+
+
+def test_append_times_out_instead_of_blocking(tmp_path, monkeypatch):
+    import threading
+
+    release = threading.Event()
+    real = AnnotationStore._commit.__func__
+
+    def slow(cls, conn, batch):
+        release.wait()
+        real(cls, conn, batch)
+
+    monkeypatch.setattr(AnnotationStore, "_commit", classmethod(slow))
+    store = AnnotationStore(str(tmp_path / "a.db"), write_timeout=0.1)
+    with pytest.raises(TimeoutError):
+        store.append(_row(1))
+    release.set()
+    store.close()
+    assert AnnotationStore(str(tmp_path / "a.db")).count() == 1
+
+
+def test_committed_rows_survive_a_crash(tmp_path):
+    path = str(tmp_path / "a.db")
+    _crash_after_writes(path, [10, 10])
+    assert os.path.exists(path + "-wal")
+    store = AnnotationStore(path)
+    assert [r["overall"] for r in store.rows()] == list(range(20))
+    store.close()
+
+
+def test_torn_wal_tail_loses_only_the_last_transaction(tmp_path):
+    path = str(tmp_path / "a.db")
+    _crash_after_writes(path, [10, 10])
+    wal = path + "-wal"
+    with open(wal, "r+b") as fh:
+        fh.truncate(os.path.getsize(wal) - 100)     # the last commit frame is cut short
+
+    store = AnnotationStore(path)
+    assert [r["overall"] for r in store.rows()] == list(range(10))
+    store.append(_row(7))
+    assert store.count() == 11
+    store.close()
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    conn.close()
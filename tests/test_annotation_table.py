@@ -0,0 +1,56 @@
+import pandas as pd
+
+from annotation_table import AnnotationTable
+
+
+def _row(i, **extra):
+    return dict({"annotator_id": f"a{i % 3}", "plot_id": f"p{i % 5}", "overall": i % 10,
+                 "Surprise": None if i % 4 == 0 else i % 7, "comment": f"c{i}", "is_calibration": i % 6 == 0},
+                **extra)
+
+
+def _plain(df):
+    # compare values, not dtypes: categoricals / nullable ints vs the object and float columns pandas infers
+    return df.astype(object).where(df.notna(), None)
+
+
+def test_append_grows_past_capacity_and_reads_rows_back():
+    rows = [_row(i) for i in range(10)]
+    table = AnnotationTable(capacity=2)
+    table.extend(rows)
+    assert len(table) == 10
+    assert list(table.iter_rows()) == rows
+    assert table.columns == list(rows[0])
+    assert table.missing("Surprise").tolist() == [r["Surprise"] is None for r in rows]
+
+
+def test_categorical_codes_grow_with_new_values():
+    table = AnnotationTable()
+    table.append({"annotator_id": "x", "plot_id": "p"})
+    table.append({"annotator_id": "y", "plot_id": "p"})
+    table.append({"annotator_id": "x", "plot_id": None})
+    assert table.categories("annotator_id") == ["x", "y"]
+    assert table.column("annotator_id").tolist() == [0, 1, 0]
+    assert table.column("plot_id").tolist() == [0, 0, -1]
+    table.append({"annotator_id": "z", "plot_id": "q"})
+    assert table.categories("annotator_id") == ["x", "y", "z"]
+    assert list(table.to_frame()["annotator_id"].cat.categories) == ["x", "y", "z"]
+
+
+def test_frame_is_cached_until_the_next_append():
+    table = AnnotationTable.from_rows([_row(i) for i in range(3)])
+    frame = table.to_frame()
+    assert table.to_frame() is frame
+    table.append(_row(3, note="late column"))
+    grown = table.to_frame()
+    assert grown is not frame and len(grown) == 4 and len(frame) == 3
+    assert grown["note"].tolist()[-1] == "late column" and grown["note"].isna().sum() == 3
+    generation = table.generation
+    table.clear()
+    assert len(table.to_frame()) == 0 and table.generation != generation
+
+
+def test_frame_matches_the_dataframe_built_from_dicts():
+    rows = [_row(i) for i in range(40)]
+    rows.insert(7, _row(99, overall=None, plot_a="p1", plot_b="p2"))   # a column that appears late
+    pd.testing.assert_frame_equal(_plain(AnnotationTable.from_rows(rows).to_frame()), _plain(pd.DataFrame(rows)))
@@ -0,0 +1,23 @@
+import json
+
+import pytest
+
+from benchmark import compare, main
+
+
+def _result(case, best):
+    return {"case": case, "axis": "rows", "size": 10, "seconds_best": best}
+
+
+def test_compare_skips_cases_under_the_floor(tmp_path):
+    base = tmp_path / "base.json"
+    base.write_text(json.dumps({"results": [_result("tiny", 0.0001), _result("big", 0.1), _result("edge", 0.0005)]}))
+    slower, skipped = compare([_result("tiny", 0.0009), _result("big", 0.2), _result("edge", 0.002)],
+                              str(base), tolerance=1.25, min_seconds=0.001)
+    assert [s["case"] for s in slower] == ["big", "edge"]
+    assert skipped == [{"case": "tiny", "axis": "rows", "size": 10}]
+
+
+def test_compare_requires_repeats(tmp_path):
+    with pytest.raises(SystemExit):
+        main(["--compare", str(tmp_path / "base.json"), "--repeat", "1"])
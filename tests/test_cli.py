@@ -0,0 +1,87 @@
+import csv
+import json
+import os
+
+import pytest
+
+import cli
+from annotation_store import AnnotationStore
+from corpus_format import ColumnarCorpus, write_columnar
+from plot_utils import get_plot_id
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(capsys, *argv):
+    assert cli.main(["--workers", "1", *argv]) == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def _row(i, annotator="a1", calib=False, overall=5):
+    return {"timestamp_utc": f"2026-01-01T00:00:{i:02d}", "annotator_id": annotator, "plot_id": f"p{i % 3}",
+            "is_calibration": calib, "overall": overall}
+
+
+def test_ingest_merges_and_dedupes(tmp_path, capsys):
+    with open(os.path.join(HERE, "sample_data.json"), "r", encoding="utf-8") as fh:
+        plots = json.load(fh)
+    first = tmp_path / "a.json"
+    first.write_text(json.dumps(plots[:3]), encoding="utf-8")
+    write_columnar(plots[1:], str(tmp_path / "b.plotc"))
+    out = str(tmp_path / "all.plotc")
+    assert _run(capsys, "ingest", str(first), str(tmp_path / "b.plotc"), "-o", out)["plots"] == len(plots)
+    corpus = ColumnarCorpus.open(out)
+    assert [corpus.plot_id(i) for i in range(len(corpus))] == [get_plot_id(p) for p in plots]
+    assert dict(corpus[0]) == plots[0]
+
+
+def test_merge_drops_rows_seen_in_another_file(tmp_path, capsys):
+    rows = [_row(i) for i in range(6)]
+    with open(tmp_path / "a.csv", "w", encoding="utf-8", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows[:4])
+    (tmp_path / "b.jsonl").write_text("".join(json.dumps(r) + "\n" for r in rows[2:5]), encoding="utf-8")
+    store = AnnotationStore(str(tmp_path / "c.db"))
+    store.append_many(rows[4:])
+    store.close()
+
+    out = tmp_path / "all.jsonl"
+    result = _run(capsys, "merge", str(tmp_path / "a.csv"), str(tmp_path / "b.jsonl"), str(tmp_path / "c.db"),
+                  "-o", str(out))
+    assert (result["rows_read"], result["rows_written"], result["duplicates"]) == (9, 6, 3)
+    merged = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [r["timestamp_utc"] for r in merged] == [r["timestamp_utc"] for r in rows]
+
+
+def test_normalize_adds_z_columns(tmp_path, capsys):
+    rows = [_row(0, calib=True, overall=4), _row(1, calib=True, overall=6), _row(2, overall=7),
+            _row(3, annotator="a2", overall=3)]
+    src = tmp_path / "in.jsonl"
+    src.write_text("".join(json.dumps(r) + "\n" for r in rows), encoding="utf-8")
+    out = tmp_path / "out.csv"
+    result = _run(capsys, "normalize", str(src), "-o", str(out), "--dims", "overall")
+    assert result["rows"] == 4 and result["annotators_calibrated"] == 1
+    with open(out, "r", encoding="utf-8", newline="") as fh:
+        got = list(csv.DictReader(fh))
+    assert [r["overall_z"] for r in got] == ["", "", "2.0", ""]
+
+
+def test_export_with_checkpoint(tmp_path, capsys):
+    db = str(tmp_path / "a.db")
+    store = AnnotationStore(db)
+    store.append_many([_row(i) for i in range(5)])
+    out = tmp_path / "out.csv"
+    assert _run(capsys, "export", db, "-o", str(out), "--checkpoint", "nightly")["rows"] == 5
+    store.append_many([_row(i) for i in range(5, 7)])
+    assert _run(capsys, "export", db, "-o", str(out), "--checkpoint", "nightly")["rows"] == 2
+    with open(out, "r", encoding="utf-8", newline="") as fh:
+        assert [r["timestamp_utc"] for r in csv.DictReader(fh)] == [_row(i)["timestamp_utc"] for i in (5, 6)]
+    store.close()
+
+
+def test_export_refuses_a_missing_log(tmp_path):
+    db = tmp_path / "typo.db"
+    with pytest.raises(SystemExit):
+        cli.main(["export", str(db), "-o", str(tmp_path / "out.csv")])
+    assert not db.exists()
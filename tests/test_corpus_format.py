@@ -0,0 +1,100 @@
+import json
+import os
+
+import pytest
+
+from corpus_format import ColumnarCorpus, is_columnar, write_columnar
+from corpus_store import CorpusStore, CorpusView
+from ingest import IngestLedger
+from plot_utils import get_plot_id
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _corpus():
+    with open(os.path.join(HERE, "sample_data.json"), "r", encoding="utf-8") as fh:
+        plots = json.load(fh)
+    plots = plots if isinstance(plots, list) else [plots]
+    # missing fields, a non-string value and unicode text (a None title/genre/status is stored as absent)
+    plots.append({"title": "空的", "final_plot": "第一幕\n", "rating": [1, 2.5, {"a": None}]})
+    return plots
+
+
+def test_round_trip(tmp_path):
+    plots = _corpus()
+    path = str(tmp_path / "c.plotc")
+    write_columnar(plots, path)
+    with open(path, "rb") as fh:
+        assert is_columnar(fh.read(8))
+
+    corpus = ColumnarCorpus.open(path)
+    assert len(corpus) == len(plots)
+    for i, plot in enumerate(plots):
+        assert corpus.plot_id(i) == get_plot_id(plot)
+        assert dict(corpus[i]) == plot
+        assert sorted(corpus.field_names(i)) == sorted(plot)
+    assert not corpus.has_field(len(plots) - 1, "pruned_tree")
+    with pytest.raises(KeyError):
+        corpus.read_field(len(plots) - 1, "pruned_tree")
+
+
+def test_from_bytes_and_ingest(tmp_path):
+    plots = _corpus()
+    path = str(tmp_path / "c.plotc")
+    write_columnar(plots, path)
+    with open(path, "rb") as fh:
+        data = fh.read()
+    assert dict(ColumnarCorpus.from_bytes(data)[0]) == plots[0]
+
+    store = CorpusStore(str(tmp_path / "store"), id_fn=get_plot_id)
+    view = CorpusView(store)
+    ledger = IngestLedger()
+    assert ledger.ingest([path], view, get_plot_id) == len(plots)
+    assert ledger.ingest([path], view, get_plot_id) == 0
+    assert [dict(p) for p in view] == plots
+    store.close()
+
+
+def test_rejects_other_bytes():
+    with pytest.raises(ValueError):
+        ColumnarCorpus.from_bytes(b"PLOTCOL1 but truncated")
+
+
+def test_corrupt_file_is_a_value_error_and_skipped_on_ingest(tmp_path):
+    plots = _corpus()
+    path = str(tmp_path / "c.plotc")
+    write_columnar(plots, path)
+    with open(path, "rb") as fh:
+        data = bytearray(fh.read())
+    off, length = ColumnarCorpus.from_bytes(bytes(data)).header["meta"]
+    data[off:off + length] = b"\xff" * length       # meta block no longer inflates
+    bad = str(tmp_path / "bad.plotc")
+    with open(bad, "wb") as fh:
+        fh.write(data)
+    with pytest.raises(ValueError):
+        ColumnarCorpus.open(bad)
+
+    view = CorpusView(CorpusStore(str(tmp_path / "store"), id_fn=get_plot_id))
+    assert IngestLedger().ingest([bad, path], view, get_plot_id) == len(plots)
+    view.store.close()
+
+
+def test_index_reads_columnar_plots_from_meta_columns(tmp_path, monkeypatch):
+    from corpus_index import CorpusIndex
+
+    plots = _corpus()
+    path = str(tmp_path / "c.plotc")
+    write_columnar(plots, path)
+    view = CorpusView(CorpusStore(str(tmp_path / "store"), id_fn=get_plot_id))
+    IngestLedger().ingest([path], view, get_plot_id)
+    expected = CorpusIndex()
+    expected.sync(plots)
+
+    def no_blobs(self, index, key):
+        raise AssertionError(f"decoded {key} of plot {index}")
+
+    monkeypatch.setattr(ColumnarCorpus, "read_field", no_blobs)
+    index = CorpusIndex()
+    index.sync(view)
+    assert index.cols == expected.cols
+    view.store.close()
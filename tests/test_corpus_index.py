@@ -0,0 +1,62 @@
+from corpus_index import CorpusIndex
+
+
+def _plot(i, **extra):
+    return dict({"plot_id": f"p{i}", "title": f"Plot {i}", "genre": "mystery" if i % 2 else "romance",
+                 "seed_id": f"s{i}", "method_name": "baseline"}, **extra)
+
+
+def test_token_search_is_an_and_of_prefixes():
+    plots = [_plot(0), _plot(1), _plot(2, title="Harbor Lights")]
+    index = CorpusIndex()
+    index.sync(plots)
+    assert index.search("myst") == (1, [1])
+    assert index.search("harb ROMANCE") == (1, [2])
+    assert index.search("romance baseline") == (2, [0, 2])
+    assert index.search("nothing") == (0, [])
+    assert index.row_of("p2") == 2
+
+
+def test_limit_and_offset_page_through_matches():
+    plots = [_plot(i) for i in range(25)]
+    index = CorpusIndex()
+    index.sync(plots)
+    assert index.search("", offset=20, limit=10) == (25, [20, 21, 22, 23, 24])
+    total, first = index.search("mystery", limit=5)
+    _, second = index.search("mystery", offset=5, limit=5)
+    _, last = index.search("mystery", offset=10, limit=5)
+    assert total == 12
+    assert first + second + last == list(range(1, 25, 2))
+    assert index.search("mystery", offset=-3, limit=1) == (12, [1])
+
+
+def test_sync_only_indexes_appended_plots():
+    added = []
+
+    class CountingIndex(CorpusIndex):
+        def add(self, plot):
+            added.append(plot["plot_id"])
+            super().add(plot)
+
+    plots = [_plot(0), _plot(1)]
+    index = CountingIndex()
+    index.sync(plots)
+    assert index.search("mystery") == (1, [1])
+
+    plots.append(_plot(3))
+    index.sync(plots)
+    index.sync(plots)
+    assert added == ["p0", "p1", "p3"]
+    assert index.search("mystery") == (2, [1, 2])    # cached hits are dropped once the index grows
+
+    index.sync([_plot(9)])                           # a replaced list is indexed from scratch
+    assert index.cols["plot_id"] == ["p9"] and added[-1] == "p9"
+
+
+def test_labels_without_genre_or_method():
+    plots = [{"plot_id": "bare"}, {"title": "Only genre", "genre": "noir"}, _plot(2)]
+    index = CorpusIndex()
+    index.sync(plots)
+    assert index.label(0) == "0: Plot 0"
+    assert index.label(1) == "1: Only genre  (noir)"
+    assert index.label(2) == "2: Plot 2  (romance · baseline)"
@@ -0,0 +1,93 @@
+import gc
+import os
+
+from corpus_store import CorpusStore, CorpusView
+from plot_utils import get_plot_id
+
+
+def _plot(i):
+    return {"title": f"Plot {i}", "seed_id": str(i), "final_plot": "x" * i, "causal_graph": {"edges": [i]}}
+
+
+def test_add_read_and_dedup(tmp_path):
+    store = CorpusStore(str(tmp_path), id_fn=get_plot_id)
+    assert store.add(_plot(1)) == 0
+    assert store.add(_plot(2)) == 1
+    assert store.add(_plot(1)) == 0
+    view = CorpusView(store, [1, 0])
+    assert view[0]["final_plot"] == "xx"
+    assert dict(view[1]) == _plot(1)
+    store.close()
+
+    reopened = CorpusStore(str(tmp_path), id_fn=get_plot_id)
+    assert len(reopened) == 2 and reopened[1]["causal_graph"] == {"edges": [2]}
+    reopened.close()
+
+
+def test_torn_index_line_is_cut_before_new_appends(tmp_path):
+    store = CorpusStore(str(tmp_path), id_fn=get_plot_id)
+    store.add(_plot(1))
+    store.close()
+    with open(os.path.join(str(tmp_path), "corpus.idx"), "a", encoding="utf-8") as fh:
+        fh.write('{"pid": "torn", "fields": [["ti')     # crash mid-write
+
+    store = CorpusStore(str(tmp_path), id_fn=get_plot_id)
+    assert len(store) == 1
+    store.add(_plot(2))
+    store.add(_plot(3))
+    store.close()
+
+    store = CorpusStore(str(tmp_path), id_fn=get_plot_id)
+    assert [store[i]["title"] for i in range(len(store))] == ["Plot 1", "Plot 2", "Plot 3"]
+    store.close()
+
+
+def test_index_pointing_past_data_is_dropped(tmp_path):
+    store = CorpusStore(str(tmp_path), id_fn=get_plot_id)
+    store.add(_plot(1))
+    store.add(_plot(2))
+    store.close()
+    data = os.path.join(str(tmp_path), "corpus.dat")
+    with open(data, "r+b") as fh:
+        fh.truncate(os.path.getsize(data) - 3)    # data of plot 2 lost, index line survived
+
+    store = CorpusStore(str(tmp_path), id_fn=get_plot_id)
+    assert len(store) == 1
+    store.add(_plot(4))
+    store.close()
+    store = CorpusStore(str(tmp_path), id_fn=get_plot_id)
+    assert [store[i]["title"] for i in range(len(store))] == ["Plot 1", "Plot 4"]
+    store.close()
+
+
+def test_temporary_store_removes_its_directory():
+    store = CorpusStore(id_fn=get_plot_id)
+    store.add(_plot(1))
+    root = store.root_dir
+    assert os.path.isdir(root)
+    store.close()
+    assert not os.path.exists(root)
+
+
+def test_regenerated_plot_is_stored_as_a_new_revision(tmp_path):
+    store = CorpusStore(str(tmp_path), id_fn=get_plot_id)
+    first = store.add(_plot(1))
+    regenerated = dict(_plot(1), final_plot="rewritten")
+    second = store.add(regenerated)
+    assert second != first and store.index_of(get_plot_id(regenerated)) == second
+    assert store.add(regenerated) == second       # same content again: no new revision
+    assert store[first]["final_plot"] == "x"      # older views still read what they had
+    store.close()
+
+    reopened = CorpusStore(str(tmp_path), id_fn=get_plot_id)
+    assert reopened[reopened.index_of(get_plot_id(regenerated))]["final_plot"] == "rewritten"
+    assert reopened.add(regenerated) == second
+    reopened.close()
+
+
+def test_unclosed_temporary_store_is_removed_when_collected():
+    store = CorpusStore(id_fn=get_plot_id)
+    root = store.root_dir
+    del store     # never closed, like the st.cache_resource singleton
+    gc.collect()
+    assert not os.path.exists(root)
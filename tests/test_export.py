@@ -0,0 +1,85 @@
+import io
+
+import pandas as pd
+import pytest
+
+from export import HAS_PYARROW, ExportCheckpoints, available_formats, deferred, export_frame
+
+
+def _frame(n):
+    return pd.DataFrame({"annotator_id": [f"a{i % 3}" for i in range(n)], "overall": list(range(n)),
+                         "is_calibration": [i == 0 for i in range(n)]})
+
+
+@pytest.mark.parametrize("fmt", available_formats())
+def test_export_frame_round_trip(fmt):
+    df = _frame(12)
+    data = export_frame(df, fmt, chunk_rows=5)
+    assert isinstance(data, bytes)
+    if fmt == "csv":
+        back = pd.read_csv(io.BytesIO(data))
+    elif fmt == "parquet":
+        back = pd.read_parquet(io.BytesIO(data))
+    else:
+        import pyarrow as pa
+        back = pa.ipc.open_file(pa.BufferReader(data)).read_all().to_pandas()
+    pd.testing.assert_frame_equal(back, df)
+
+
+def test_incremental_checkpoints():
+    checkpoints = ExportCheckpoints()
+    df = _frame(10)
+    build = deferred(lambda: df, "csv", checkpoints, "annotations", incremental=True)
+    assert len(pd.read_csv(io.BytesIO(build()))) == 10
+    assert "annotations" not in checkpoints       # building the file is not a confirmed download
+    assert len(pd.read_csv(io.BytesIO(build()))) == 10
+    checkpoints.mark("annotations", 10)
+    df = _frame(14)
+    assert pd.read_csv(io.BytesIO(build()))["overall"].tolist() == [10, 11, 12, 13]
+    # a cleared table starts over
+    assert checkpoints.pending("annotations", 3) == (0, 3)
+
+
+def test_checkpoint_follows_the_table_generation():
+    checkpoints = ExportCheckpoints()
+    checkpoints.mark("annotations", 4, generation=1)
+    assert checkpoints.pending("annotations", 6, generation=1) == (4, 6)
+    # the table was reset and refilled past the old count
+    assert checkpoints.pending("annotations", 6, generation=2) == (0, 6)
+
+
+def test_failed_export_keeps_rows_pending(monkeypatch):
+    import export
+
+    checkpoints = ExportCheckpoints()
+
+    def broken(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(export, "write_frames", broken)
+    with pytest.raises(OSError):
+        deferred(lambda: _frame(5), "csv", checkpoints, "annotations", incremental=True)()
+    assert checkpoints.pending("annotations", 5) == (0, 5)
+
+
+@pytest.mark.parametrize("fmt", available_formats())
+def test_streamlit_deferred_download(fmt):
+    """The callable goes through Streamlit's deferred-download path (what st.download_button runs on click)."""
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    storage = MemoryMediaFileStorage("/media")
+    manager = MediaFileManager(storage)
+    checkpoints = ExportCheckpoints()
+    df = _frame(7)
+    file_id = manager.add_deferred(deferred(lambda: df, fmt, checkpoints, "annotations", incremental=True),
+                                   None, "coords", "annotations" + fmt)
+    url = manager.execute_deferred(file_id)
+    stored = storage.get_file(url.rsplit("/", 1)[-1].split(".")[0])
+    assert stored.content == export_frame(df, fmt)
+    assert checkpoints.get("annotations") is None    # moved only when the download is confirmed
+
+
+@pytest.mark.skipif(HAS_PYARROW, reason="pyarrow installed")
+def test_csv_only_without_pyarrow():
+    assert available_formats() == ["csv"]
@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+import graph_features
+from graph_features import FEATURE_VERSION, FeatureCache, FeatureTable, extract, filter_mask
+
+GRAPH = {
+    "event_nodes": [
+        {"id": "a", "type": "milestone", "characters_involved": ["X", "Y"]},
+        {"id": "b", "type": "escalation", "characters_involved": ["X", "Z"]},
+        {"id": "c", "type": "Climax", "characters_involved": ["X", "W"]},
+        {"id": "d", "type": "setup", "characters_involved": ["Y"]},
+        {"id": "e", "type": "escalation", "characters_involved": "Z"},
+    ],
+    "edges": [
+        {"from": "a", "to": "b", "type": "causal"},
+        {"from": "b", "to": "c", "type": "causal"},
+        {"from": "c", "to": "b", "type": "catalyst"},      # b <-> c cycle
+        {"from": "a", "to": "d", "type": "concurrent"},
+        {"from": "d", "to": "e"},                           # untyped = causal
+    ],
+    "characters": [{"name": "X", "role": "Protagonist"}, {"name": "Y"}, "Z", "W"],
+    "conflicts": [{"type": "Man vs Self"}, {"type": "man vs self"}, {}],
+}
+
+
+def test_extract_shape_with_a_cycle():
+    f = extract(json.dumps(GRAPH))
+    assert f["events"] == 5 and f["edges"] == 5 and f["density"] == pytest.approx(5 / 20)
+    # b and c sit on a cycle: left out of the longest path a -> d -> e
+    assert f["depth"] == 3 and f["cyclic_events"] == 2
+    assert f["roots"] == 1 and f["leaves"] == 1
+    assert f["branching_mean"] == pytest.approx(5 / 4) and f["branching_max"] == 2
+    assert (f["milestone_count"], f["escalation_count"], f["climax_count"], f["other_count"]) == (1, 2, 1, 1)
+
+
+def test_extract_edge_ratios_and_conflicts():
+    f = extract(GRAPH)
+    assert f["edge_causal_ratio"] == pytest.approx(3 / 5)
+    assert f["edge_catalyst_ratio"] == pytest.approx(1 / 5)
+    assert f["edge_concurrent_ratio"] == pytest.approx(1 / 5)
+    assert f["conflict_man_vs_self"] == 2 and f["conflict_unknown"] == 1
+
+
+def test_extract_centrality():
+    f = extract(GRAPH)
+    # X is linked to everyone else and nobody else is linked: a perfect star
+    assert f["characters"] == 4 and f["top_character"] == "X"
+    assert f["centrality_max"] == 1.0 and f["centralization"] == pytest.approx(1.0)
+    assert f["protagonist_centrality"] == 1.0 and f["top_character_event_share"] == pytest.approx(3 / 5)
+
+    chain = {"event_nodes": [{"id": "1", "characters_involved": ["A", "B"]},
+                             {"id": "2", "characters_involved": ["B", "C"]},
+                             {"id": "3", "characters_involved": ["C", "D"]}]}
+    f = extract(chain)
+    # degrees 1/3, 2/3, 2/3, 1/3: (1/3 + 0 + 0 + 1/3) / (4 - 2)
+    assert f["centrality_max"] == pytest.approx(2 / 3) and f["centralization"] == pytest.approx(1 / 3)
+    assert f["protagonist_centrality"] is None
+
+
+def test_extract_unusable_payloads():
+    assert extract("not json") == {"has_graph": False}
+    assert extract(None) == {"has_graph": False}
+    assert extract({})["events"] == 0
+
+
+def test_cache_skips_malformed_lines_and_writes_once(tmp_path):
+    path = tmp_path / "features.jsonl"
+    good = {"v": FEATURE_VERSION, "key": "k1", "f": {"events": 1}}
+    path.write_text("\n".join([json.dumps(good), json.dumps({"v": FEATURE_VERSION, "key": "k2"}),
+                               "5", json.dumps({"v": FEATURE_VERSION - 1, "key": "k3", "f": {}}), '{"v": 1, "ke'])
+                    + "\n", encoding="utf-8")
+    cache = FeatureCache(str(path))
+    assert len(cache) == 1 and cache.get("k1") == {"events": 1}
+    cache.put_many([("k1", {"events": 9}), ("k4", {"events": 4})])
+    cache.put_many([("k4", {"events": 4})])
+    assert path.read_text(encoding="utf-8").count('"k4"') == 1
+    assert FeatureCache(str(path)).get("k4") == {"events": 4}
+
+
+def test_feature_table_sync(tmp_path, monkeypatch):
+    computed = []
+    real = graph_features.compute_many
+
+    def counting(raws, *args, **kwargs):
+        raws = list(raws)
+        computed.extend(raws)
+        return real(raws, *args, **kwargs)
+
+    monkeypatch.setattr(graph_features, "compute_many", counting)
+    plots = [{"plot_id": f"p{i}", "causal_graph": {"event_nodes": [{"id": str(j)} for j in range(i + 1)]}}
+             for i in range(3)]
+    plots.append({"plot_id": "dup", "causal_graph": plots[0]["causal_graph"]})
+    cache, table = FeatureCache(str(tmp_path / "f.jsonl")), FeatureTable()
+    table.sync(plots, cache, lambda p: p["plot_id"])
+    assert table.plot_ids == ["p0", "p1", "p2", "dup"] and len(computed) == 3
+    assert [r["events"] for r in table.rows] == [1, 2, 3, 1]
+
+    plots.append({"plot_id": "p3"})
+    table.sync(plots, cache, lambda p: p["plot_id"])
+    assert len(table) == 5 and table.rows[-1] == {"has_graph": False} and len(computed) == 4
+
+    # a replaced list is rebuilt, from the cache only
+    fresh = FeatureTable()
+    fresh.sync(list(plots), FeatureCache(str(tmp_path / "f.jsonl")), lambda p: p["plot_id"])
+    table.sync(plots[:2], cache, lambda p: p["plot_id"])
+    assert table.plot_ids == ["p0", "p1"] and len(computed) == 4
+    assert fresh.to_frame()["plot_id"].tolist() == ["p0", "p1", "p2", "dup", "p3"]
+
+
+def test_filter_mask_uses_fixed_operators_only():
+    import pandas as pd
+
+    df = pd.DataFrame({"depth": [1, 5, None], "top_character": ["Ann", None, "bob"], "has_graph": [True, True, False]})
+    assert filter_mask(df, "depth", ">=", 5).tolist() == [False, True, False]
+    assert filter_mask(df, "depth", "!=", 5).tolist() == [True, False, False]
+    assert filter_mask(df, "top_character", "contains", "B").tolist() == [False, False, True]
+    assert filter_mask(df, "has_graph", "==", False).tolist() == [False, False, True]
+    with pytest.raises(ValueError):
+        filter_mask(df, "depth", "@pd.read_csv", 1)
+    with pytest.raises(KeyError):
+        filter_mask(df, "__import__('os')", "==", 1)
@@ -0,0 +1,82 @@
+import pytest
+
+import charts
+from graph_layout import find_chains, layout_plan, parse_tiers, transitive_reduction
+from render_cache import RenderCache
+
+
+def _e(a, b, t="causal"):
+    return {"from": a, "to": b, "type": t}
+
+
+def test_transitive_reduction_uses_causal_paths_only():
+    edges = [_e("a", "b"), _e("b", "c"), _e("a", "c"),          # a->c implied by a->b->c
+             _e("c", "d", "catalyst"), _e("a", "d"),              # a->d only reachable via a catalyst edge
+             _e("b", "d", "concurrent")]
+    kept = transitive_reduction(list("abcd"), edges)
+    assert _e("a", "c") not in kept
+    assert _e("a", "d") in kept
+    assert _e("c", "d", "catalyst") in kept and _e("b", "d", "concurrent") in kept
+
+
+def test_chains_and_compact_plan():
+    nodes = [{"id": str(i), "name": f"E{i}", "type": "milestone" if i == 0 else "escalation"} for i in range(6)]
+    edges = [_e(str(i), str(i + 1)) for i in range(5)]
+    assert find_chains([n["id"] for n in nodes], edges) == [[str(i) for i in range(6)]]
+    plan = layout_plan({"event_nodes": nodes, "edges": edges}, mode="compact")
+    assert [n["id"] for n in plan["nodes"]] == ["chain_0"] and plan["edges"] == []
+    opened = layout_plan({"event_nodes": nodes, "edges": edges}, expand=["chain_0"], mode="compact")
+    assert len(opened["nodes"]) == 6 and len(opened["edges"]) == 5
+
+
+@pytest.mark.skipif(not charts.HAS_GRAPHVIZ, reason="graphviz not installed")
+def test_cached_layout_gives_the_same_chart(tmp_path):
+    nodes = [{"id": str(i), "name": f"E{i}", "type": "escalation"} for i in range(60)]
+    edges = [_e(str(i), str(i + 1)) for i in range(59)] + [_e("0", "30", "catalyst"), _e("3", "9")]
+    data = {"event_nodes": nodes, "edges": edges}
+    direct = charts.create_causal_chart(data).source
+
+    cache = RenderCache(disk_dir=str(tmp_path))
+    plan = charts.causal_layout(data, cache, key="g")
+    assert charts.causal_layout(data, cache, key="g") is plan
+    assert charts.causal_chart_source(data, cache, key="g") == direct
+    # a plan read back from the disk tier (JSON: tuples become lists) draws the same graph
+    reloaded = charts.causal_layout(data, RenderCache(disk_dir=str(tmp_path)), key="g")
+    assert charts.create_causal_chart(data, plan=reloaded).source == direct
+
+
+@pytest.mark.skipif(not charts.HAS_GRAPHVIZ, reason="graphviz not installed")
+def test_collapsed_chain_edges_reach_the_summary_node():
+    nodes = [{"id": str(i), "name": f"E{i}", "type": "escalation"} for i in range(8)]
+    edges = [_e("0", "1"), _e("0", "7", "catalyst")] + [_e(str(i), str(i + 1)) for i in range(1, 6)] + [_e("6", "7")]
+    data = {"event_nodes": nodes, "edges": edges}
+    plan = layout_plan(data, mode="compact")
+    assert "chain_1" in plan["chains"]
+    source = charts.create_causal_chart(data, mode="compact").source
+    assert "0 -> chain_1" in source and "chain_1 -> 7" in source
+    # no endpoint parsed as node:port
+    assert ":" not in "".join(line for line in source.splitlines() if "->" in line)
+
+
+def test_transitive_reduction_keeps_edges_into_and_inside_cycles():
+    # v <-> w is a cycle: it must not justify dropping either of u's out-edges
+    edges = [_e("u", "v"), _e("u", "w"), _e("w", "v"), _e("v", "w")]
+    assert transitive_reduction(list("uvw"), edges) == edges
+    # a real shortcut past a cycle is still dropped
+    edges = [_e("a", "b"), _e("b", "c"), _e("c", "b"), _e("c", "d"), _e("a", "d")]
+    kept = transitive_reduction(list("abcd"), edges)
+    assert _e("a", "d") not in kept and len(kept) == 4
+
+
+def test_routing_tiers_are_configurable():
+    nodes = [{"id": str(i), "name": f"E{i}"} for i in range(10)]
+    edges = [_e(str(i), str(i + 1)) for i in range(9)]
+    data = {"event_nodes": nodes, "edges": edges}
+    assert layout_plan(data)["splines"] == "ortho" and not layout_plan(data)["compact"]
+    tiers = parse_tiers("5:5:polyline, 2:2:ortho")
+    assert tiers == ((2, 2, "ortho"), (5, 5, "polyline"))
+    plan = layout_plan(data, tiers=tiers)
+    assert plan["compact"] and plan["splines"] == "ortho"   # the 10 events collapse into one chain
+    assert layout_plan(data, mode="full", tiers=tiers)["splines"] == "line"
+    with pytest.raises(ValueError):
+        parse_tiers("40-60-ortho")
@@ -0,0 +1,50 @@
+import io
+import json
+
+from ingest import IngestLedger
+from plot_utils import get_plot_id
+
+
+class Upload(io.BytesIO):
+    """Stands in for a Streamlit UploadedFile: name, size, file_id and a counted getvalue()."""
+
+    def __init__(self, data: bytes, name: str, file_id: str):
+        super().__init__(data)
+        self.name, self.size, self.file_id = name, len(data), file_id
+        self.reads = 0
+
+    def getvalue(self):
+        self.reads += 1
+        return super().getvalue()
+
+
+def _payload(*ids):
+    return json.dumps([{"plot_id": i, "title": f"Plot {i}"} for i in ids]).encode("utf-8")
+
+
+def test_same_file_id_is_skipped_without_reading():
+    ledger, plots = IngestLedger(), []
+    upload = Upload(_payload("a", "b"), "plots.json", "id-1")
+    assert ledger.ingest([upload], plots, get_plot_id) == 2
+    assert ledger.ingest([upload], plots, get_plot_id) == 0     # a rerun hands back the same upload
+    assert upload.reads == 1
+    assert [p["plot_id"] for p in plots] == ["a", "b"]
+
+
+def test_same_content_under_a_new_file_id_is_hashed_and_skipped():
+    ledger, plots = IngestLedger(), []
+    ledger.ingest([Upload(_payload("a", "b"), "plots.json", "id-1")], plots, get_plot_id)
+    again = Upload(_payload("a", "b"), "plots.json", "id-2")     # uploaded a second time
+    assert ledger.ingest([again], plots, get_plot_id) == 0
+    assert again.reads == 1 and len(plots) == 2
+    assert len(ledger.files) == 1
+    assert ledger.ingest([again], plots, get_plot_id) == 0 and again.reads == 1
+
+
+def test_new_content_adds_only_unseen_plots():
+    ledger, plots = IngestLedger(), []
+    ledger.ingest([Upload(_payload("a", "b"), "plots.json", "id-1")], plots, get_plot_id)
+    assert ledger.ingest([Upload(_payload("b", "c"), "more.json", "id-2")], plots, get_plot_id) == 1
+    assert [p["plot_id"] for p in plots] == ["a", "b", "c"]
+    ledger.reset()
+    assert ledger.ingest([Upload(_payload("a"), "plots.json", "id-1")], [], get_plot_id) == 1
@@ -0,0 +1,85 @@
+import random
+
+import numpy as np
+import pytest
+
+from annotation_table import SCORE_COLUMNS, AnnotationTable
+from normalization import CalibrationStats, NormalizationEngine, zscore_frame, zscore_values
+
+
+def _rows(n=600, seed=3):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        aid = f"a{rng.randrange(6)}"
+        row = {"annotator_id": aid, "plot_id": f"p{rng.randrange(40)}", "is_calibration": rng.random() < 0.2}
+        for dim in SCORE_COLUMNS:
+            if rng.random() > 0.05:   # some missing scores
+                row[dim] = rng.randint(1, 10)
+        rows.append(row)
+    # one annotator with a single gold row (below min_calibration), one with constant gold scores
+    rows.append({"annotator_id": "lone", "is_calibration": True, "overall": 5})
+    rows.append({"annotator_id": "lone", "is_calibration": False, "overall": 7})
+    rows += [{"annotator_id": "flat", "is_calibration": True, "overall": 4} for _ in range(3)]
+    rows.append({"annotator_id": "flat", "is_calibration": False, "overall": 6})
+    return rows
+
+
+def _expected(rows, robust):
+    df = AnnotationTable.from_rows(rows).to_frame()
+    out = zscore_frame(df, SCORE_COLUMNS, robust=robust)
+    return out[[f"{d}_z" for d in SCORE_COLUMNS]].to_numpy(dtype=float)
+
+
+@pytest.mark.parametrize("robust", [False, True])
+def test_incremental_engine_matches_zscore_frame(robust):
+    rows = _rows()
+    table, engine = AnnotationTable(), NormalizationEngine(robust=robust)
+    for lo in range(0, len(rows), 37):     # gold rows arrive between syncs and re-score older rows
+        table.extend(rows[lo:lo + 37])
+        engine.sync(table)
+    z = engine.normalized_frame(table)[[f"{d}_z" for d in SCORE_COLUMNS]].to_numpy(dtype=float)
+    np.testing.assert_allclose(z, _expected(rows, robust), rtol=1e-9, atol=1e-12)
+
+
+def test_edge_cases():
+    rows = _rows()
+    z = NormalizationEngine().normalized_frame(AnnotationTable.from_rows(rows))
+    assert z["overall_z"][z["is_calibration"]].isna().all()
+    assert np.isnan(z["overall_z"].iloc[-5])       # "lone": one gold row
+    assert z["overall_z"].iloc[-1] == pytest.approx(2.0)   # "flat": sd 0 -> 1
+
+
+@pytest.mark.parametrize("robust", [False, True])
+def test_merged_calibration_stats_match_zscore_frame(robust):
+    rows = _rows()
+    shards = [CalibrationStats(robust=robust) for _ in range(4)]
+    for i, row in enumerate(rows):     # Welford per shard, Chan merge in the parent
+        if row["is_calibration"]:
+            shards[i % 4].add(row["annotator_id"], [row.get(d) for d in SCORE_COLUMNS])
+    stats = shards[0]
+    for other in shards[1:]:
+        stats.merge(other)
+    params = stats.params()
+
+    got = []
+    for row in rows:
+        if row["is_calibration"]:
+            got.append([None] * len(SCORE_COLUMNS))
+        else:
+            got.append(zscore_values([row.get(d) for d in SCORE_COLUMNS], params.get(row["annotator_id"])))
+    got = np.array([[np.nan if v is None else v for v in r] for r in got])
+    np.testing.assert_allclose(got, _expected(rows, robust), rtol=1e-9, atol=1e-12)
+
+
+def test_cleared_table_is_rescored_from_scratch():
+    table, engine = AnnotationTable(), NormalizationEngine(dims=("overall",))
+    table.extend([{"annotator_id": "a", "is_calibration": True, "overall": o} for o in (4, 6)])
+    table.append({"annotator_id": "a", "is_calibration": False, "overall": 7})
+    engine.sync(table)
+    assert engine.zscores()["overall_z"][2] == pytest.approx(2.0)
+
+    table.clear()
+    table.extend([{"annotator_id": "b", "is_calibration": False, "overall": o} for o in (3, 5, 8)])
+    engine.sync(table)
+    assert np.isnan(engine.zscores()["overall_z"]).all()
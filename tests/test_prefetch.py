@@ -0,0 +1,75 @@
+import threading
+
+from prefetch import Prefetcher
+
+
+def test_jobs_are_queued_once_and_remembered():
+    warmed = []
+    prefetcher = Prefetcher(warmed.append, max_workers=1)
+    assert prefetcher.submit("a", "plot a")
+    prefetcher.wait(timeout=5)
+    assert not prefetcher.submit("a", "plot a")     # recently warmed
+    assert prefetcher.submit("b", "plot b")
+    prefetcher.wait(timeout=5)
+    assert warmed == ["plot a", "plot b"]
+    prefetcher.forget("a")
+    assert prefetcher.submit("a", "plot a")
+    prefetcher.wait(timeout=5)
+    assert prefetcher.stats()["submitted"] == 3
+    prefetcher.shutdown()
+
+
+def test_in_flight_keys_are_deduped_and_the_queue_is_bounded():
+    gate = threading.Event()
+    prefetcher = Prefetcher(lambda plot: gate.wait(5), max_workers=1, max_pending=2)
+    assert prefetcher.submit("a", 1)
+    assert not prefetcher.submit("a", 1)            # in flight
+    assert prefetcher.submit("b", 2)
+    assert not prefetcher.submit("c", 3)            # queue full: dropped, not queued
+    stats = prefetcher.stats()
+    assert stats["pending"] == 2 and stats["dropped"] == 1
+    gate.set()
+    prefetcher.wait(timeout=5)
+    assert prefetcher.stats()["pending"] == 0
+    prefetcher.shutdown()
+
+
+def test_failed_warm_does_not_stop_the_worker():
+    warmed = []
+
+    def warm(plot):
+        if plot == "bad":
+            raise ValueError("cannot render")
+        warmed.append(plot)
+
+    prefetcher = Prefetcher(warm, max_workers=1)
+    prefetcher.submit("bad", "bad")
+    prefetcher.wait(timeout=5)
+    prefetcher.submit("good", "good")
+    prefetcher.wait(timeout=5)
+    assert warmed == ["good"]
+    assert prefetcher.stats()["errors"] == 1
+    assert prefetcher.submit("bad", "bad")          # a failure is not remembered as warmed
+    prefetcher.wait(timeout=5)
+    prefetcher.shutdown()
+
+
+def test_shutdown_cancels_queued_jobs_and_refuses_new_ones():
+    started, gate = threading.Event(), threading.Event()
+    warmed = []
+
+    def warm(plot):
+        started.set()
+        gate.wait(5)
+        warmed.append(plot)
+
+    prefetcher = Prefetcher(warm, max_workers=1)
+    prefetcher.submit("a", "a")
+    started.wait(5)
+    prefetcher.submit("b", "b")                     # queued behind the running job
+    prefetcher.shutdown()
+    assert not prefetcher.submit("c", "c")
+    gate.set()
+    prefetcher.shutdown(wait=True)
+    assert warmed == ["a"]
+    assert prefetcher.stats()["pending"] == 0
@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+import charts
+import prerender
+from render_cache import RenderCache, content_hash
+from script_view import script_outline
+from story_tree import default_view, parse_tree
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not charts.HAS_GRAPHVIZ, reason="graphviz not installed")
+
+
+def _plots():
+    with open(os.path.join(HERE, "sample_data.json"), "r", encoding="utf-8") as fh:
+        plots = json.load(fh)
+    plots = plots if isinstance(plots, list) else [plots]
+    # a tree over NODE_BUDGET, so the default view is a bounded one
+    big_tree = "\n".join(f"* [Act {i}] act\n" + "".join(f"  * [Scene {i}.{j}] scene\n" for j in range(20))
+                         for i in range(12))
+    return plots + [dict(plots[0], pruned_tree=big_tree)]
+
+
+def _fake_dot(returncode):
+    calls = []
+
+    def run(cmd, input, capture_output, timeout):
+        calls.append(input)
+        return subprocess.CompletedProcess(cmd, returncode, b"<svg>" + content_hash(input).encode() + b"</svg>", b"")
+
+    return run, calls
+
+
+def _prerender(monkeypatch, tmp_path, plots, returncode=0):
+    run, calls = _fake_dot(returncode)
+    monkeypatch.setattr(charts.subprocess, "run", run)
+    monkeypatch.setattr(charts, "_HAS_DOT_BINARY", True)
+    monkeypatch.setattr(prerender, "_CACHE", None)
+    monkeypatch.setattr(prerender, "_SVG", True)
+    prerender._init_worker(str(tmp_path), True)
+    for plot in plots:
+        stats = prerender.render_payload((plot.get("causal_graph"), plot.get("pruned_tree"), plot.get("final_plot")))
+        assert stats["errors"] == 0
+    return calls
+
+
+def _no_layout_work(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("cache miss: the app would lay this out again")
+
+    monkeypatch.setattr(charts, "create_causal_chart", fail)
+    monkeypatch.setattr(charts, "parse_tree_text_to_graphviz", fail)
+    monkeypatch.setattr(charts.subprocess, "run", fail)
+
+
+def test_prerendered_keys_are_the_ones_the_app_reads(monkeypatch, tmp_path):
+    plots = _plots()
+    _prerender(monkeypatch, tmp_path, plots)
+    _no_layout_work(monkeypatch)
+
+    # a fresh process serving the same directory, asking the way app.py does
+    cache = RenderCache(disk_dir=str(tmp_path))
+    for plot in plots:
+        # render_causal_graph: default mode, no chains expanded
+        data = charts.graph_data(plot, cache)
+        source = charts.causal_chart_source(data, cache, key=charts.graph_key(plot), expand=(), mode="auto")
+        assert source and charts.render_svg(source, cache).startswith("<svg>")
+        # render_story_tree: the default view of the tree
+        tree = plot["pruned_tree"]
+        source = charts.tree_chart_source(tree, cache, *default_view(parse_tree(tree)), ())
+        assert source and charts.render_svg(source, cache).startswith("<svg>")
+        # render_script: the section outline
+        assert script_outline(plot["final_plot"], cache) is not None
+
+
+def test_failed_layouts_are_not_persisted(monkeypatch, tmp_path):
+    plots = _plots()[:1]
+    calls = _prerender(monkeypatch, tmp_path, plots, returncode=1)
+    assert len(calls) == 2        # causal graph and story tree
+
+    cache = RenderCache(disk_dir=str(tmp_path))
+    data = charts.graph_data(plots[0], cache)
+    source = charts.causal_chart_source(data, cache, key=charts.graph_key(plots[0]))
+    assert cache.get("svg", content_hash(source)) is None
+    run, retried = _fake_dot(0)
+    monkeypatch.setattr(charts.subprocess, "run", run)
+    assert charts.render_svg(source, cache).startswith("<svg>")
+    assert len(retried) == 1
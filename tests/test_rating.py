@@ -0,0 +1,74 @@
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+import rating
+from rating import RatingEngine, bradley_terry
+
+
+def _cmp(a, b, outcome, annotator="x"):
+    return {"annotator_id": annotator, "plot_a": a, "plot_b": b, "overall": outcome}
+
+
+def test_elo_update():
+    engine = RatingEngine(dims=("overall",))
+    engine.add_rows([_cmp("p", "q", "A")])
+    elo = engine.elo("overall")
+    assert elo["p"] == pytest.approx(1516.0) and elo["q"] == pytest.approx(1484.0)
+
+
+def test_bradley_terry_two_items():
+    # 30 wins in 40 games: strength ratio 3 (a vanishing prior only pins the scale)
+    theta, _, _ = bradley_terry(np.array([0]), np.array([1]), np.array([40.0]), np.array([30.0]), 2, prior=1e-9)
+    assert theta[0] - theta[1] == pytest.approx(math.log(3), abs=1e-6)
+    # the default prior shrinks towards the average but keeps the order
+    theta, se, _ = bradley_terry(np.array([0]), np.array([1]), np.array([40.0]), np.array([30.0]), 2)
+    assert 0 < theta[0] - theta[1] < math.log(3) and np.all(np.isfinite(se))
+
+
+def _simulated(n_items=12, games=60, seed=0):
+    rng = np.random.default_rng(seed)
+    truth = rng.normal(0, 1, n_items)
+    pairs = np.array(list(itertools.combinations(range(n_items), 2)))
+    p = 1 / (1 + np.exp(truth[pairs[:, 1]] - truth[pairs[:, 0]]))
+    wins = rng.binomial(games, p).astype(float)
+    return truth, pairs[:, 0], pairs[:, 1], np.full(len(pairs), float(games)), wins
+
+
+def test_bradley_terry_recovers_strengths_and_mm_matches_newton(monkeypatch):
+    truth, i, j, games, wins = _simulated()
+    newton, se, iters = bradley_terry(i, j, games, wins, len(truth))
+    assert iters < 20
+    assert np.corrcoef(newton, truth)[0, 1] > 0.95
+    assert np.all(np.abs(newton - newton.mean() - (truth - truth.mean())) < 4 * se)
+
+    monkeypatch.setattr(rating, "FULL_COV_ITEMS", 0)     # force the MM path
+    mm, _, _ = bradley_terry(i, j, games, wins, len(truth), max_iter=20000, tol=1e-12)
+    np.testing.assert_allclose(mm, newton, atol=1e-6)
+
+
+def test_engine_fit_orders_items():
+    engine = RatingEngine(dims=("overall",))
+    rows = [_cmp("strong", "mid", "A")] * 8 + [_cmp("mid", "weak", "A")] * 8 + [_cmp("strong", "weak", "tie")] * 2
+    engine.add_rows(rows)
+    fit = engine.fit("overall")
+    assert fit["plot_id"] == ["strong", "mid", "weak"]
+    assert np.all(fit["ci_low"] < fit["rating"]) and np.all(fit["rating"] < fit["ci_high"])
+    assert list(fit["comparisons"]) == [10, 16, 10]
+
+
+def test_next_pair_skips_judged_pairs_beyond_the_anchor_block():
+    plots = [f"p{k}" for k in range(20)]
+    engine = RatingEngine(dims=("overall",))
+    # x judged every pair involving p0..p15; p16..p19 are well covered by others
+    engine.add_rows([_cmp(a, b, "A") for a, b in itertools.combinations(plots, 2) if min(a, b, key=plots.index) in plots[:16]])
+    engine.add_rows([_cmp(a, b, "tie", "y") for a, b in itertools.combinations(plots[16:], 2)] * 10)
+    for seed in range(5):
+        pair = engine.next_pair(plots, "x", seed=seed)
+        assert pair is not None and set(pair) <= set(plots[16:])
+
+    engine.add_rows([_cmp(a, b, "B") for a, b in itertools.combinations(plots[16:], 2)])
+    assert engine.next_pair(plots, "x") is None
+    assert engine.next_pair(plots, "someone else") is not None
@@ -0,0 +1,62 @@
+import subprocess
+
+import charts
+from render_cache import RenderCache, content_hash
+
+
+def test_content_hash_is_stable_across_types():
+    assert content_hash("a") == content_hash(b"a")
+    assert content_hash({"b": 1, "a": 2}) == content_hash({"a": 2, "b": 1})
+    assert content_hash(None) == content_hash("")
+
+
+def test_lru_eviction_and_disk_tier(tmp_path):
+    cache = RenderCache(max_entries=2, disk_dir=str(tmp_path))
+    for k in "abc":
+        cache.put("dot", k, f"digraph {k} {{}}")
+    assert cache.stats()["entries"] == 2
+    # evicted from memory, still served from disk
+    assert cache.get("dot", "a") == "digraph a {}"
+    assert RenderCache(disk_dir=str(tmp_path)).get("graph", "x") is None
+    cache.put("graph", "x", {"edges": []})
+    assert RenderCache(disk_dir=str(tmp_path)).get("graph", "x") == {"edges": []}
+
+
+def test_get_or_compute_runs_once():
+    cache, calls = RenderCache(), []
+    for _ in range(3):
+        cache.get_or_compute("dot", "k", lambda: calls.append(1) or "src")
+    assert calls == [1]
+
+
+def test_failed_svg_layout_is_cached_in_memory_only(monkeypatch, tmp_path):
+    calls = []
+
+    def broken(cmd, input, capture_output, timeout):
+        calls.append(input)
+        return subprocess.CompletedProcess(cmd, 1, b"", b"syntax error")
+
+    monkeypatch.setattr(charts.subprocess, "run", broken)
+    monkeypatch.setattr(charts, "HAS_GRAPHVIZ", True)
+    monkeypatch.setattr(charts, "_HAS_DOT_BINARY", True)
+    cache = RenderCache(disk_dir=str(tmp_path))
+    assert charts.render_svg("digraph { a -> }", cache) is None
+    assert charts.render_svg("digraph { a -> }", cache) is None
+    assert len(calls) == 1
+    # the failure is not persisted: a restarted process tries again
+    assert charts.render_svg("digraph { a -> }", RenderCache(disk_dir=str(tmp_path))) is None
+    assert len(calls) == 2
+
+
+def test_dot_timeout_is_a_transient_failure(monkeypatch, tmp_path):
+    def slow(cmd, input, capture_output, timeout):
+        raise subprocess.TimeoutExpired(cmd, timeout)
+
+    monkeypatch.setattr(charts.subprocess, "run", slow)
+    monkeypatch.setattr(charts, "HAS_GRAPHVIZ", True)
+    monkeypatch.setattr(charts, "_HAS_DOT_BINARY", True)
+    cache = RenderCache(disk_dir=str(tmp_path))
+    assert charts.render_svg("digraph { a -> b }", cache, timeout=0.1) is None
+    assert charts._HAS_DOT_BINARY      # dot exists, it was just slow
+    assert cache.get("svg", content_hash("digraph { a -> b }")) == ""
+    assert RenderCache(disk_dir=str(tmp_path)).get("svg", content_hash("digraph { a -> b }")) is None
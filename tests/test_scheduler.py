@@ -0,0 +1,66 @@
+from scheduler import AssignmentScheduler
+
+PLOTS = [f"p{i}" for i in range(20)]
+
+
+def _scheduler(plots=PLOTS, **kwargs):
+    sched = AssignmentScheduler(**kwargs)
+    for pid in plots:
+        sched.add_plot(pid)
+    return sched
+
+
+def _session(sched, annotator, n):
+    """Hand out and rate `n` plots in a row; the plot ids in order."""
+    out = []
+    for _ in range(n):
+        pid = sched.next_for(annotator)
+        if pid is None:
+            break
+        sched.record(annotator, pid)
+        out.append(pid)
+    return out
+
+
+def test_order_is_reproducible_from_the_seed():
+    a = _session(_scheduler(seed=7), "ann", 10)
+    b = _session(_scheduler(list(reversed(PLOTS)), seed=7), "ann", 10)   # insert order does not matter
+    assert a == b and len(set(a)) == 10
+    assert _session(_scheduler(seed=8), "ann", 10) != a
+    sched = _scheduler(seed=7)
+    assert sched.peek_for("ann") == sched.next_for("ann") == a[0]
+
+
+def test_least_covered_plots_come_first():
+    sched = _scheduler(seed=1)
+    first = _session(sched, "a1", len(PLOTS))
+    assert sorted(first) == sorted(PLOTS)
+    sched.record("a2", first[0])
+    # every plot but first[0] has one rating; a3 gets those before the twice-rated one
+    assert first[0] not in _session(sched, "a3", len(PLOTS) - 1)
+
+
+def test_plots_at_target_are_not_handed_out():
+    sched = _scheduler(["p0", "p1", "p2"], target_per_plot=2, gold_rate=0)
+    for annotator in ("a1", "a2"):
+        assert sorted(_session(sched, annotator, 3)) == ["p0", "p1", "p2"]
+    assert sched.next_for("a3") is None
+    assert all(sched.coverage(pid) == 2 for pid in ("p0", "p1", "p2"))
+
+
+def test_gold_rate():
+    gold = {"p0", "p1"}
+
+    def gold_share(rate):
+        sched = _scheduler(gold_rate=rate, seed=3)
+        sched.set_gold(gold)
+        return sum(sched.peek_for(f"a{i}") in gold for i in range(400)) / 400
+
+    assert gold_share(0.0) == 0.0
+    assert gold_share(1.0) == 1.0
+    share = gold_share(0.25)
+    assert 0.18 < share < 0.32 and share == gold_share(0.25)
+    # gold plots are never handed out through the regular queue
+    sched = _scheduler(gold_rate=0.0)
+    sched.set_gold(gold)
+    assert not gold & set(_session(sched, "a1", len(PLOTS)))
@@ -0,0 +1,59 @@
+from render_cache import RenderCache
+from script_view import script_outline, split_sections, warm_script
+
+BODY = "Dialogue and action. " * 20   # well over MIN_SECTION_CHARS
+
+
+def _covers(text, sections):
+    assert sections[0]["start"] == 0 and sections[-1]["end"] == len(text)
+    assert all(a["end"] == b["start"] for a, b in zip(sections, sections[1:]))
+    assert "".join(text[s["start"]:s["end"]] for s in sections) == text
+
+
+def test_act_heading_merges_into_first_scene():
+    text = f"# Act 1\nThe storm.\n\n## Scene 1\n{BODY}\n\n## Scene 2\n{BODY}\n"
+    sections = split_sections(text)
+    assert [s["title"] for s in sections] == ["Act 1 › Scene 1", "Scene 2"]
+    assert sections[0]["level"] == 1
+    _covers(text, sections)
+
+
+def test_headings_inside_fences_are_ignored():
+    text = f"# Scene 1\n{BODY}\n```\n# not a heading\n~~~\n## nor this\n```\n{BODY}\n# Scene 2\n{BODY}\n"
+    sections = split_sections(text)
+    assert [s["title"] for s in sections] == ["Scene 1", "Scene 2"]
+    _covers(text, sections)
+
+
+def test_opening_text_and_nested_lists_stay_in_their_section():
+    text = f"Logline: a heist.\n\n# Scene 1\n- a\n  - nested\n    1. deeper\n\n| a | b |\n|---|---|\n| 1 | 2 |\n{BODY}\n"
+    sections = split_sections(text)
+    assert [s["title"] for s in sections] == ["Opening / 开头", "Scene 1"]
+    assert "  - nested" in text[sections[1]["start"]:sections[1]["end"]]
+    _covers(text, sections)
+
+
+def test_long_sections_are_cut_at_blank_lines_outside_fences():
+    para = "x" * 90 + "\n\n"
+    fence = "```\n" + "y\n\n" * 40 + "```\n"
+    text = "# Scene\n" + para * 10 + fence + para * 10
+    sections = split_sections(text, max_chars=400)
+    assert len(sections) > 1
+    assert all(s["title"].startswith("Scene (") for s in sections)
+    for s in sections[1:]:
+        assert text[:s["start"]].endswith("\n\n")
+        assert text[:s["start"]].count("```") % 2 == 0
+    _covers(text, sections)
+
+
+def test_plain_text_is_one_section():
+    assert split_sections("just prose") == [{"title": "Opening / 开头", "level": 1, "start": 0, "end": 10}]
+    assert split_sections("") == [{"title": "Script / 剧本", "level": 1, "start": 0, "end": 0}]
+
+
+def test_warm_script_caches_the_outline():
+    cache, text = RenderCache(), f"# Scene 1\n{BODY}\n"
+    assert warm_script(text, cache) == 1
+    assert warm_script(None, cache) == 0
+    assert cache.stats()["entries"] == 1
+    assert script_outline(text, cache) == split_sections(text)
@@ -0,0 +1,44 @@
+import pytest
+
+import charts
+from story_tree import MAX_CHILDREN, NODE_BUDGET, TreeModel, default_view
+
+
+def test_parse_builds_parent_depth_and_sizes():
+    model = TreeModel("* [Root] start\n  * [A] a\n    * [A1] deeper\n  * [B] b\n* [Other] second root\n")
+    assert model.label == ["Root", "A", "A1", "B", "Other"]
+    assert list(model.parent) == [-1, 0, 1, 0, -1]
+    assert list(model.depth) == [0, 1, 2, 1, 0]
+    assert list(model.children(0)) == [1, 3] and model.roots() == [0, 4]
+    assert list(model.size) == [4, 2, 1, 1, 1]
+
+
+def test_unbounded_view_shows_every_node():
+    model = TreeModel("a\n  b\n    c\n  d\n")
+    assert model.visible() == ([0, 1, 2, 3], {})
+    shown, hidden = model.visible(max_depth=0)
+    assert shown == [0] and hidden == {0: 2}
+
+
+def test_flat_tree_caps_the_roots():
+    model = TreeModel("\n".join(f"line {i}" for i in range(3000)))
+    max_depth, max_children = default_view(model)
+    shown, hidden = model.visible(max_depth, max_children)
+    assert shown == list(range(MAX_CHILDREN)) and hidden == {-1: 3000 - MAX_CHILDREN}
+
+
+def test_auto_depth_uses_truncated_counts():
+    model = TreeModel("root\n" + "\n".join(f"  child {i}" for i in range(3000)))
+    assert model.auto_depth(NODE_BUDGET) == 0
+    max_depth, max_children = default_view(model)
+    assert max_depth == 1
+    shown, hidden = model.visible(max_depth, max_children)
+    assert len(shown) == MAX_CHILDREN + 1 and hidden == {0: 3000 - MAX_CHILDREN}
+
+
+@pytest.mark.skipif(not charts.HAS_GRAPHVIZ, reason="graphviz not installed")
+def test_dot_has_a_stub_for_cut_roots():
+    model = TreeModel("\n".join(f"line {i}" for i in range(20)))
+    source = model.to_dot(max_children=5).source
+    assert source.count("[label=<") == 5
+    assert "h_roots" in source and "+15 more" in source